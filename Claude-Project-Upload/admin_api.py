@@ -12,6 +12,11 @@ Dashboard: https://ai-advisor1.netlify.app/admin/signals
 from flask import Flask, Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
 from vnstock import Vnstock
 from telegram_notifier import TelegramNotifier
 
@@ -92,94 +97,158 @@ Session = sessionmaker(bind=engine)
 class SignalValidator:
     """Validate signals in real-time"""
     
-    def __init__(self):
+    # Seconds a fetched price is reused
+    PRICE_TTL = 60
+    
+    # Concurrent price requests in validate_signals()
+    MAX_WORKERS = 8
+    
+    def __init__(self, price_ttl=PRICE_TTL, max_workers=MAX_WORKERS):
         self.stock_api = Vnstock()
+        self.price_ttl = price_ttl
+        self.max_workers = max_workers
+        self._prices = {}  # code -> (price, fetched_at)
+        self._lock = threading.Lock()
     
     def validate_signal(self, signal_data):
-        """Comprehensive validation"""
-        
-        errors = []
-        warnings = []
-        
-        # Get real-time price
-        current_price = self.get_realtime_price(signal_data['code'])
-        
-        if not current_price:
-            errors.append("Cannot fetch current price")
-            return {
-                'valid': False,
-                'errors': errors,
-                'warnings': warnings,
-                'quality_score': 0,
-                'current_price': signal_data['entry_price']
-            }
-        
-        signal_data['current_price'] = current_price
-        
-        # Calculate price difference
-        entry_price = signal_data['entry_price']
-        price_diff_pct = ((entry_price - current_price) / current_price) * 100
-        signal_data['price_diff_pct'] = price_diff_pct
-        
-        # 1. Price mismatch check
-        if abs(price_diff_pct) > 5:
-            errors.append(
-                f"CRITICAL: Price mismatch! Entry {entry_price:,.0f} vs Current {current_price:,.0f} "
-                f"({price_diff_pct:+.1f}% difference)"
-            )
-        elif abs(price_diff_pct) > 2:
-            warnings.append(f"Price difference: {price_diff_pct:+.1f}%")
-        
-        # 2. Stop Loss check
-        if signal_data['stop_loss'] >= signal_data['entry_price']:
-            errors.append("Stop Loss ABOVE entry price!")
-        
-        # 3. Take Profit check
-        if signal_data['take_profit'] <= signal_data['entry_price']:
-            errors.append("Take Profit BELOW entry price!")
-        
-        # 4. Risk/Reward calculation
-        risk_pct = abs((signal_data['entry_price'] - signal_data['stop_loss']) / signal_data['entry_price'] * 100)
-        reward_pct = abs((signal_data['take_profit'] - signal_data['entry_price']) / signal_data['entry_price'] * 100)
-        
-        signal_data['risk_pct'] = risk_pct
-        signal_data['reward_pct'] = reward_pct
-        
-        if risk_pct > 0:
-            rr_ratio = reward_pct / risk_pct
-            signal_data['rr_ratio'] = rr_ratio
+        """Comprehensive validation (one-signal form of validate_signals)"""
+        return self.validate_signals([signal_data])[0]
+    
+    def validate_signals(self, signals_data):
+        """
+        Comprehensive validation of many signals at once
+        
+        Prices are fetched once per distinct code, concurrently and through
+        the TTL cache; the rule checks run as one vectorized pass.
+        
+        Returns:
+            list: validation dicts, in input order
+        """
+        if not signals_data:
+            return []
+        
+        prices = self.get_realtime_prices(s['code'] for s in signals_data)
+        
+        df = pd.DataFrame({
+            'entry_price': [s['entry_price'] for s in signals_data],
+            'stop_loss': [s['stop_loss'] for s in signals_data],
+            'take_profit': [s['take_profit'] for s in signals_data],
+            'current_price': [prices.get(s['code']) or np.nan for s in signals_data],
+            'volume_ratio': [s.get('volume_ratio', 0) for s in signals_data],
+            'rsi': [s.get('rsi', 50) for s in signals_data]
+        }, dtype=float)
+        
+        entry = df['entry_price']
+        current = df['current_price']
+        has_price = current.notna()
+        
+        price_diff_pct = (entry - current) / current * 100
+        risk_pct = ((entry - df['stop_loss']) / entry * 100).abs()
+        reward_pct = ((df['take_profit'] - entry) / entry * 100).abs()
+        valid_risk = risk_pct > 0
+        rr_ratio = (reward_pct / risk_pct).where(valid_risk, 0.0)
+        
+        # Rules run in a fixed order (messages keep that order)
+        price_mismatch = price_diff_pct.abs() > 5
+        error_rules = [
+            (price_mismatch, lambda i, s: (
+                f"CRITICAL: Price mismatch! Entry {s['entry_price']:,.0f} vs Current {current.iat[i]:,.0f} "
+                f"({price_diff_pct.iat[i]:+.1f}% difference)"
+            )),
+            (df['stop_loss'] >= entry, lambda i, s: "Stop Loss ABOVE entry price!"),
+            (df['take_profit'] <= entry, lambda i, s: "Take Profit BELOW entry price!"),
+            (~valid_risk, lambda i, s: "Invalid risk calculation"),
+        ]
+        
+        rsi_high = df['rsi'] > 75
+        warning_rules = [
+            (~price_mismatch & (price_diff_pct.abs() > 2),
+             lambda i, s: f"Price difference: {price_diff_pct.iat[i]:+.1f}%"),
+            (valid_risk & (rr_ratio < 1.5), lambda i, s: f"Poor R/R ratio: {rr_ratio.iat[i]:.2f}x"),
+            (risk_pct > 10, lambda i, s: f"High risk: {risk_pct.iat[i]:.1f}%"),
+            (df['volume_ratio'] < 1.2, lambda i, s: f"Low volume: {s.get('volume_ratio', 0):.2f}x"),
+            (rsi_high, lambda i, s: f"RSI very high: {s.get('rsi', 50)}"),
+            (~rsi_high & (df['rsi'] < 25), lambda i, s: f"RSI very low: {s.get('rsi', 50)}"),
+        ]
+        
+        errors = [[] for _ in signals_data]
+        warnings = [[] for _ in signals_data]
+        for rules, messages in ((error_rules, errors), (warning_rules, warnings)):
+            for mask, message in rules:
+                for i in np.flatnonzero((mask & has_price).to_numpy()):
+                    messages[i].append(message(i, signals_data[i]))
+        
+        # Quality score 0-100: -20 per error, -5 per warning, bonuses for R/R, volume, neutral RSI
+        n_errors = np.array([len(e) for e in errors])
+        n_warnings = np.array([len(w) for w in warnings])
+        score = (
+            100 - n_errors * 20 - n_warnings * 5
+            + np.where(rr_ratio >= 2, 10, 0)
+            + np.where(df['volume_ratio'] >= 2, 5, 0)
+            + np.where((df['rsi'] >= 40) & (df['rsi'] <= 60), 5, 0)
+        )
+        quality_scores = np.clip(score, 0, 100)
+        
+        results = []
+        for i, signal_data in enumerate(signals_data):
+            if not has_price.iat[i]:
+                results.append({
+                    'valid': False,
+                    'errors': ["Cannot fetch current price"],
+                    'warnings': [],
+                    'quality_score': 0,
+                    'current_price': signal_data['entry_price']
+                })
+                continue
             
-            if rr_ratio < 1.5:
-                warnings.append(f"Poor R/R ratio: {rr_ratio:.2f}x")
-        else:
-            signal_data['rr_ratio'] = 0
-            errors.append("Invalid risk calculation")
-        
-        # 5. Risk check
-        if risk_pct > 10:
-            warnings.append(f"High risk: {risk_pct:.1f}%")
-        
-        # 6. Volume check
-        if signal_data.get('volume_ratio', 0) < 1.2:
-            warnings.append(f"Low volume: {signal_data.get('volume_ratio', 0):.2f}x")
-        
-        # 7. RSI check
-        rsi = signal_data.get('rsi', 50)
-        if rsi > 75:
-            warnings.append(f"RSI very high: {rsi}")
-        elif rsi < 25:
-            warnings.append(f"RSI very low: {rsi}")
-        
-        # Calculate quality score
-        quality_score = self.calculate_quality_score(signal_data, errors, warnings)
-        
-        return {
-            'valid': len(errors) == 0,
-            'errors': errors,
-            'warnings': warnings,
-            'quality_score': quality_score,
-            'current_price': current_price
-        }
+            signal_data['current_price'] = prices[signal_data['code']]
+            signal_data['price_diff_pct'] = float(price_diff_pct.iat[i])
+            signal_data['risk_pct'] = float(risk_pct.iat[i])
+            signal_data['reward_pct'] = float(reward_pct.iat[i])
+            signal_data['rr_ratio'] = float(rr_ratio.iat[i])
+            
+            results.append({
+                'valid': len(errors[i]) == 0,
+                'errors': errors[i],
+                'warnings': warnings[i],
+                'quality_score': int(quality_scores[i]),
+                'current_price': prices[signal_data['code']]
+            })
+        
+        return results
+    
+    def get_realtime_prices(self, codes):
+        """
+        Prices of many codes: {code: price}
+        
+        Each distinct code is fetched once; prices younger than price_ttl
+        come from the cache, the rest are fetched concurrently.
+        """
+        codes = list(dict.fromkeys(codes))
+        now = time.monotonic()
+        
+        prices = {}
+        missing = []
+        with self._lock:
+            for code in codes:
+                cached = self._prices.get(code)
+                if cached is not None and now - cached[1] < self.price_ttl:
+                    prices[code] = cached[0]
+                else:
+                    missing.append(code)
+        
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                fetched = dict(zip(missing, executor.map(self.get_realtime_price, missing)))
+            
+            fetched_at = time.monotonic()
+            with self._lock:
+                for code, price in fetched.items():
+                    if price:
+                        self._prices[code] = (price, fetched_at)
+            prices.update(fetched)
+        
+        return prices
     
     def get_realtime_price(self, code):
         """Get real-time price from VNStock"""
@@ -207,24 +276,6 @@ class SignalValidator:
         except Exception as e:
             print(f"Error getting price for {code}: {e}")
             return None
-    
-    def calculate_quality_score(self, signal_data, errors, warnings):
-        """Calculate quality score 0-100"""
-        score = 100
-        score -= len(errors) * 20
-        score -= len(warnings) * 5
-        
-        # Bonuses
-        if signal_data.get('rr_ratio', 0) >= 2:
-            score += 10
-        if signal_data.get('volume_ratio', 0) >= 2:
-            score += 5
-        
-        rsi = signal_data.get('rsi', 50)
-        if 40 <= rsi <= 60:
-            score += 5
-        
-        return max(0, min(100, score))
 
 
 # ========================================================================
@@ -378,6 +429,27 @@ def reject_signal(signal_id):
         session.close()
 
 
+@admin_bp.route('/api/admin/signals/validate', methods=['POST'])
+def validate_signals():
+    """Validate a batch of signals (no DB writes): {"signals": [...]}"""
+    
+    data = request.json or {}
+    signals_data = data.get('signals', [])
+    
+    try:
+        results = validator.validate_signals(signals_data)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': [dict(result, code=signal['code']) for signal, result in zip(signals_data, results)],
+            'quality_scores': [result['quality_score'] for result in results]
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @admin_bp.route('/api/admin/signals', methods=['POST'])
 def create_signal():
     """Create new signal (from scanner)"""
@@ -2,14 +2,19 @@
 AI Advisor Backend API - Complete with Full Migration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import sqlite3
 from datetime import datetime
 import os
 import json
 import logging
 
+from chat_service import ChatBusyError, ChatService, ChatTimeoutError, StubModel
+from db_pool import SQLitePool
+from price_service import PriceCache, fetch_prices_vnstock
+from response_cache import ResponseCache
+from scan_jobs import ScanQueue, create_jobs_table, create_scan_tables
+
 # Gemini AI
 try:
     import google.generativeai as genai
@@ -26,6 +31,25 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = 'signals.db'
 
+# Per-worker SQLite connections (WAL, busy timeout, read-only fast path)
+db = SQLitePool(DB_PATH)
+
+# Databases from before versioned scans: /api/signals reads current_scan
+with db.write() as conn:
+    create_scan_tables(conn)
+
+# Current prices for portfolio valuation (short TTL, batched misses)
+prices = PriceCache(fetch_prices_vnstock)
+
+# POST /api/scan jobs: de-duplicated, one scan at a time, warm worker
+scan_jobs = ScanQueue(db)
+
+# GET /api/signals responses by (scan_id, filters, page) (JSON bytes + ETag)
+signals_cache = ResponseCache(dumps=app.json.dumps, max_entries=256)
+
+# Page size cap for /api/signals?limit=
+MAX_SIGNALS_PAGE = 500
+
 # Initialize Gemini
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 if GEMINI_AVAILABLE and GEMINI_API_KEY:
@@ -36,6 +60,14 @@ else:
     model = None
     logger.warning("⚠️ Gemini API key not found")
 
+# Local stub instead of Gemini (tests / offline dev): CHAT_MODEL=stub
+if os.environ.get('CHAT_MODEL') == 'stub':
+    model = StubModel()
+    logger.info("✓ Using stub chat model")
+
+# Model calls: thread pool with a concurrency cap, timeout and answer cache
+chat = ChatService(model) if model else None
+
 # ============================================================================
 # MIGRATION ENDPOINT - COMPLETE
 # ============================================================================
@@ -46,85 +78,118 @@ def run_migration():
     try:
         logger.info("Starting complete migration...")
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # 1. Create signals table
-        logger.info("Creating signals table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS signals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT NOT NULL,
-                strategy TEXT NOT NULL,
-                entry_price REAL NOT NULL,
-                stop_loss REAL NOT NULL,
-                take_profit REAL NOT NULL,
-                risk_reward REAL,
-                strength REAL,
-                is_priority INTEGER DEFAULT 0,
-                stock_type TEXT,
-                rsi REAL,
-                date TEXT,
-                action TEXT DEFAULT 'BUY',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 2. Create portfolios table
-        logger.info("Creating portfolios table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS portfolios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                ticker TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                avg_price REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, ticker)
-            )
-        ''')
-        
-        # 3. Create chat_history table
-        logger.info("Creating chat_history table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                portfolio_context TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 4. Create indexes
-        logger.info("Creating indexes...")
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_signals_date 
-            ON signals(date DESC)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_portfolio_user 
-            ON portfolios(user_id)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_chat_user 
-            ON chat_history(user_id, created_at DESC)
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            cursor = conn.cursor()
+            
+            # 1. Create signals table
+            logger.info("Creating signals table...")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS signals (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ticker TEXT NOT NULL,
+                    strategy TEXT NOT NULL,
+                    entry_price REAL NOT NULL,
+                    stop_loss REAL NOT NULL,
+                    take_profit REAL NOT NULL,
+                    risk_reward REAL,
+                    strength REAL,
+                    is_priority INTEGER DEFAULT 0,
+                    stock_type TEXT,
+                    rsi REAL,
+                    date TEXT,
+                    action TEXT DEFAULT 'BUY',
+                    scan_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 2. Create portfolios table
+            logger.info("Creating portfolios table...")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS portfolios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    ticker TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    avg_price REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(user_id, ticker)
+                )
+            ''')
+            
+            # 3. Create chat_history table
+            logger.info("Creating chat_history table...")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS chat_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    portfolio_context TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 4. Create scan snapshot tables (written by the EOD scanner);
+            # older signals tables get their scan_id column here
+            logger.info("Creating scans tables...")
+            create_scan_tables(conn)
+            
+            # 5. Create scan job queue table
+            logger.info("Creating scan_jobs table...")
+            create_jobs_table(conn)
+            
+            # 6. Create indexes
+            logger.info("Creating indexes...")
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_date 
+                ON signals(date DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_scan
+                ON signals(scan_id, strength DESC)
+            ''')
+            
+            # Keyset pagination of /api/signals: (strength, id) DESC per filter
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_scan_strength
+                ON signals(scan_id, strength DESC, id DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_scan_strategy
+                ON signals(scan_id, strategy, strength DESC, id DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_scan_priority
+                ON signals(scan_id, is_priority, strength DESC, id DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_signals_scan_type
+                ON signals(scan_id, stock_type, strength DESC, id DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_portfolio_user 
+                ON portfolios(user_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_chat_user 
+                ON chat_history(user_id, created_at DESC)
+            ''')
         
         logger.info("✓ Complete migration successful")
         
         return jsonify({
             'success': True,
             'message': 'Complete migration successful',
-            'tables_created': ['signals', 'portfolios', 'chat_history']
+            'tables_created': ['signals', 'portfolios', 'chat_history', 'scans', 'current_scan', 'scan_jobs']
         })
         
     except Exception as e:
@@ -141,18 +206,17 @@ def get_portfolio():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, quantity, avg_price, created_at, updated_at
-            FROM portfolios
-            WHERE user_id = ?
-            ORDER BY ticker
-        ''', (user_id,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with db.read() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT ticker, quantity, avg_price, created_at, updated_at
+                FROM portfolios
+                WHERE user_id = ?
+                ORDER BY ticker
+            ''', (user_id,))
+            
+            rows = cursor.fetchall()
         
         portfolio = []
         for row in rows:
@@ -186,39 +250,36 @@ def add_to_portfolio():
         if not ticker or quantity <= 0 or price <= 0:
             return jsonify({'success': False, 'error': 'Invalid input'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Check if stock exists
-        cursor.execute('''
-            SELECT quantity, avg_price FROM portfolios
-            WHERE user_id = ? AND ticker = ?
-        ''', (user_id, ticker))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing
-            old_qty = existing[0]
-            old_price = existing[1]
-            
-            new_qty = old_qty + quantity
-            new_avg_price = ((old_qty * old_price) + (quantity * price)) / new_qty
+        with db.write() as conn:
+            cursor = conn.cursor()
             
+            # Check if stock exists
             cursor.execute('''
-                UPDATE portfolios
-                SET quantity = ?, avg_price = ?, updated_at = ?
+                SELECT quantity, avg_price FROM portfolios
                 WHERE user_id = ? AND ticker = ?
-            ''', (new_qty, new_avg_price, datetime.now(), user_id, ticker))
-        else:
-            # Insert new
-            cursor.execute('''
-                INSERT INTO portfolios (user_id, ticker, quantity, avg_price)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, ticker, quantity, price))
-        
-        conn.commit()
-        conn.close()
+            ''', (user_id, ticker))
+            
+            existing = cursor.fetchone()
+            
+            if existing:
+                # Update existing
+                old_qty = existing[0]
+                old_price = existing[1]
+                
+                new_qty = old_qty + quantity
+                new_avg_price = ((old_qty * old_price) + (quantity * price)) / new_qty
+                
+                cursor.execute('''
+                    UPDATE portfolios
+                    SET quantity = ?, avg_price = ?, updated_at = ?
+                    WHERE user_id = ? AND ticker = ?
+                ''', (new_qty, new_avg_price, datetime.now(), user_id, ticker))
+            else:
+                # Insert new
+                cursor.execute('''
+                    INSERT INTO portfolios (user_id, ticker, quantity, avg_price)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, ticker, quantity, price))
         
         return jsonify({'success': True, 'message': 'Portfolio updated'})
         
@@ -232,16 +293,13 @@ def remove_from_portfolio(ticker):
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM portfolios
-            WHERE user_id = ? AND ticker = ?
-        ''', (user_id, ticker.upper()))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM portfolios
+                WHERE user_id = ? AND ticker = ?
+            ''', (user_id, ticker.upper()))
         
         return jsonify({'success': True, 'message': 'Stock removed'})
         
@@ -249,6 +307,94 @@ def remove_from_portfolio(ticker):
         logger.error(f"Error removing from portfolio: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/portfolio/valuation', methods=['GET', 'POST'])
+def value_portfolios():
+    """
+    Mark-to-market P&L of one or many portfolios
+    
+    GET ?user_ids=1,2,3 (or ?user_id=1), POST {"user_ids": [1, 2, 3]}.
+    All distinct tickers across the portfolios are priced with one batched
+    lookup through the price cache, so the cost grows with the number of
+    distinct tickers, not positions. Portfolio totals cover priced
+    positions only; unpriced tickers are listed in missingPrices.
+    """
+    try:
+        if request.method == 'POST':
+            user_ids = (request.json or {}).get('user_ids') or [1]
+        elif request.args.get('user_ids'):
+            user_ids = request.args.get('user_ids').split(',')
+        else:
+            user_ids = [request.args.get('user_id', 1, type=int)]
+        
+        try:
+            user_ids = sorted({int(u) for u in user_ids})
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid user_ids'}), 400
+        
+        with db.read() as conn:
+            rows = conn.execute('''
+                SELECT user_id, ticker, quantity, avg_price
+                FROM portfolios
+                WHERE user_id IN (SELECT value FROM json_each(?))
+                ORDER BY user_id, ticker
+            ''', (json.dumps(user_ids),)).fetchall()
+        
+        current_prices = prices.get_many(row[1] for row in rows)
+        
+        portfolios = {user_id: {
+            'userId': user_id,
+            'positions': [],
+            'cost': 0.0,
+            'marketValue': 0.0,
+            'pnl': 0.0,
+            'missingPrices': []
+        } for user_id in user_ids}
+        
+        for user_id, ticker, quantity, avg_price in rows:
+            portfolio = portfolios[user_id]
+            price = current_prices.get(ticker.upper())
+            cost = quantity * avg_price
+            
+            position = {
+                'ticker': ticker,
+                'quantity': quantity,
+                'avgPrice': avg_price,
+                'price': price,
+                'cost': cost,
+                'marketValue': None,
+                'pnl': None,
+                'pnlPercent': None
+            }
+            
+            if price is None:
+                portfolio['missingPrices'].append(ticker)
+            else:
+                market_value = quantity * price
+                position['marketValue'] = market_value
+                position['pnl'] = market_value - cost
+                position['pnlPercent'] = (market_value - cost) / cost * 100 if cost else None
+                
+                portfolio['cost'] += cost
+                portfolio['marketValue'] += market_value
+                portfolio['pnl'] += market_value - cost
+            
+            portfolio['positions'].append(position)
+        
+        for portfolio in portfolios.values():
+            cost = portfolio['cost']
+            portfolio['pnlPercent'] = portfolio['pnl'] / cost * 100 if cost else None
+        
+        return jsonify({
+            'success': True,
+            'prices': current_prices,
+            'portfolios': list(portfolios.values()),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error valuing portfolios: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ============================================================================
 # CHAT ENDPOINTS WITH GEMINI
 # ============================================================================
@@ -265,16 +411,12 @@ def chat_with_ai():
             return jsonify({'success': False, 'error': 'Message required'}), 400
         
         # Get portfolio
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, quantity, avg_price
-            FROM portfolios
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        portfolio_data = cursor.fetchall()
+        with db.read() as conn:
+            portfolio_data = conn.execute('''
+                SELECT ticker, quantity, avg_price
+                FROM portfolios
+                WHERE user_id = ?
+            ''', (user_id,)).fetchall()
         
         # Build context
         portfolio_context = ""
@@ -298,9 +440,15 @@ Nhiệm vụ:
 Câu hỏi: {message}
 """
             
-            response = model.generate_content(system_prompt)
-            ai_response = response.text
+            # No SQLite connection is held during the model call
+            try:
+                ai_response, cached = chat.generate(system_prompt, message, portfolio_data)
+            except ChatBusyError as e:
+                return jsonify({'success': False, 'error': str(e), 'response': str(e)}), 503
+            except ChatTimeoutError as e:
+                return jsonify({'success': False, 'error': str(e), 'response': str(e)}), 504
         else:
+            cached = False
             ai_response = f"""Xin chào! Tôi là AI Advisor.
 
 {portfolio_context if portfolio_context else "Chưa có cổ phiếu"}
@@ -311,18 +459,17 @@ Câu hỏi: "{message}"
 """
         
         # Save chat
-        cursor.execute('''
-            INSERT INTO chat_history (user_id, message, response, portfolio_context)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, message, ai_response, portfolio_context))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            conn.execute('''
+                INSERT INTO chat_history (user_id, message, response, portfolio_context)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, message, ai_response, portfolio_context))
         
         return jsonify({
             'success': True,
             'response': ai_response,
-            'hasGemini': model is not None
+            'hasGemini': model is not None,
+            'cached': cached
         })
         
     except Exception as e:
@@ -340,19 +487,18 @@ def get_chat_history():
         user_id = request.args.get('user_id', 1, type=int)
         limit = request.args.get('limit', 50, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT message, response, created_at
-            FROM chat_history
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (user_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with db.read() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT message, response, created_at
+                FROM chat_history
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (user_id, limit))
+            
+            rows = cursor.fetchall()
         
         history = []
         for row in reversed(rows):
@@ -377,16 +523,13 @@ def clear_chat_history():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM chat_history
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM chat_history
+                WHERE user_id = ?
+            ''', (user_id,))
         
         return jsonify({'success': True, 'message': 'History cleared'})
         
@@ -398,22 +541,119 @@ def clear_chat_history():
 # SIGNALS ENDPOINTS
 # ============================================================================
 
+def _signals_filters(args):
+    """
+    Parse /api/signals filters into SQL conditions
+    
+    Returns:
+        (key, conditions, params) - key identifies the filtered page in the
+        response cache
+    """
+    strategy = args.get('strategy', type=str)
+    stock_type = args.get('stock_type', type=str)
+    is_priority = args.get('is_priority', type=int)
+    min_strength = args.get('min_strength', type=float)
+    date = args.get('date', type=str)
+    
+    conditions = []
+    params = []
+    
+    if strategy:
+        conditions.append('strategy = ?')
+        params.append(strategy.upper())
+    if stock_type:
+        conditions.append('stock_type = ?')
+        params.append(stock_type)
+    if is_priority is not None:
+        conditions.append('is_priority = ?')
+        params.append(1 if is_priority else 0)
+    if min_strength is not None:
+        conditions.append('strength >= ?')
+        params.append(min_strength)
+    if date:
+        conditions.append('date = ?')
+        params.append(date)
+    
+    return tuple(zip(conditions, params)), conditions, params
+
+def _format_cursor(strength, signal_id):
+    """'<strength>:<id>' of the last row of a page ('null' for no strength)"""
+    return f"{'null' if strength is None else strength}:{signal_id}"
+
+def _parse_cursor(cursor):
+    """(strength, id) of a cursor from _format_cursor; strength None for 'null'"""
+    strength, signal_id = cursor.split(':')
+    return (None if strength == 'null' else float(strength)), int(signal_id)
+
 @app.route('/api/signals', methods=['GET'])
 def get_signals():
-    """Get all signals"""
+    """
+    Get signals of the current scan (or ?scan_id= for an older scan)
+    
+    Filters: strategy, stock_type, is_priority, min_strength, date
+    Pagination: limit + cursor (nextCursor of the previous page), ordered
+    by (strength, id) DESC, signals without strength last
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, strategy, entry_price, stop_loss, take_profit,
-                   risk_reward, strength, is_priority, stock_type, rsi, date, action
-            FROM signals
-            ORDER BY strength DESC
-        ''')
+        scan_id = request.args.get('scan_id', type=int)
+        limit = request.args.get('limit', type=int)
+        cursor_arg = request.args.get('cursor', type=str)
+        
+        if limit is not None:
+            limit = max(1, min(limit, MAX_SIGNALS_PAGE))
+        try:
+            after = _parse_cursor(cursor_arg) if cursor_arg else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+        
+        filter_key, conditions, params = _signals_filters(request.args)
+        
+        with db.read() as conn:
+            if scan_id is None:
+                current = conn.execute('SELECT scan_id FROM current_scan WHERE id = 1').fetchone()
+                scan_id = current[0] if current else None
+            
+            # A committed scan never changes, so its pages are served from
+            # the cache; a new scan moves the pointer and becomes a new key
+            cache_key = (scan_id, filter_key, limit, after)
+            if scan_id is not None:
+                cached = signals_cache.get(cache_key)
+                if cached is not None:
+                    return cached.response(request)
+            
+            # scan_id IS NULL: legacy rows from before the first versioned scan
+            where = ['scan_id IS ?'] + conditions
+            query_params = [scan_id] + params
+            
+            if after is not None:
+                # Row-value comparison: an index range seek, not an OFFSET scan.
+                # NULL strength sorts last in DESC order, after every value
+                strength, signal_id = after
+                if strength is None:
+                    where.append('(strength IS NULL AND id < ?)')
+                    query_params.append(signal_id)
+                else:
+                    where.append('((strength, id) < (?, ?) OR strength IS NULL)')
+                    query_params.extend(after)
+            
+            sql = f'''
+                SELECT ticker, strategy, entry_price, stop_loss, take_profit,
+                       risk_reward, strength, is_priority, stock_type, rsi, date, action, id
+                FROM signals
+                WHERE {' AND '.join(where)}
+                ORDER BY strength DESC, id DESC
+            '''
+            if limit is not None:
+                # One extra row tells whether there is a next page
+                sql += ' LIMIT ?'
+                query_params.append(limit + 1)
+            
+            rows = conn.execute(sql, query_params).fetchall()
         
-        rows = cursor.fetchall()
-        conn.close()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _format_cursor(rows[-1][6], rows[-1][12])
         
         signals = []
         for row in rows:
@@ -432,42 +672,113 @@ def get_signals():
                 'action': row[11]
             })
         
-        return jsonify({
+        payload = {
             'success': True,
             'count': len(signals),
-            'signals': signals
-        })
+            'signals': signals,
+            'nextCursor': next_cursor
+        }
+        
+        if scan_id is None:
+            return jsonify(payload)
+        return signals_cache.put(cache_key, payload).response(request)
         
     except Exception as e:
         logger.error(f"Error getting signals: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/scan', methods=['POST'])
-def trigger_scan():
-    """Trigger signal scanner"""
+@app.route('/api/scans', methods=['GET'])
+def get_scans():
+    """List scan snapshots, newest first"""
     try:
-        import subprocess
-        import threading
+        limit = request.args.get('limit', 30, type=int)
+        
+        with db.read() as conn:
+            current = conn.execute('SELECT scan_id FROM current_scan WHERE id = 1').fetchone()
+            rows = conn.execute('''
+                SELECT id, scan_date, signal_count, created_at
+                FROM scans
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        
+        current_id = current[0] if current else None
+        scans = []
+        for row in rows:
+            scans.append({
+                'scanId': row[0],
+                'scanDate': row[1],
+                'count': row[2],
+                'createdAt': row[3],
+                'isCurrent': row[0] == current_id
+            })
         
-        def run_scanner():
-            try:
-                subprocess.run(['python', 'scripts/daily_signal_scanner_eod.py'])
-            except Exception as e:
-                logger.error(f"Scanner error: {str(e)}")
+        return jsonify({
+            'success': True,
+            'currentScanId': current_id,
+            'scans': scans
+        })
         
-        thread = threading.Thread(target=run_scanner)
-        thread.start()
+    except Exception as e:
+        logger.error(f"Error getting scans: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan', methods=['POST'])
+def trigger_scan():
+    """Queue a signal scan (or return the scan already queued/running)"""
+    try:
+        job, created = scan_jobs.submit()
         
         return jsonify({
             'success': True,
-            'status': 'scanning',
-            'message': 'Signal scanner started. This will take 2-3 minutes.'
-        })
+            'jobId': job['jobId'],
+            'status': job['status'],
+            'deduplicated': not created,
+            'message': 'Signal scanner started. This will take 2-3 minutes.' if created
+                       else 'A scan is already in progress.'
+        }), 202 if created else 200
         
     except Exception as e:
         logger.error(f"Error triggering scan: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/scan/<job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """Scan job status and progress counters"""
+    try:
+        job = scan_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({'success': True, 'job': job})
+        
+    except Exception as e:
+        logger.error(f"Error getting scan job: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan/<job_id>/events', methods=['GET'])
+def stream_scan_events(job_id):
+    """
+    Stream scan progress as Server-Sent Events
+    
+    Events: started, ticker (per ticker, with counters), signal (as soon as
+    it is found), completed / failed. Reconnecting clients resume from
+    Last-Event-ID. Needs a threaded/async gunicorn worker class
+    (e.g. --worker-class gthread), since a stream holds its worker.
+    """
+    if scan_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', 0, type=int)
+    
+    return Response(
+        stream_with_context(scan_jobs.stream(job_id, after)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
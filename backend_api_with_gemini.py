@@ -3,14 +3,17 @@ AI Advisor Backend API - With Gemini Integration
 Enhanced Portfolio Manager with chat history
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import sqlite3
 from datetime import datetime
 import os
 import json
 import logging
 
+from chat_service import ChatBusyError, ChatService, ChatTimeoutError, StubModel
+from db_pool import SQLitePool
+from scan_jobs import ScanQueue, create_scan_tables
+
 # Gemini AI
 try:
     import google.generativeai as genai
@@ -27,6 +30,16 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = 'signals.db'
 
+# Per-worker SQLite connections (WAL, busy timeout, read-only fast path)
+db = SQLitePool(DB_PATH)
+
+# Databases from before versioned scans: /api/signals reads current_scan
+with db.write() as conn:
+    create_scan_tables(conn)
+
+# POST /api/scan jobs: de-duplicated, one scan at a time, warm worker
+scan_jobs = ScanQueue(db)
+
 # Initialize Gemini
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 if GEMINI_AVAILABLE and GEMINI_API_KEY:
@@ -37,6 +50,14 @@ else:
     model = None
     logger.warning("⚠️ Gemini API key not found. Set GEMINI_API_KEY environment variable.")
 
+# Local stub instead of Gemini (tests / offline dev): CHAT_MODEL=stub
+if os.environ.get('CHAT_MODEL') == 'stub':
+    model = StubModel()
+    logger.info("✓ Using stub chat model")
+
+# Model calls: thread pool with a concurrency cap, timeout and answer cache
+chat = ChatService(model) if model else None
+
 # ============================================================================
 # PORTFOLIO ENDPOINTS
 # ============================================================================
@@ -47,18 +68,17 @@ def get_portfolio():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, quantity, avg_price, created_at, updated_at
-            FROM portfolios
-            WHERE user_id = ?
-            ORDER BY ticker
-        ''', (user_id,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with db.read() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT ticker, quantity, avg_price, created_at, updated_at
+                FROM portfolios
+                WHERE user_id = ?
+                ORDER BY ticker
+            ''', (user_id,))
+            
+            rows = cursor.fetchall()
         
         portfolio = []
         for row in rows:
@@ -92,39 +112,36 @@ def add_to_portfolio():
         if not ticker or quantity <= 0 or price <= 0:
             return jsonify({'success': False, 'error': 'Invalid input'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Check if stock exists in portfolio
-        cursor.execute('''
-            SELECT quantity, avg_price FROM portfolios
-            WHERE user_id = ? AND ticker = ?
-        ''', (user_id, ticker))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing position (average price)
-            old_qty = existing[0]
-            old_price = existing[1]
-            
-            new_qty = old_qty + quantity
-            new_avg_price = ((old_qty * old_price) + (quantity * price)) / new_qty
+        with db.write() as conn:
+            cursor = conn.cursor()
             
+            # Check if stock exists in portfolio
             cursor.execute('''
-                UPDATE portfolios
-                SET quantity = ?, avg_price = ?, updated_at = ?
+                SELECT quantity, avg_price FROM portfolios
                 WHERE user_id = ? AND ticker = ?
-            ''', (new_qty, new_avg_price, datetime.now(), user_id, ticker))
-        else:
-            # Insert new position
-            cursor.execute('''
-                INSERT INTO portfolios (user_id, ticker, quantity, avg_price)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, ticker, quantity, price))
-        
-        conn.commit()
-        conn.close()
+            ''', (user_id, ticker))
+            
+            existing = cursor.fetchone()
+            
+            if existing:
+                # Update existing position (average price)
+                old_qty = existing[0]
+                old_price = existing[1]
+                
+                new_qty = old_qty + quantity
+                new_avg_price = ((old_qty * old_price) + (quantity * price)) / new_qty
+                
+                cursor.execute('''
+                    UPDATE portfolios
+                    SET quantity = ?, avg_price = ?, updated_at = ?
+                    WHERE user_id = ? AND ticker = ?
+                ''', (new_qty, new_avg_price, datetime.now(), user_id, ticker))
+            else:
+                # Insert new position
+                cursor.execute('''
+                    INSERT INTO portfolios (user_id, ticker, quantity, avg_price)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, ticker, quantity, price))
         
         return jsonify({'success': True, 'message': 'Portfolio updated'})
         
@@ -138,16 +155,13 @@ def remove_from_portfolio(ticker):
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM portfolios
-            WHERE user_id = ? AND ticker = ?
-        ''', (user_id, ticker.upper()))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM portfolios
+                WHERE user_id = ? AND ticker = ?
+            ''', (user_id, ticker.upper()))
         
         return jsonify({'success': True, 'message': 'Stock removed'})
         
@@ -171,16 +185,12 @@ def chat_with_ai():
             return jsonify({'success': False, 'error': 'Message required'}), 400
         
         # Get user's portfolio for context
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, quantity, avg_price
-            FROM portfolios
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        portfolio_data = cursor.fetchall()
+        with db.read() as conn:
+            portfolio_data = conn.execute('''
+                SELECT ticker, quantity, avg_price
+                FROM portfolios
+                WHERE user_id = ?
+            ''', (user_id,)).fetchall()
         
         # Build portfolio context
         portfolio_context = ""
@@ -206,10 +216,16 @@ Nhiệm vụ:
 Câu hỏi của khách hàng: {message}
 """
             
-            response = model.generate_content(system_prompt)
-            ai_response = response.text
+            # No SQLite connection is held during the model call
+            try:
+                ai_response, cached = chat.generate(system_prompt, message, portfolio_data)
+            except ChatBusyError as e:
+                return jsonify({'success': False, 'error': str(e), 'response': str(e)}), 503
+            except ChatTimeoutError as e:
+                return jsonify({'success': False, 'error': str(e), 'response': str(e)}), 504
         else:
             # Fallback response
+            cached = False
             ai_response = f"""Xin chào! Tôi là AI Advisor.
 
 Danh mục hiện tại của bạn:
@@ -223,18 +239,17 @@ Câu hỏi của bạn: "{message}"
 """
         
         # Save chat history
-        cursor.execute('''
-            INSERT INTO chat_history (user_id, message, response, portfolio_context)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, message, ai_response, portfolio_context))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            conn.execute('''
+                INSERT INTO chat_history (user_id, message, response, portfolio_context)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, message, ai_response, portfolio_context))
         
         return jsonify({
             'success': True,
             'response': ai_response,
-            'hasGemini': model is not None
+            'hasGemini': model is not None,
+            'cached': cached
         })
         
     except Exception as e:
@@ -252,19 +267,18 @@ def get_chat_history():
         user_id = request.args.get('user_id', 1, type=int)
         limit = request.args.get('limit', 50, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT message, response, created_at
-            FROM chat_history
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (user_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with db.read() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT message, response, created_at
+                FROM chat_history
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (user_id, limit))
+            
+            rows = cursor.fetchall()
         
         history = []
         for row in reversed(rows):  # Reverse to show oldest first
@@ -289,16 +303,13 @@ def clear_chat_history():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM chat_history
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        with db.write() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM chat_history
+                WHERE user_id = ?
+            ''', (user_id,))
         
         return jsonify({'success': True, 'message': 'History cleared'})
         
@@ -312,20 +323,20 @@ def clear_chat_history():
 
 @app.route('/api/signals', methods=['GET'])
 def get_signals():
-    """Get all signals"""
+    """Get signals of the current scan"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT ticker, strategy, entry_price, stop_loss, take_profit,
-                   risk_reward, strength, is_priority, stock_type, rsi, date, action
-            FROM signals
-            ORDER BY strength DESC
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with db.read() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT ticker, strategy, entry_price, stop_loss, take_profit,
+                       risk_reward, strength, is_priority, stock_type, rsi, date, action
+                FROM signals
+                WHERE scan_id IS (SELECT scan_id FROM current_scan WHERE id = 1)
+                ORDER BY strength DESC
+            ''')
+            
+            rows = cursor.fetchall()
         
         signals = []
         for row in rows:
@@ -356,30 +367,60 @@ def get_signals():
 
 @app.route('/api/scan', methods=['POST'])
 def trigger_scan():
-    """Trigger signal scanner"""
+    """Queue a signal scan (or return the scan already queued/running)"""
     try:
-        import subprocess
-        import threading
-        
-        def run_scanner():
-            try:
-                subprocess.run(['python', 'scripts/daily_signal_scanner_eod.py'])
-            except Exception as e:
-                logger.error(f"Scanner error: {str(e)}")
-        
-        thread = threading.Thread(target=run_scanner)
-        thread.start()
+        job, created = scan_jobs.submit()
         
         return jsonify({
             'success': True,
-            'status': 'scanning',
-            'message': 'Signal scanner started. This will take 2-3 minutes.'
-        })
+            'jobId': job['jobId'],
+            'status': job['status'],
+            'deduplicated': not created,
+            'message': 'Signal scanner started. This will take 2-3 minutes.' if created
+                       else 'A scan is already in progress.'
+        }), 202 if created else 200
         
     except Exception as e:
         logger.error(f"Error triggering scan: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/scan/<job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """Scan job status and progress counters"""
+    try:
+        job = scan_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({'success': True, 'job': job})
+        
+    except Exception as e:
+        logger.error(f"Error getting scan job: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan/<job_id>/events', methods=['GET'])
+def stream_scan_events(job_id):
+    """
+    Stream scan progress as Server-Sent Events
+    
+    Events: started, ticker (per ticker, with counters), signal (as soon as
+    it is found), completed / failed. Reconnecting clients resume from
+    Last-Event-ID. Needs a threaded/async gunicorn worker class
+    (e.g. --worker-class gthread), since a stream holds its worker.
+    """
+    if scan_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', 0, type=int)
+    
+    return Response(
+        stream_with_context(scan_jobs.stream(job_id, after)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
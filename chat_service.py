@@ -0,0 +1,171 @@
+"""
+AI Advisor - Chat Service
+Model calls off the request path, with bounded concurrency, timeouts and a
+response cache
+
+- generate_content runs in a small thread pool (CHAT_MAX_CONCURRENCY);
+  when every slot and the short wait queue are taken, requests fail fast
+  with ChatBusyError instead of piling up gunicorn workers
+- Each call is bounded by CHAT_TIMEOUT seconds (ChatTimeoutError)
+- Answers are cached by (normalized question, portfolio snapshot), so the
+  same question on the same portfolio does not call the model again
+- StubModel replaces Gemini for local tests (CHAT_MODEL=stub)
+
+Usage:
+    chat = ChatService(model)
+    text, cached = chat.generate(prompt, message, portfolio_rows)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+CHAT_MAX_CONCURRENCY = int(os.environ.get('CHAT_MAX_CONCURRENCY', 4))
+CHAT_TIMEOUT = float(os.environ.get('CHAT_TIMEOUT', 30))
+
+# Requests allowed to wait for a free slot, on top of the running ones
+CHAT_MAX_QUEUED = int(os.environ.get('CHAT_MAX_QUEUED', 8))
+
+CHAT_CACHE_SIZE = 512
+CHAT_CACHE_TTL = 6 * 3600
+
+
+class ChatBusyError(RuntimeError):
+    """All model slots and queue places are taken"""
+
+
+class ChatTimeoutError(TimeoutError):
+    """The model did not answer within the timeout"""
+
+
+def normalize_question(message):
+    """Lowercase, collapse whitespace, drop trailing punctuation"""
+    text = re.sub(r'\s+', ' ', message.strip().lower())
+    return text.rstrip(' ?!.')
+
+
+def cache_key(message, portfolio_rows):
+    """Key of (normalized question, portfolio snapshot)"""
+    snapshot = sorted((str(ticker), int(qty), round(float(price), 2)) for ticker, qty, price in portfolio_rows)
+    raw = repr((normalize_question(message), snapshot))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ChatService:
+    """
+    Thread-pool model caller with a concurrency cap, timeout and TTL cache
+
+    model: any object with generate_content(prompt) -> response.text
+    (google.generativeai.GenerativeModel or StubModel).
+    """
+
+    def __init__(
+        self,
+        model,
+        max_concurrency=CHAT_MAX_CONCURRENCY,
+        max_queued=CHAT_MAX_QUEUED,
+        timeout=CHAT_TIMEOUT,
+        cache_size=CHAT_CACHE_SIZE,
+        cache_ttl=CHAT_CACHE_TTL
+    ):
+        self.model = model
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache = OrderedDict()
+        self.stats = {'calls': 0, 'hits': 0, 'busy': 0, 'timeouts': 0}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='chat')
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency) + max(0, max_queued))
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            text, expires = entry
+            if expires < time.monotonic():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return text
+
+    def _store(self, key, text):
+        with self._lock:
+            self.cache[key] = (text, time.monotonic() + self.cache_ttl)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _call(self, prompt):
+        try:
+            return self.model.generate_content(prompt).text
+        finally:
+            # The slot is freed when the model call ends, even after a timeout
+            self._slots.release()
+
+    def generate(self, prompt, message, portfolio_rows):
+        """
+        Answer `prompt`, cached by (message, portfolio_rows)
+
+        Returns:
+            (text, cached)
+
+        Raises:
+            ChatBusyError, ChatTimeoutError, or the model's own error
+        """
+        key = cache_key(message, portfolio_rows)
+        text = self._cached(key)
+        if text is not None:
+            self.stats['hits'] += 1
+            return text, True
+
+        if not self._slots.acquire(blocking=False):
+            self.stats['busy'] += 1
+            raise ChatBusyError('Too many chat requests, please retry')
+
+        self.stats['calls'] += 1
+        future = self._executor.submit(self._call, prompt)
+        try:
+            text = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.stats['timeouts'] += 1
+            raise ChatTimeoutError(f'Model did not answer within {self.timeout:.0f}s')
+
+        self._store(key, text)
+        return text, False
+
+
+# ============================================================================
+# LOCAL STUB MODEL
+# ============================================================================
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    Local stand-in for the Gemini model (no network)
+
+    Sleeps `latency` seconds and echoes the last line of the prompt.
+    Calls are counted in `calls`.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = float(os.environ.get('CHAT_STUB_LATENCY', 0.2)) if latency is None else latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        question = prompt.strip().splitlines()[-1] if prompt.strip() else ''
+        return StubResponse(f"[stub] {question}")
@@ -0,0 +1,156 @@
+"""
+AI Advisor - SQLite Connection Pool
+Per-worker connections with WAL journaling for the Flask backend
+
+- One write connection and one read-only connection per thread, kept open
+  across requests (so sqlite3's per-connection statement cache works as
+  prepared statements)
+- WAL journal: readers keep reading the last committed data while the
+  scanner is writing, instead of waiting for it
+- busy_timeout: writers wait for the lock instead of failing at once
+- Fork-safe: connections inherited from the gunicorn master are dropped
+  and re-opened in each worker
+
+Usage:
+    db = SQLitePool('signals.db')
+
+    with db.read() as conn:
+        rows = conn.execute('SELECT ...', params).fetchall()
+
+    with db.write() as conn:      # one transaction: commit or rollback
+        conn.execute('INSERT ...', params)
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+# Statements cached per connection (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+
+def configure_connection(conn, busy_timeout_ms=BUSY_TIMEOUT_MS):
+    """Enable WAL + busy timeout on a writable connection (also used by the scanner)"""
+    conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+class SQLitePool:
+    """
+    Thread-local SQLite connections, re-created after fork
+
+    Write connections run in autocommit mode; write() opens an explicit
+    BEGIN IMMEDIATE transaction so the write lock is taken up front
+    (waiting up to busy_timeout) rather than failing on lock upgrade.
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=BUSY_TIMEOUT_MS, cached_statements=CACHED_STATEMENTS):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connections(self):
+        # gunicorn forks workers from the master: never share its connections
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._local = threading.local()
+                    self._pid = os.getpid()
+        return self._local
+
+    def _connect(self, readonly=False):
+        if readonly:
+            uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(
+                uri, uri=True,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                cached_statements=self.cached_statements
+            )
+            conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+            return conn
+
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            cached_statements=self.cached_statements
+        )
+        return configure_connection(conn, self.busy_timeout_ms)
+
+    def writer(self):
+        """This thread's write connection"""
+        local = self._connections()
+        conn = getattr(local, 'writer', None)
+        if conn is None:
+            conn = local.writer = self._connect()
+        return conn
+
+    def reader(self):
+        """This thread's read-only connection (falls back to the writer)"""
+        local = self._connections()
+        conn = getattr(local, 'reader', None)
+        if conn is None:
+            # Opening the writer first creates the file and switches it to WAL
+            self.writer()
+            try:
+                conn = self._connect(readonly=True)
+            except sqlite3.OperationalError:
+                conn = self.writer()
+            local.reader = conn
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Read-only connection; each statement sees the last committed scan"""
+        try:
+            yield self.reader()
+        except sqlite3.DatabaseError:
+            self._discard('reader')
+            raise
+
+    @contextmanager
+    def write(self):
+        """Write connection inside one BEGIN IMMEDIATE ... COMMIT transaction"""
+        conn = self.writer()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def _discard(self, name):
+        # Drop a connection after a database error; the next call re-opens it
+        local = self._connections()
+        conn = getattr(local, name, None)
+        setattr(local, name, None)
+        if conn is not None and conn is not getattr(local, 'writer', None):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        """Close this thread's connections"""
+        local = self._connections()
+        for name in ('reader', 'writer'):
+            conn = getattr(local, name, None)
+            setattr(local, name, None)
+            if conn is not None:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
@@ -1,6 +1,4 @@
 import type { NextApiRequest, NextApiResponse } from 'next';
-import { execSync } from 'child_process';
-import path from 'path';
 
 interface HoldingStock {
   buyDate: string;
@@ -23,29 +21,40 @@ const MOCK_CURRENT_PRICES: Record<string, number> = {
   'VNM': 63342,   // +3.5% từ 61200
 };
 
-async function fetchCurrentPrice(code: string): Promise<number | null> {
+// Resident quote service: python3 scripts/fetch_vnstock.py serve
+const QUOTE_SERVICE_URL = process.env.QUOTE_SERVICE_URL || 'http://127.0.0.1:8765';
+const QUOTE_TIMEOUT_MS = 2000;
+
+// Quote service prices are in thousands of VND
+const QUOTE_PRICE_SCALE = 1000;
+
+async function fetchCurrentPrices(codes: string[]): Promise<Record<string, number>> {
+  const prices: Record<string, number> = {};
+  if (codes.length === 0) {
+    return prices;
+  }
+
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), QUOTE_TIMEOUT_MS);
+
   try {
-    // Try VNStock first
-    const scriptPath = path.join(process.cwd(), 'scripts', 'fetch_vnstock.py');
-    const result = execSync(`python3 ${scriptPath}`, {
-      timeout: 5000,
-      encoding: 'utf-8'
-    });
-    
-    const data = JSON.parse(result);
-    
+    // One lookup for all codes, answered from the service's in-memory table
+    const url = `${QUOTE_SERVICE_URL}/quote?codes=${encodeURIComponent(codes.join(','))}`;
+    const response = await fetch(url, { signal: controller.signal });
+    const data = await response.json();
+
     if (data.success && data.data) {
-      const stock = data.data.find((s: any) => s.code === code);
-      if (stock) {
-        return stock.price;
+      for (const stock of data.data) {
+        prices[stock.code] = stock.price * QUOTE_PRICE_SCALE;
       }
     }
-    
-    return null;
   } catch (error) {
-    console.error(`Error fetching ${code}:`, error);
-    return null;
+    console.error(`Error fetching ${codes.join(',')}:`, error);
+  } finally {
+    clearTimeout(timer);
   }
+
+  return prices;
 }
 
 export default async function handler(
@@ -113,15 +122,13 @@ export default async function handler(
     ];
 
     // Update current prices for holding stocks
+    const holdingCodes = history.filter(s => s.status === 'holding').map(s => s.code);
+    const livePrices = await fetchCurrentPrices(holdingCodes);
+
     for (const stock of history) {
       if (stock.status === 'holding') {
-        // Try to fetch real price from VNStock
-        let currentPrice = await fetchCurrentPrice(stock.code);
-        
-        // Fallback to mock if VNStock fails
-        if (!currentPrice) {
-          currentPrice = MOCK_CURRENT_PRICES[stock.code] || stock.buyPrice;
-        }
+        // Fallback to mock if the quote service has no price
+        const currentPrice = livePrices[stock.code] || MOCK_CURRENT_PRICES[stock.code] || stock.buyPrice;
         
         stock.currentPrice = currentPrice;
         stock.profitPercent = Number(((currentPrice - stock.buyPrice) / stock.buyPrice * 100).toFixed(2));
@@ -0,0 +1,168 @@
+"""
+AI Advisor - Price Service
+Short-TTL cache of current prices, filled by one batched lookup per request
+
+- get_many(tickers) returns cached prices younger than PRICE_CACHE_TTL and
+  fetches all the others in a single fetch_batch() call
+- Concurrent requests for the same ticker share one fetch (the second
+  request waits for the first instead of calling vnstock again)
+- fetch_prices_vnstock: one price_board() call for the whole batch, with a
+  concurrent, rate-limited per-ticker Quote.history fallback
+
+Prices are in VND (Quote.history returns thousands of VND and is scaled).
+
+Usage:
+    prices = PriceCache(fetch_prices_vnstock)
+    prices.get_many(['VNM', 'FPT'])   # {'VNM': 61200.0, 'FPT': 98500.0}
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+
+PRICE_CACHE_TTL = float(os.environ.get('PRICE_CACHE_TTL', 30))
+
+# Quote.history prices are in thousands of VND
+HISTORY_PRICE_SCALE = 1000
+
+# Max wait for a price another request is already fetching
+INFLIGHT_WAIT_SECONDS = 30
+
+
+class PriceCache:
+    """
+    Thread-safe {ticker: price} cache with TTL and batched misses
+
+    fetch_batch(tickers) -> {ticker: price}; tickers it cannot price are
+    simply left out (and asked again on the next request).
+    """
+
+    def __init__(self, fetch_batch, ttl=PRICE_CACHE_TTL, clock=time.monotonic):
+        self.fetch_batch = fetch_batch
+        self.ttl = ttl
+        self.prices = {}
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0}
+        self._clock = clock
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, tickers):
+        """Prices of the distinct tickers: {ticker: price} (missing if unknown)"""
+        tickers = sorted({str(t).upper() for t in tickers if t})
+        now = self._clock()
+
+        result = {}
+        mine = []
+        waiting = {}
+
+        with self._lock:
+            for ticker in tickers:
+                entry = self.prices.get(ticker)
+                if entry is not None and entry[1] > now:
+                    result[ticker] = entry[0]
+                elif ticker in self._inflight:
+                    waiting[ticker] = self._inflight[ticker]
+                else:
+                    event = threading.Event()
+                    self._inflight[ticker] = event
+                    mine.append(ticker)
+            self.stats['hits'] += len(result)
+            self.stats['misses'] += len(mine)
+
+        if mine:
+            fetched = {}
+            try:
+                self.stats['batches'] += 1
+                fetched = self.fetch_batch(mine) or {}
+            finally:
+                expires = self._clock() + self.ttl
+                with self._lock:
+                    for ticker in mine:
+                        price = fetched.get(ticker)
+                        if price is not None:
+                            self.prices[ticker] = (float(price), expires)
+                        self._inflight.pop(ticker).set()
+            result.update({t: float(p) for t, p in fetched.items() if t in mine and p is not None})
+
+        for ticker, event in waiting.items():
+            event.wait(INFLIGHT_WAIT_SECONDS)
+            with self._lock:
+                entry = self.prices.get(ticker)
+            if entry is not None:
+                result[ticker] = entry[0]
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self.prices.clear()
+
+
+# ============================================================================
+# VNSTOCK BATCH FETCH
+# ============================================================================
+
+def _price_board(tickers):
+    """One price_board call for all tickers (vnstock 3.x Trading API)"""
+    from vnstock import Trading
+
+    board = Trading(source='VCI').price_board(list(tickers))
+    if board is None or len(board) == 0:
+        return {}
+
+    # Columns are a MultiIndex like ('listing', 'symbol'), ('match', 'match_price')
+    columns = ['_'.join(str(part) for part in col) if isinstance(col, tuple) else str(col)
+               for col in board.columns]
+    board = board.set_axis(columns, axis=1)
+    symbol_col = next((c for c in columns if c.endswith('symbol')), None)
+    price_col = next((c for c in columns if c.endswith('match_price')), None)
+    if symbol_col is None or price_col is None:
+        return {}
+
+    prices = {}
+    for symbol, price in zip(board[symbol_col], board[price_col]):
+        if price and price > 0:
+            prices[str(symbol).upper()] = float(price)
+    return prices
+
+
+def _history_price(ticker):
+    """Last daily close (VND) - fallback when the price board has no quote"""
+    from vnstock import Quote
+
+    end = datetime.now().strftime('%Y-%m-%d')
+    start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    df = Quote(symbol=ticker, source='VCI').history(start=start, end=end)
+    if df is None or len(df) == 0:
+        return None
+    return float(df['close'].iloc[-1]) * HISTORY_PRICE_SCALE
+
+
+def fetch_prices_vnstock(tickers):
+    """
+    Current prices for a batch of tickers: {ticker: price VND}
+
+    One price_board request for the batch; tickers it does not cover are
+    fetched concurrently (rate-limited, retried) from Quote.history.
+    """
+    prices = {}
+    try:
+        prices = _price_board(tickers)
+    except Exception as e:
+        print(f"price_board error: {e}")
+
+    missing = [t for t in tickers if t not in prices]
+    if missing:
+        if SCRIPTS_DIR not in sys.path:
+            sys.path.insert(0, SCRIPTS_DIR)
+        from quote_fetcher import QuoteFetcher
+
+        fetcher = QuoteFetcher(_history_price)
+        for ticker, price, error in fetcher.fetch_many(missing):
+            if error is None and price is not None:
+                prices[ticker] = price
+    return prices
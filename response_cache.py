@@ -0,0 +1,82 @@
+"""
+AI Advisor - Response Cache
+Pre-serialized JSON responses with ETags, keyed on a data version
+
+- The body is serialized once per version; later hits cost a dict lookup
+- ETag is a hash of the body, so every gunicorn worker produces the same
+  tag for the same data and a client's If-None-Match works across workers
+- A new version (e.g. a new scan_id) is simply a new key; old versions
+  fall out of the small LRU
+
+Usage:
+    cache = ResponseCache(dumps=app.json.dumps)
+
+    cached = cache.get(scan_id)
+    if cached is None:
+        cached = cache.put(scan_id, build_payload())
+    return cached.response(request)
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+
+class CachedResponse:
+    """Serialized JSON body + ETag"""
+
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+    def response(self, request):
+        """200 with the cached body, or 304 if the client already has it"""
+        if self.etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        # Clients may keep the body but must revalidate (cheap 304) each time
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class ResponseCache:
+    """Thread-safe LRU of CachedResponse by version key"""
+
+    def __init__(self, dumps=json.dumps, max_entries=16):
+        self.dumps = dumps
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return cached
+
+    def put(self, key, payload):
+        """Serialize payload once and store it under key"""
+        body = self.dumps(payload).encode('utf-8')
+        cached = CachedResponse(body, hashlib.sha1(body).hexdigest()[:20])
+        with self._lock:
+            self.entries[key] = cached
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
@@ -0,0 +1,428 @@
+"""
+AI Advisor - Scan Job Queue
+SQLite-backed queue with a single scan worker, replacing one subprocess per
+POST /api/scan
+
+- Jobs live in the scan_jobs table of signals.db, so every gunicorn worker
+  sees the same queue and GET /api/scan/<job_id> works from any of them
+- De-duplicated: while a scan is queued or running, submit() returns that
+  job instead of starting another one
+- Single worker: a job is claimed inside BEGIN IMMEDIATE only if no other
+  job is running, so at most one scan runs across all processes
+- Warm process: the scanner module is imported once per process and reused,
+  so later scans do not pay the pandas/vnstock import cost again
+- Progress counters (done / failed / signals) are updated after every ticker
+- Events (started, ticker, signal, completed/failed) are appended to
+  scan_events as the scanner loop produces them; stream() tails them as
+  Server-Sent Events, so clients see signals before the scan finishes
+
+Usage:
+    jobs = ScanQueue(db)            # db: db_pool.SQLitePool
+    job, created = jobs.submit()
+    jobs.get(job['jobId'])
+    for chunk in jobs.stream(job['jobId']):   # SSE text
+        ...
+"""
+
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+SCANNER_MODULE = 'daily_signal_scanner_eod'
+
+# Idle worker re-checks the queue this often (jobs submitted by other processes)
+POLL_SECONDS = 2.0
+
+# A running job without a progress update for this long is considered dead
+STALE_MINUTES = 15
+
+# SSE: idle re-check interval and keep-alive comment interval
+STREAM_POLL_SECONDS = 0.5
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Events of jobs finished longer ago than this are deleted
+EVENTS_RETENTION_DAYS = 7
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINAL_EVENTS = ('completed', 'failed')
+
+JOB_COLUMNS = (
+    'id', 'status', 'total', 'done', 'failed', 'signals', 'error',
+    'created_at', 'started_at', 'finished_at', 'updated_at'
+)
+
+
+def create_jobs_table(conn):
+    """Create the scan_jobs table (also called from /api/migrate)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            total INTEGER DEFAULT 0,
+            done INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            signals INTEGER DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scan_jobs_status
+        ON scan_jobs(status, created_at)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            data TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scan_events_job
+        ON scan_events(job_id, id)
+    ''')
+
+
+def create_scan_tables(conn):
+    """
+    Create the scan snapshot tables (scans, current_scan) and add
+    signals.scan_id to signals tables from before versioned scans.
+    Called on API startup and from /api/migrate.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_date TEXT,
+            signal_count INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS current_scan (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            scan_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(signals)')]
+    if columns and 'scan_id' not in columns:
+        conn.execute('ALTER TABLE signals ADD COLUMN scan_id INTEGER')
+
+
+def _job_dict(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    return {
+        'jobId': job['id'],
+        'status': job['status'],
+        'total': job['total'],
+        'done': job['done'],
+        'failed': job['failed'],
+        'signals': job['signals'],
+        'error': job['error'],
+        'createdAt': job['created_at'],
+        'startedAt': job['started_at'],
+        'finishedAt': job['finished_at'],
+        'updatedAt': job['updated_at']
+    }
+
+
+def _signal_dict(signal):
+    """Scanner signal -> same keys as GET /api/signals"""
+    return {
+        'ticker': signal['ticker'],
+        'strategy': signal['strategy'],
+        'entryPrice': signal['entry_price'],
+        'stopLoss': signal['stop_loss'],
+        'takeProfit': signal['take_profit'],
+        'riskReward': signal['risk_reward'],
+        'strength': signal['strength'],
+        'isPriority': signal['is_priority'],
+        'stockType': signal['stock_type'],
+        'rsi': signal['rsi'],
+        'date': signal['date'],
+        'action': signal['action']
+    }
+
+
+def sse_message(event_id, event, data):
+    """One Server-Sent Events message (data is a JSON string)"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class ScanQueue:
+    """
+    Scan job queue in SQLite + one worker thread per process
+
+    Only one job runs at a time across all processes sharing the database.
+    """
+
+    def __init__(self, db, scanner_module=SCANNER_MODULE, poll_seconds=POLL_SECONDS):
+        self.db = db
+        self.scanner_module = scanner_module
+        self.poll_seconds = poll_seconds
+        self._scanner = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        # Wakes stream() generators of this process when events are written
+        self._events = threading.Condition()
+        self._table_ready = False
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            with self.db.write() as conn:
+                create_jobs_table(conn)
+            self._table_ready = True
+
+    def submit(self):
+        """
+        Queue a scan unless one is already queued or running
+
+        Returns:
+            (job, created) - created is False when an active job was reused
+        """
+        self._ensure_table()
+
+        with self.db.write() as conn:
+            self._fail_stale(conn)
+            conn.execute(f'''
+                DELETE FROM scan_events WHERE job_id IN (
+                    SELECT id FROM scan_jobs
+                    WHERE finished_at < datetime('now', '-{int(EVENTS_RETENTION_DAYS)} days')
+                )
+            ''')
+            row = conn.execute(f'''
+                SELECT {', '.join(JOB_COLUMNS)} FROM scan_jobs
+                WHERE status IN (?, ?)
+                ORDER BY created_at
+                LIMIT 1
+            ''', ACTIVE_STATUSES).fetchone()
+
+            if row is None:
+                job_id = uuid.uuid4().hex
+                conn.execute('''
+                    INSERT INTO scan_jobs (id, status) VALUES (?, 'queued')
+                ''', (job_id,))
+                row = conn.execute(f'''
+                    SELECT {', '.join(JOB_COLUMNS)} FROM scan_jobs WHERE id = ?
+                ''', (job_id,)).fetchone()
+                created = True
+            else:
+                created = False
+
+        self.start_worker()
+        self._wake.set()
+        return _job_dict(row), created
+
+    def get(self, job_id):
+        """Job as a dict, or None"""
+        self._ensure_table()
+
+        with self.db.read() as conn:
+            row = conn.execute(f'''
+                SELECT {', '.join(JOB_COLUMNS)} FROM scan_jobs WHERE id = ?
+            ''', (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def _fail_stale(self, conn):
+        # The process running this job died (e.g. gunicorn worker restart)
+        conn.execute(f'''
+            UPDATE scan_jobs
+            SET status = 'failed', error = 'worker stopped', finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'running'
+              AND updated_at < datetime('now', '-{int(STALE_MINUTES)} minutes')
+        ''')
+
+    def _claim(self):
+        """Move the oldest queued job to running, if no job is running"""
+        with self.db.write() as conn:
+            self._fail_stale(conn)
+            if conn.execute("SELECT 1 FROM scan_jobs WHERE status = 'running'").fetchone():
+                return None
+
+            row = conn.execute('''
+                SELECT id FROM scan_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                LIMIT 1
+            ''').fetchone()
+            if row is None:
+                return None
+
+            conn.execute('''
+                UPDATE scan_jobs
+                SET status = 'running', started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (row[0],))
+            return row[0]
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def start_worker(self):
+        """Start this process's worker thread (once per process, fork-safe)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._worker_loop, name='scan-worker', daemon=True)
+            self._thread.start()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job_id = self._claim()
+            except Exception as e:
+                logger.error(f"Scan queue error: {str(e)}")
+                job_id = None
+
+            if job_id is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+
+            self._run(job_id)
+
+    def scanner(self):
+        """The scanner module, imported once and kept warm"""
+        if self._scanner is None:
+            if SCRIPTS_DIR not in sys.path:
+                sys.path.insert(0, SCRIPTS_DIR)
+            self._scanner = importlib.import_module(self.scanner_module)
+        return self._scanner
+
+    def _update(self, job_id, sql, params=(), events=()):
+        """Update job columns and append events in one transaction"""
+        try:
+            with self.db.write() as conn:
+                conn.execute(f'''
+                    UPDATE scan_jobs SET {sql}, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', tuple(params) + (job_id,))
+                conn.executemany('''
+                    INSERT INTO scan_events (job_id, event, data) VALUES (?, ?, ?)
+                ''', [(job_id, event, json.dumps(data, ensure_ascii=False)) for event, data in events])
+        except Exception as e:
+            logger.error(f"Scan job {job_id} update error: {str(e)}")
+            return
+
+        if events:
+            with self._events:
+                self._events.notify_all()
+
+    def _run(self, job_id):
+        logger.info(f"Scan job {job_id} started")
+        try:
+            scanner = self.scanner()
+            total = len(scanner.TOP_STOCKS)
+            self._update(job_id, 'total = ?', (total,), [('started', {'jobId': job_id, 'total': total})])
+
+            progress = {'done': 0, 'failed': 0, 'signals': 0}
+
+            def on_ticker(ticker, signals, error):
+                # Called from the scanner loop right after each ticker
+                if error is None:
+                    progress['done'] += 1
+                    progress['signals'] += len(signals)
+                else:
+                    progress['failed'] += 1
+
+                events = [('signal', _signal_dict(signal)) for signal in signals]
+                events.append(('ticker', dict(
+                    ticker=ticker, ok=error is None, error=error, total=total, **progress
+                )))
+
+                if error is None:
+                    self._update(job_id, 'done = done + 1, signals = signals + ?', (len(signals),), events)
+                else:
+                    self._update(job_id, 'failed = failed + 1', (), events)
+
+            signals = scanner.scan_all_stocks(on_ticker=on_ticker, save=False)
+
+            # Completed only once the new scan is committed and current
+            if signals and not scanner.save_signals_to_db(signals):
+                raise RuntimeError("Saving signals to the database failed")
+
+            self._update(
+                job_id,
+                "status = 'completed', signals = ?, finished_at = CURRENT_TIMESTAMP",
+                (len(signals),),
+                [('completed', dict(progress, total=total, signals=len(signals)))]
+            )
+            logger.info(f"Scan job {job_id} completed: {len(signals)} signals")
+
+        except Exception as e:
+            logger.error(f"Scan job {job_id} failed: {str(e)}")
+            self._update(
+                job_id,
+                "status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP",
+                (str(e),),
+                [('failed', {'error': str(e)})]
+            )
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def events(self, job_id, after=0):
+        """Events of a job with id > after: [(id, event, data_json)]"""
+        with self.db.read() as conn:
+            return conn.execute('''
+                SELECT id, event, data FROM scan_events
+                WHERE job_id = ? AND id > ?
+                ORDER BY id
+            ''', (job_id, after)).fetchall()
+
+    def stream(self, job_id, after=0):
+        """
+        Server-Sent Events for a job, from event id `after` (Last-Event-ID)
+
+        Ends after the completed/failed event. Events written by this
+        process wake the stream at once; events from other processes are
+        picked up within STREAM_POLL_SECONDS.
+        """
+        last_sent = time.monotonic()
+        while True:
+            rows = self.events(job_id, after)
+            for event_id, event, data in rows:
+                after = event_id
+                yield sse_message(event_id, event, data)
+                if event in FINAL_EVENTS:
+                    return
+
+            if rows:
+                last_sent = time.monotonic()
+                continue
+
+            job = self.get(job_id)
+            if job is None or job['status'] not in ACTIVE_STATUSES:
+                # Finished without a final event (stale worker, pruned events)
+                status = job['status'] if job else 'failed'
+                yield sse_message(after, status if status in FINAL_EVENTS else 'failed',
+                                  json.dumps({'status': status, 'error': job['error'] if job else 'Job not found'}))
+                return
+
+            if time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+
+            with self._events:
+                self._events.wait(STREAM_POLL_SECONDS)
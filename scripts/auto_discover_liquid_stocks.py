@@ -14,7 +14,8 @@ import io
 import time
 from datetime import datetime, timedelta
 import pandas as pd
-import pickle
+
+from market_store import MarketDataStore
 
 # Fix encoding
 if sys.platform == 'win32':
@@ -304,6 +305,7 @@ def download_full_history(liquid_stocks, years=5, timeframe='1D', delay=2):
     end_str = end_date.strftime('%Y-%m-%d')
     
     stock_data = {}
+    new_data = {}  # Downloaded since the last checkpoint
     success = []
     failed = []
     
@@ -339,20 +341,23 @@ def download_full_history(liquid_stocks, years=5, timeframe='1D', delay=2):
             df['ema50'] = df['close'].ewm(span=50, adjust=False).mean()
             
             stock_data[code] = df
+            new_data[code] = df
             success.append(code)
             
             print(f"✅ OK ({len(df)} bars)")
             
-            # Checkpoint every 50 stocks
+            # Checkpoint every 50 stocks (only the new ones are written)
             if i % 50 == 0:
-                filename = f'liquid_stocks_{timeframe}_checkpoint_{i}.pkl'
-                save_data(stock_data, filename)
+                save_data(new_data, timeframe)
+                new_data = {}
                 print(f"\n💾 Checkpoint: {len(stock_data)} stocks saved\n")
                 
         except Exception as e:
             print(f"❌ Error: {e}")
             failed.append(code)
     
+    save_data(new_data, timeframe)
+    
     print("\n" + "=" * 70)
     print("✅ DOWNLOAD COMPLETE")
     print("=" * 70)
@@ -363,18 +368,26 @@ def download_full_history(liquid_stocks, years=5, timeframe='1D', delay=2):
     return stock_data
 
 
-def save_data(data_dict, filename):
-    """Save data to pickle file"""
-    data_dir = 'data'
-    os.makedirs(data_dir, exist_ok=True)
-    
-    filepath = os.path.join(data_dir, filename)
+def get_store_dir(timeframe='1D'):
+    """Store folder: data/store for daily bars (read by the backtests), data/store_<tf> otherwise"""
+    if timeframe == '1D':
+        return os.path.join('data', 'store')
+    return os.path.join('data', f'store_{timeframe}')
+
+
+def save_data(data_dict, timeframe='1D'):
+    """
+    Save data to the columnar store (see get_store_dir)
     
-    with open(filepath, 'wb') as f:
-        pickle.dump(data_dict, f)
+    Tickers already in the store and not in data_dict are left untouched.
+    """
+    store_dir = get_store_dir(timeframe)
+    store = MarketDataStore(store_dir)
+    store.write_many(data_dict)
     
-    size_mb = os.path.getsize(filepath) / 1024 / 1024
-    print(f"💾 Saved: {filepath} ({size_mb:.1f} MB)")
+    size_mb = store.size_bytes() / 1024 / 1024
+    print(f"💾 Saved: {len(data_dict)} stocks → {store_dir} ({len(store)} total, {size_mb:.1f} MB)")
+    return store_dir
 
 
 def save_stock_list(liquid_stocks, filename='liquid_stocks_list.txt'):
@@ -456,9 +469,8 @@ def main():
         delay=2
     )
     
-    # Final save
-    filename = f'liquid_stocks_{args.years}y_{args.timeframe}.pkl'
-    save_data(stock_data, filename)
+    # Saved incrementally by download_full_history
+    store_dir = get_store_dir(args.timeframe)
     
     print("\n" + "=" * 70)
     print("🎊 ALL COMPLETE!")
@@ -466,7 +478,7 @@ def main():
     print(f"✅ Discovered: {len(all_stocks)} total stocks")
     print(f"✅ Filtered: {len(liquid_stocks)} liquid stocks")
     print(f"✅ Downloaded: {len(stock_data)} stocks with full history")
-    print(f"📁 Data file: data/{filename}")
+    print(f"📁 Data store: {store_dir}")
     print(f"📝 Stock list: data/liquid_stocks_list.txt")
     print("🚀 Ready for backtesting!")
     print("=" * 70)
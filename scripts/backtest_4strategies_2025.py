@@ -12,9 +12,16 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
-import pickle
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from exit_engine import resolve_exits
+from indicators import IndicatorFrame
+from ledger import ColumnarLedger
+from market_store import MarketDataStore, open_store
+from metrics import trade_metrics
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -36,15 +43,18 @@ RESULTS_FOLDER = os.path.join(SCRIPT_DIR, "backtest_results_2025")
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
 
 # ============================================================================
-# LOAD DATA FROM PKL
+# LOAD DATA FROM STORE
 # ============================================================================
 
 def load_data_from_pkl():
     """
-    Load all stock data from PKL checkpoint files
+    Load stock data from the columnar store in DATA_FOLDER/store
+    
+    PKL checkpoint files are imported into the store on first run.
+    Tickers are read lazily, so testing N stocks only reads N stocks.
     
     Returns:
-        dict: {ticker: DataFrame}
+        MarketDataStore: read-only {ticker: DataFrame} mapping
     """
     print(f"\n📂 Loading data from: {DATA_FOLDER}")
     
@@ -52,38 +62,14 @@ def load_data_from_pkl():
         print(f"❌ Folder not found: {DATA_FOLDER}")
         return {}
     
-    # Find all PKL files
-    pkl_files = []
-    for file in os.listdir(DATA_FOLDER):
-        if file.endswith('.pkl') and 'liquid_stocks' in file:
-            pkl_files.append(os.path.join(DATA_FOLDER, file))
+    all_stocks_data = open_store(DATA_FOLDER, pkl_pattern='liquid_stocks')
     
-    if len(pkl_files) == 0:
-        print(f"❌ No PKL files found in {DATA_FOLDER}")
+    if len(all_stocks_data) == 0:
+        print(f"❌ No data found in {DATA_FOLDER}")
         return {}
     
-    print(f"✅ Found {len(pkl_files)} PKL files")
-    
-    # Load all data
-    all_stocks_data = {}
-    
-    for pkl_file in sorted(pkl_files):
-        print(f"   Loading: {os.path.basename(pkl_file)}...", end=" ")
-        try:
-            with open(pkl_file, 'rb') as f:
-                data = pickle.load(f)
-            
-            # Data structure: {ticker: DataFrame}
-            if isinstance(data, dict):
-                all_stocks_data.update(data)
-                print(f"✅ {len(data)} stocks")
-            else:
-                print("⚠️ Unknown format")
-        
-        except Exception as e:
-            print(f"❌ Error: {e}")
-    
-    print(f"\n✅ Total stocks loaded: {len(all_stocks_data)}")
+    print(f"✅ Store: {all_stocks_data.root}")
+    print(f"\n✅ Total stocks available: {len(all_stocks_data)}")
     
     return all_stocks_data
 
@@ -150,7 +136,7 @@ def prepare_dataframe(df, ticker):
 # STRATEGY 1: BREAKOUT
 # ============================================================================
 
-def strategy_1_breakout(df):
+def strategy_1_breakout(df, ind=None):
     """
     Chiến lược Breakout
     
@@ -164,25 +150,22 @@ def strategy_1_breakout(df):
     - Take Profit: +10%
     """
     signals = []
+    ind = ind if ind is not None else IndicatorFrame(df)
     
     # Calculate indicators
-    df['high_20'] = df['high'].rolling(20).max()
-    df['volume_avg'] = df['volume'].rolling(20).mean()
+    high_20 = ind.rolling_max('high', 20)
+    volume_avg = ind.sma('volume', 20)
+    rsi = ind.rsi(14)
     
-    # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    close, volume = df['close'], df['volume']
     
     for i in range(20, len(df)):
         # Entry conditions
-        if (df['close'].iloc[i] > df['high_20'].iloc[i-1] and
-            df['volume'].iloc[i] > df['volume_avg'].iloc[i] * 1.5 and
-            50 <= df['rsi'].iloc[i] <= 70):
+        if (close.iloc[i] > high_20.iloc[i-1] and
+            volume.iloc[i] > volume_avg.iloc[i] * 1.5 and
+            50 <= rsi.iloc[i] <= 70):
             
-            entry_price = df['close'].iloc[i]
+            entry_price = close.iloc[i]
             stop_loss = entry_price * 0.95
             take_profit = entry_price * 1.10
             
@@ -193,8 +176,8 @@ def strategy_1_breakout(df):
                 'entry_price': entry_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'rsi': df['rsi'].iloc[i],
-                'volume_ratio': df['volume'].iloc[i] / df['volume_avg'].iloc[i]
+                'rsi': rsi.iloc[i],
+                'volume_ratio': volume.iloc[i] / volume_avg.iloc[i]
             })
     
     return signals
@@ -204,7 +187,7 @@ def strategy_1_breakout(df):
 # STRATEGY 2: SWING T+
 # ============================================================================
 
-def strategy_2_swing(df):
+def strategy_2_swing(df, ind=None):
     """
     Chiến lược Swing Trading với xác nhận
     
@@ -218,28 +201,25 @@ def strategy_2_swing(df):
     - Hold: T+2 (2 days)
     """
     signals = []
+    ind = ind if ind is not None else IndicatorFrame(df)
     
-    df['high_20'] = df['high'].rolling(20).max()
-    df['volume_avg'] = df['volume'].rolling(20).mean()
+    high_20 = ind.rolling_max('high', 20)
+    volume_avg = ind.sma('volume', 20)
+    rsi = ind.rsi(14)
     
-    # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    close, volume = df['close'], df['volume']
     
     for i in range(21, len(df)):
         # Check breakout yesterday
-        breakout_yesterday = (df['close'].iloc[i-1] > df['high_20'].iloc[i-2] and
-                             df['volume'].iloc[i-1] > df['volume_avg'].iloc[i-1] * 1.3)
+        breakout_yesterday = (close.iloc[i-1] > high_20.iloc[i-2] and
+                             volume.iloc[i-1] > volume_avg.iloc[i-1] * 1.3)
         
         # Confirmation today
-        confirmation_today = (df['close'].iloc[i] > df['close'].iloc[i-1] and
-                             df['volume'].iloc[i] > df['volume_avg'].iloc[i] * 1.2)
+        confirmation_today = (close.iloc[i] > close.iloc[i-1] and
+                             volume.iloc[i] > volume_avg.iloc[i] * 1.2)
         
-        if breakout_yesterday and confirmation_today and 50 <= df['rsi'].iloc[i] <= 70:
-            entry_price = df['close'].iloc[i]
+        if breakout_yesterday and confirmation_today and 50 <= rsi.iloc[i] <= 70:
+            entry_price = close.iloc[i]
             stop_loss = entry_price * 0.95
             take_profit = entry_price * 1.08
             
@@ -250,8 +230,8 @@ def strategy_2_swing(df):
                 'entry_price': entry_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'rsi': df['rsi'].iloc[i],
-                'volume_ratio': df['volume'].iloc[i] / df['volume_avg'].iloc[i],
+                'rsi': rsi.iloc[i],
+                'volume_ratio': volume.iloc[i] / volume_avg.iloc[i],
                 'hold_days': 2
             })
     
@@ -262,7 +242,7 @@ def strategy_2_swing(df):
 # STRATEGY 3: TREND PULLBACK
 # ============================================================================
 
-def strategy_3_pullback(df):
+def strategy_3_pullback(df, ind=None):
     """
     Chiến lược Pullback trong xu hướng tăng
     
@@ -277,37 +257,36 @@ def strategy_3_pullback(df):
     - Take Profit: Previous high (+12%)
     """
     signals = []
+    ind = ind if ind is not None else IndicatorFrame(df)
     
     # EMAs
-    df['ema20'] = df['close'].ewm(span=20).mean()
-    df['ema50'] = df['close'].ewm(span=50).mean()
+    ema20 = ind.ema(20, adjust=True)
+    ema50 = ind.ema(50, adjust=True)
     
     # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    rsi = ind.rsi(14)
     
     # Recent high/low
-    df['high_20'] = df['high'].rolling(20).max()
-    df['low_10'] = df['low'].rolling(10).min()
+    high_20 = ind.rolling_max('high', 20)
+    low_10 = ind.rolling_min('low', 10)
+    
+    close = df['close']
     
     for i in range(50, len(df)):
         # Uptrend
-        uptrend = df['ema20'].iloc[i] > df['ema50'].iloc[i]
+        uptrend = ema20.iloc[i] > ema50.iloc[i]
         
         # Pullback to EMA20
-        near_ema20 = abs(df['close'].iloc[i] - df['ema20'].iloc[i]) / df['ema20'].iloc[i] < 0.02
+        near_ema20 = abs(close.iloc[i] - ema20.iloc[i]) / ema20.iloc[i] < 0.02
         
         # Bounce
-        bounce = (df['close'].iloc[i] > df['ema20'].iloc[i] and
-                 df['close'].iloc[i-1] < df['ema20'].iloc[i-1])
+        bounce = (close.iloc[i] > ema20.iloc[i] and
+                 close.iloc[i-1] < ema20.iloc[i-1])
         
-        if uptrend and (near_ema20 or bounce) and 40 <= df['rsi'].iloc[i] <= 60:
-            entry_price = df['close'].iloc[i]
-            stop_loss = df['low_10'].iloc[i] * 0.99
-            take_profit = df['high_20'].iloc[i]
+        if uptrend and (near_ema20 or bounce) and 40 <= rsi.iloc[i] <= 60:
+            entry_price = close.iloc[i]
+            stop_loss = low_10.iloc[i] * 0.99
+            take_profit = high_20.iloc[i]
             
             # Ensure min R:R ratio
             if (take_profit - entry_price) / (entry_price - stop_loss) >= 1.5:
@@ -318,7 +297,7 @@ def strategy_3_pullback(df):
                     'entry_price': entry_price,
                     'stop_loss': stop_loss,
                     'take_profit': take_profit,
-                    'rsi': df['rsi'].iloc[i],
+                    'rsi': rsi.iloc[i],
                     'r_r_ratio': (take_profit - entry_price) / (entry_price - stop_loss)
                 })
     
@@ -329,7 +308,7 @@ def strategy_3_pullback(df):
 # STRATEGY 4: EMA CROSSOVER
 # ============================================================================
 
-def strategy_4_ema_crossover(df):
+def strategy_4_ema_crossover(df, ind=None):
     """
     Chiến lược EMA Crossover
     
@@ -343,33 +322,32 @@ def strategy_4_ema_crossover(df):
     - Take Profit: +10%
     """
     signals = []
+    ind = ind if ind is not None else IndicatorFrame(df)
     
     # EMAs
-    df['ema20'] = df['close'].ewm(span=20).mean()
-    df['ema50'] = df['close'].ewm(span=50).mean()
-    df['volume_avg'] = df['volume'].rolling(20).mean()
+    ema20 = ind.ema(20, adjust=True)
+    ema50 = ind.ema(50, adjust=True)
+    volume_avg = ind.sma('volume', 20)
     
     # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    rsi = ind.rsi(14)
+    
+    close, volume = df['close'], df['volume']
     
     for i in range(50, len(df)):
         # EMA crossover
-        crossover = (df['ema20'].iloc[i] > df['ema50'].iloc[i] and
-                    df['ema20'].iloc[i-1] <= df['ema50'].iloc[i-1])
+        crossover = (ema20.iloc[i] > ema50.iloc[i] and
+                    ema20.iloc[i-1] <= ema50.iloc[i-1])
         
         # Volume confirmation
-        volume_ok = df['volume'].iloc[i] > df['volume_avg'].iloc[i] * 1.3
+        volume_ok = volume.iloc[i] > volume_avg.iloc[i] * 1.3
         
         # Trending
-        trending = df['rsi'].iloc[i] > 50
+        trending = rsi.iloc[i] > 50
         
         if crossover and volume_ok and trending:
-            entry_price = df['close'].iloc[i]
-            stop_loss = df['ema50'].iloc[i] * 0.98
+            entry_price = close.iloc[i]
+            stop_loss = ema50.iloc[i] * 0.98
             take_profit = entry_price * 1.10
             
             signals.append({
@@ -379,8 +357,8 @@ def strategy_4_ema_crossover(df):
                 'entry_price': entry_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'rsi': df['rsi'].iloc[i],
-                'volume_ratio': df['volume'].iloc[i] / df['volume_avg'].iloc[i]
+                'rsi': rsi.iloc[i],
+                'volume_ratio': volume.iloc[i] / volume_avg.iloc[i]
             })
     
     return signals
@@ -390,11 +368,33 @@ def strategy_4_ema_crossover(df):
 # BACKTEST ENGINE
 # ============================================================================
 
-def simulate_trade(signal, df_future):
-    """Simulate trade execution and calculate P&L"""
-    entry_price = signal['entry_price']
-    stop_loss = signal['stop_loss']
-    take_profit = signal['take_profit']
+def simulate_trades(signals, df):
+    """
+    Simulate trade execution and calculate P&L for all signals of one stock
+
+    Exits are resolved for every signal at once by exit_engine.resolve_exits;
+    signals with fewer than 5 bars after the signal date are skipped.
+    
+    Returns:
+        dict: {column: array} batch of trades (signal fields, then trade fields)
+    """
+    if len(signals) == 0:
+        return {}
+    
+    exits = resolve_exits(
+        df['time'].to_numpy(),
+        df['low'].to_numpy(),
+        df['high'].to_numpy(),
+        df['close'].to_numpy(),
+        entry_dates=[signal['date'] for signal in signals],
+        stop_losses=[signal['stop_loss'] for signal in signals],
+        take_profits=[signal['take_profit'] for signal in signals],
+        max_hold_days=[signal.get('hold_days', 30) for signal in signals],
+        min_future_bars=5
+    )
+    
+    entry_dates = np.asarray([signal['date'] for signal in signals], dtype='datetime64[ns]')
+    entry_price = np.asarray([signal['entry_price'] for signal in signals], dtype=np.float64)
     
     # Apply slippage
     entry_price_actual = entry_price * (1 + SLIPPAGE)
@@ -403,44 +403,8 @@ def simulate_trade(signal, df_future):
     shares = (INITIAL_CAPITAL * POSITION_SIZE) / entry_price_actual
     commission_entry = entry_price_actual * shares * COMMISSION
     
-    # Find exit
-    exit_date = None
-    exit_price = None
-    exit_reason = None
-    
-    max_hold_days = signal.get('hold_days', 30)
-    
-    for i, row in df_future.iterrows():
-        days_held = (row['time'] - signal['date']).days
-        
-        if days_held > max_hold_days:
-            exit_date = row['time']
-            exit_price = row['close']
-            exit_reason = 'MAX_HOLD'
-            break
-        
-        # Check stop loss
-        if row['low'] <= stop_loss:
-            exit_date = row['time']
-            exit_price = stop_loss
-            exit_reason = 'STOP_LOSS'
-            break
-        
-        # Check take profit
-        if row['high'] >= take_profit:
-            exit_date = row['time']
-            exit_price = take_profit
-            exit_reason = 'TAKE_PROFIT'
-            break
-    
-    # If no exit
-    if exit_date is None:
-        exit_date = df_future.iloc[-1]['time']
-        exit_price = df_future.iloc[-1]['close']
-        exit_reason = 'END_OF_DATA'
-    
     # Apply slippage
-    exit_price_actual = exit_price * (1 - SLIPPAGE)
+    exit_price_actual = exits['exit_price'] * (1 - SLIPPAGE)
     
     # Calculate P&L
     commission_exit = exit_price_actual * shares * COMMISSION
@@ -451,23 +415,34 @@ def simulate_trade(signal, df_future):
     
     pnl_percent = (net_pnl / (entry_price_actual * shares)) * 100
     
-    return {
-        'entry_date': signal['date'],
-        'exit_date': exit_date,
-        'days_held': (exit_date - signal['date']).days,
-        'entry_price': entry_price_actual,
-        'exit_price': exit_price_actual,
-        'shares': shares,
-        'gross_pnl': gross_pnl,
-        'net_pnl': net_pnl,
-        'pnl_percent': pnl_percent,
-        'exit_reason': exit_reason,
-        'commission': total_commission
-    }
+    days_held = (exits['exit_time'] - entry_dates) // np.timedelta64(1, 'D')
+    
+    valid = np.flatnonzero(exits['valid'])
+    if len(valid) == 0:
+        return {}
+    
+    # Same column order as {**signal, **trade}
+    signal_columns = pd.DataFrame([signals[i] for i in valid])
+    trades = {name: signal_columns[name].to_numpy() for name in signal_columns.columns}
+    trades.update({
+        'entry_date': entry_dates[valid],
+        'exit_date': exits['exit_time'][valid],
+        'days_held': days_held[valid],
+        'entry_price': entry_price_actual[valid],
+        'exit_price': exit_price_actual[valid],
+        'shares': shares[valid],
+        'gross_pnl': gross_pnl[valid],
+        'net_pnl': net_pnl[valid],
+        'pnl_percent': pnl_percent[valid],
+        'exit_reason': exits['exit_reason'][valid],
+        'commission': total_commission[valid]
+    })
+    
+    return trades
 
 
 def backtest_stock(ticker, df, strategies):
-    """Backtest all strategies on one stock"""
+    """Backtest all strategies on one stock (trades as a ColumnarLedger)"""
     print(f"\n{'='*70}")
     print(f"Backtesting: {ticker}")
     print(f"{'='*70}")
@@ -477,11 +452,15 @@ def backtest_stock(ticker, df, strategies):
     
     if df is None or len(df) < 100:
         print(f"⚠️  Not enough data: {len(df) if df is not None else 0} rows")
-        return []
+        return ColumnarLedger(memory_budget_mb=None)
     
     print(f"✅ Loaded {len(df)} rows ({df['time'].min()} to {df['time'].max()})")
     
-    all_trades = []
+    all_trades = ColumnarLedger(memory_budget_mb=None)
+    
+    # Indicators are computed once per ticker and shared by all strategies;
+    # not via the shared cache - each ticker is seen once per run
+    ind = IndicatorFrame(df)
     
     # Run each strategy
     for strategy_func in strategies:
@@ -489,20 +468,11 @@ def backtest_stock(ticker, df, strategies):
         print(f"\n📊 Testing {strategy_name}...", end=" ")
         
         try:
-            signals = strategy_func(df.copy())
+            signals = strategy_func(df, ind)
             print(f"Found {len(signals)} signals")
             
             # Simulate trades
-            for signal in signals:
-                signal_date = signal['date']
-                df_future = df[df['time'] > signal_date].reset_index(drop=True)
-                
-                if len(df_future) < 5:
-                    continue
-                
-                trade_result = simulate_trade(signal, df_future)
-                trade = {**signal, **trade_result}
-                all_trades.append(trade)
+            all_trades.extend(simulate_trades(signals, df))
         
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -511,82 +481,67 @@ def backtest_stock(ticker, df, strategies):
 
 
 def analyze_results(all_trades):
-    """Analyze backtest results"""
-    df = pd.DataFrame(all_trades)
-    
-    if len(df) == 0:
+    """Analyze backtest results (ColumnarLedger of trades), per strategy"""
+    if len(all_trades) == 0:
         print("\n❌ No trades to analyze!")
-        return {}, df
+        return {}
     
     print(f"\n{'='*70}")
     print(f"BACKTEST RESULTS")
     print(f"{'='*70}")
     
+    per_strategy = trade_metrics(
+        all_trades,
+        by='strategy',
+        return_col='pnl_percent',
+        pnl_col='net_pnl',
+        hold_col='days_held',
+        date_col='exit_date',
+        capital=INITIAL_CAPITAL,
+        position_size=POSITION_SIZE
+    )
+    
     results = {}
     
-    for strategy in df['strategy'].unique():
-        strategy_trades = df[df['strategy'] == strategy]
-        
-        total_trades = len(strategy_trades)
-        winning_trades = len(strategy_trades[strategy_trades['net_pnl'] > 0])
-        losing_trades = len(strategy_trades[strategy_trades['net_pnl'] <= 0])
-        
-        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-        
-        avg_win = strategy_trades[strategy_trades['net_pnl'] > 0]['pnl_percent'].mean()
-        avg_loss = strategy_trades[strategy_trades['net_pnl'] <= 0]['pnl_percent'].mean()
-        
-        total_pnl = strategy_trades['net_pnl'].sum()
-        total_return = (total_pnl / INITIAL_CAPITAL) * 100
-        
-        avg_hold_days = strategy_trades['days_held'].mean()
-        
-        # Max drawdown
-        cumulative_pnl = strategy_trades['net_pnl'].cumsum()
-        running_max = cumulative_pnl.cummax()
-        drawdown = (cumulative_pnl - running_max) / INITIAL_CAPITAL * 100
-        max_drawdown = drawdown.min()
-        
+    for strategy, m in zip(per_strategy.index, per_strategy.to_dict('records')):
         results[strategy] = {
-            'total_trades': total_trades,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': win_rate,
-            'avg_win': avg_win,
-            'avg_loss': avg_loss,
-            'profit_factor': abs(avg_win * winning_trades / (avg_loss * losing_trades)) if losing_trades > 0 and avg_loss != 0 else float('inf'),
-            'total_pnl': total_pnl,
-            'total_return': total_return,
-            'avg_hold_days': avg_hold_days,
-            'max_drawdown': max_drawdown
+            key: m[key] for key in (
+                'total_trades', 'winning_trades', 'losing_trades', 'win_rate',
+                'avg_win', 'avg_loss', 'profit_factor', 'total_pnl', 'total_return',
+                'avg_hold_days', 'max_drawdown', 'sharpe', 'sortino', 'cagr', 'exposure'
+            )
         }
+        win_rate = m['win_rate']
         
         print(f"\n{'='*70}")
         print(f"STRATEGY: {strategy}")
         print(f"{'='*70}")
-        print(f"Total Trades:      {total_trades:,}")
-        print(f"Winning Trades:    {winning_trades:,} ({win_rate:.1f}%)")
-        print(f"Losing Trades:     {losing_trades:,} ({100-win_rate:.1f}%)")
+        print(f"Total Trades:      {m['total_trades']:,}")
+        print(f"Winning Trades:    {m['winning_trades']:,} ({win_rate:.1f}%)")
+        print(f"Losing Trades:     {m['losing_trades']:,} ({100-win_rate:.1f}%)")
         print(f"")
-        print(f"Average Win:       {avg_win:+.2f}%")
-        print(f"Average Loss:      {avg_loss:+.2f}%")
-        print(f"Profit Factor:     {results[strategy]['profit_factor']:.2f}")
+        print(f"Average Win:       {m['avg_win']:+.2f}%")
+        print(f"Average Loss:      {m['avg_loss']:+.2f}%")
+        print(f"Profit Factor:     {m['profit_factor']:.2f}")
         print(f"")
-        print(f"Total P&L:         {total_pnl:+,.0f} VND")
-        print(f"Total Return:      {total_return:+.2f}%")
-        print(f"Average Hold:      {avg_hold_days:.1f} days")
-        print(f"Max Drawdown:      {max_drawdown:.2f}%")
+        print(f"Total P&L:         {m['total_pnl']:+,.0f} VND")
+        print(f"Total Return:      {m['total_return']:+.2f}%")
+        print(f"CAGR:              {m['cagr']:+.2f}%")
+        print(f"Sharpe / Sortino:  {m['sharpe']:.2f} / {m['sortino']:.2f}")
+        print(f"Exposure:          {m['exposure']:.1f}%")
+        print(f"Average Hold:      {m['avg_hold_days']:.1f} days")
+        print(f"Max Drawdown:      {m['max_drawdown']:.2f}%")
     
-    return results, df
+    return results
 
 
-def save_results(results, all_trades_df):
+def save_results(results, all_trades):
     """Save results to files"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     # Save trades
     trades_file = f"{RESULTS_FOLDER}/all_trades_{timestamp}.csv"
-    all_trades_df.to_csv(trades_file, index=False, encoding='utf-8-sig')
+    all_trades.to_csv(trades_file, encoding='utf-8-sig')
     print(f"\n✅ Trades saved to: {trades_file}")
     
     # Save summary
@@ -608,16 +563,72 @@ def save_results(results, all_trades_df):
             f.write(f"  Total Return: {metrics['total_return']:+.2f}%\n")
             f.write(f"  Profit Factor: {metrics['profit_factor']:.2f}\n")
             f.write(f"  Max Drawdown: {metrics['max_drawdown']:.2f}%\n")
+            f.write(f"  CAGR: {metrics['cagr']:+.2f}%\n")
+            f.write(f"  Sharpe: {metrics['sharpe']:.2f}\n")
     
     print(f"✅ Summary saved to: {summary_file}")
 
 
+# ============================================================================
+# PARALLEL RUNNER
+# ============================================================================
+
+_worker_store = None
+_worker_strategies = None
+
+
+def _init_worker(store_root, strategies):
+    """Each worker opens its own handle on the on-disk store"""
+    global _worker_store, _worker_strategies
+    _worker_store = MarketDataStore(store_root)
+    _worker_strategies = strategies
+
+
+def _backtest_ticker(ticker):
+    """Worker task: read one ticker from the store and backtest it"""
+    return backtest_stock(ticker, _worker_store[ticker], _worker_strategies)
+
+
+def run_backtests(all_stocks_data, stock_tickers, strategies, workers=1):
+    """
+    Backtest tickers, optionally sharded across a process pool
+    
+    Workers receive only ticker names and read their own tickers from the
+    store, so the universe is never pickled to the pool.
+    
+    Yields:
+        (ticker, trades) in stock_tickers order
+    """
+    if workers <= 1 or not isinstance(all_stocks_data, MarketDataStore):
+        for ticker in stock_tickers:
+            yield ticker, backtest_stock(ticker, all_stocks_data[ticker], strategies)
+        return
+    
+    chunksize = max(1, len(stock_tickers) // (workers * 8))
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(os.path.abspath(all_stocks_data.root), strategies)
+    ) as executor:
+        results = executor.map(_backtest_ticker, stock_tickers, chunksize=chunksize)
+        for ticker, trades in zip(stock_tickers, results):
+            yield ticker, trades
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
 
 def main():
     """Main backtest function"""
+    parser = argparse.ArgumentParser(description='Backtest 4 strategies on downloaded data')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1)')
+    parser.add_argument('--stocks', type=int, default=None,
+                        help='Number of stocks to test (default: ask)')
+    args = parser.parse_args()
+    
     print("="*70)
     print("AI ADVISOR - BACKTEST 4 STRATEGIES")
     print("="*70)
@@ -625,6 +636,7 @@ def main():
     print(f"Period: {START_DATE} to {END_DATE}")
     print(f"Initial Capital: {INITIAL_CAPITAL:,} VND")
     print(f"Position Size: {POSITION_SIZE*100}%")
+    print(f"Workers: {args.workers}")
     print("="*70)
     
     # Load data from PKL
@@ -637,11 +649,14 @@ def main():
     print(f"\n✅ Stocks available: {len(all_stocks_data)}")
     
     # Ask how many to test
-    try:
-        num_stocks = int(input(f"\nHow many stocks to test? (max {len(all_stocks_data)}): "))
-        num_stocks = min(num_stocks, len(all_stocks_data))
-    except:
-        num_stocks = len(all_stocks_data)
+    if args.stocks is not None:
+        num_stocks = min(args.stocks, len(all_stocks_data))
+    else:
+        try:
+            num_stocks = int(input(f"\nHow many stocks to test? (max {len(all_stocks_data)}): "))
+            num_stocks = min(num_stocks, len(all_stocks_data))
+        except:
+            num_stocks = len(all_stocks_data)
     
     # Get stock tickers
     stock_tickers = list(all_stocks_data.keys())[:num_stocks]
@@ -654,18 +669,16 @@ def main():
         strategy_4_ema_crossover
     ]
     
-    # Run backtest
-    all_trades = []
+    # Run backtest (trades beyond the ledger's memory budget spill to disk)
+    all_trades = ColumnarLedger()
     
-    for ticker in stock_tickers:
-        df = all_stocks_data[ticker]
-        trades = backtest_stock(ticker, df, strategies)
+    for ticker, trades in run_backtests(all_stocks_data, stock_tickers, strategies, args.workers):
         all_trades.extend(trades)
     
     # Analyze results
     if len(all_trades) > 0:
-        results, trades_df = analyze_results(all_trades)
-        save_results(results, trades_df)
+        results = analyze_results(all_trades)
+        save_results(results, all_trades)
         
         print(f"\n{'='*70}")
         print("BACKTEST COMPLETE!")
@@ -675,6 +688,8 @@ def main():
         print(f"Results saved to: {RESULTS_FOLDER}/")
     else:
         print("\n❌ No trades generated. Check data and parameters.")
+    
+    all_trades.close()
 
 
 if __name__ == "__main__":
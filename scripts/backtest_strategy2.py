@@ -33,6 +33,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from breakout_confirmation_scanner import BreakoutConfirmationDetector
+from metrics import trade_metrics
 
 
 def backtest_stock(code, start_date, end_date, detector):
@@ -152,40 +153,8 @@ def backtest_stock(code, start_date, end_date, detector):
 
 
 def calculate_metrics(trades):
-    """Calculate performance metrics"""
-    if not trades:
-        return {
-            'total_trades': 0,
-            'win_rate': 0,
-            'profit_factor': 0,
-            'total_return': 0
-        }
-    
-    returns = [t['return_pct'] for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r < 0]
-    
-    win_rate = (len(wins) / len(returns)) * 100 if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    # Total return (assuming 15% position size per trade)
-    total_return = sum(returns) * 0.15
-    
-    return {
-        'total_trades': len(trades),
-        'winning_trades': len(wins),
-        'losing_trades': len(losses),
-        'win_rate': win_rate,
-        'avg_win': np.mean(wins) if wins else 0,
-        'avg_loss': np.mean(losses) if losses else 0,
-        'profit_factor': profit_factor,
-        'total_return': total_return,
-        'best_trade': max(returns) if returns else 0,
-        'worst_trade': min(returns) if returns else 0
-    }
+    """Calculate performance metrics (15% position size per trade)"""
+    return trade_metrics(trades, return_col='return_pct', position_size=0.15)
 
 
 def main():
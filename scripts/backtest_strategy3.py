@@ -33,6 +33,20 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from trend_pullback_scanner import TrendPullbackDetector
+from metrics import trade_metrics
+from exit_engine import apply_exit_policy
+
+# TP1 +5% (1/3), TP2 +10% (1/3), trail EMA20 (final 1/3), SL EMA50 - 1%, max 60 days
+EXIT_POLICY = {
+    'stop_loss': {'column': 'ema50', 'pct': -1.0},
+    'take_profits': [
+        {'pct': 5.0, 'portion': 0.33, 'reason': 'TP1'},
+        {'pct': 10.0, 'portion': 0.33, 'reason': 'TP2'}
+    ],
+    'trailing': {'column': 'ema20', 'reason': 'TRAILING_EMA20'},
+    'max_bars': 60,
+    'time_reason': 'END_OF_DATA'
+}
 
 
 def backtest_stock(code, start_date, end_date, detector):
@@ -62,131 +76,68 @@ def backtest_stock(code, start_date, end_date, detector):
         df = detector.detect_signal(df)
         
         # Find buy signals
-        signals = df[df['buy_signal'] == True].copy()
+        signal_locs = np.flatnonzero((df['buy_signal'] == True).to_numpy())
         
-        if len(signals) == 0:
+        if len(signal_locs) == 0:
             return []
         
+        # Resolve the exits of all signals at once
+        fills = apply_exit_policy(df, signal_locs, EXIT_POLICY)
+        take_profits = EXIT_POLICY['take_profits']
+        
         # Execute trades
         trades = []
         
-        for signal_idx, signal_row in signals.iterrows():
-            # Entry details
-            entry_date = signal_row.name
-            entry_price = float(signal_row['close'])
-            ema50 = float(signal_row['ema50'])
-            
-            # Risk management
-            stop_loss = ema50 * 0.99  # EMA50 - 1%
-            tp1 = entry_price * 1.05  # +5%
-            tp2 = entry_price * 1.10  # +10%
-            
-            # Get future bars
-            entry_idx = df.index.get_loc(signal_idx)
-            future_bars = df.iloc[entry_idx + 1:entry_idx + 61]  # Max 60 days
-            
-            if len(future_bars) == 0:
+        for i, entry_idx in enumerate(signal_locs):
+            if not fills['valid'][i]:
                 continue
             
-            # Track positions (3 parts: 33%, 33%, 34%)
-            position_1 = 0.33  # First third
-            position_2 = 0.33  # Second third
-            position_3 = 0.34  # Final third (slightly larger for rounding)
+            signal_row = df.iloc[entry_idx]
+            entry_price = float(signal_row['close'])
             
             exits = []
-            remaining_position = 1.0
-            
-            for future_idx, future_bar in future_bars.iterrows():
-                current_high = float(future_bar['high'])
-                current_low = float(future_bar['low'])
-                current_close = float(future_bar['close'])
-                current_ema20 = float(future_bar['ema20'])
-                
-                # Check TP1 (sell first 1/3)
-                if remaining_position > 0.65 and current_high >= tp1:
+            for k, tp in enumerate(take_profits):
+                tp_idx = fills['tp_idx'][i, k]
+                if tp_idx >= 0:
                     exits.append({
-                        'date': future_bar.name,
-                        'price': tp1,
-                        'portion': position_1,
-                        'reason': 'TP1',
-                        'return_pct': 5.0
+                        'date': df.index[tp_idx],
+                        'price': float(fills['tp_price'][i, k]),
+                        'portion': tp['portion'],
+                        'reason': tp['reason'],
+                        'return_pct': tp['pct']
                     })
-                    remaining_position -= position_1
-                
-                # Check TP2 (sell second 1/3)
-                if 0.30 < remaining_position <= 0.67 and current_high >= tp2:
-                    exits.append({
-                        'date': future_bar.name,
-                        'price': tp2,
-                        'portion': position_2,
-                        'reason': 'TP2',
-                        'return_pct': 10.0
-                    })
-                    remaining_position -= position_2
-                
-                # Check Stop Loss (for ALL remaining)
-                if current_low <= stop_loss:
-                    if remaining_position > 0:
-                        return_pct = ((stop_loss - entry_price) / entry_price) * 100
-                        exits.append({
-                            'date': future_bar.name,
-                            'price': stop_loss,
-                            'portion': remaining_position,
-                            'reason': 'STOP_LOSS',
-                            'return_pct': return_pct
-                        })
-                        remaining_position = 0
-                        break
-                
-                # Check Trailing Stop (EMA20) for final portion
-                if remaining_position <= 0.35:  # Only final third left
-                    if current_close < current_ema20:
-                        # Exit at close
-                        return_pct = ((current_close - entry_price) / entry_price) * 100
-                        exits.append({
-                            'date': future_bar.name,
-                            'price': current_close,
-                            'portion': remaining_position,
-                            'reason': 'TRAILING_EMA20',
-                            'return_pct': return_pct
-                        })
-                        remaining_position = 0
-                        break
             
-            # If still have position at end, close at last price
-            if remaining_position > 0:
-                last_bar = future_bars.iloc[-1]
-                last_price = float(last_bar['close'])
-                return_pct = ((last_price - entry_price) / entry_price) * 100
+            # Stop loss / trailing EMA20 / end of window for the rest
+            if fills['exit_portion'][i] > 0:
+                exit_price = float(fills['exit_price'][i])
                 exits.append({
-                    'date': last_bar.name,
-                    'price': last_price,
-                    'portion': remaining_position,
-                    'reason': 'END_OF_DATA',
-                    'return_pct': return_pct
+                    'date': df.index[fills['exit_idx'][i]],
+                    'price': exit_price,
+                    'portion': float(fills['exit_portion'][i]),
+                    'reason': fills['exit_reason'][i],
+                    'return_pct': ((exit_price - entry_price) / entry_price) * 100
                 })
             
             # Calculate total return (weighted average)
-            if exits:
-                total_return = sum(e['portion'] * e['return_pct'] for e in exits)
-                
-                trade = {
-                    'code': code,
-                    'entry_date': entry_date,
-                    'entry_price': entry_price,
-                    'stop_loss': stop_loss,
-                    'tp1': tp1,
-                    'tp2': tp2,
-                    'exits': exits,
-                    'total_return': total_return,
-                    'num_exits': len(exits),
-                    'ema20': float(signal_row['ema20']),
-                    'ema50': ema50,
-                    'rsi': float(signal_row['rsi']),
-                    'pullback_pct': float(signal_row['pullback_pct'])
-                }
-                
-                trades.append(trade)
+            total_return = sum(e['portion'] * e['return_pct'] for e in exits)
+            
+            trade = {
+                'code': code,
+                'entry_date': signal_row.name,
+                'entry_price': entry_price,
+                'stop_loss': float(fills['stop_loss'][i]),
+                'tp1': float(fills['tp_price'][i, 0]),
+                'tp2': float(fills['tp_price'][i, 1]),
+                'exits': exits,
+                'total_return': total_return,
+                'num_exits': len(exits),
+                'ema20': float(signal_row['ema20']),
+                'ema50': float(signal_row['ema50']),
+                'rsi': float(signal_row['rsi']),
+                'pullback_pct': float(signal_row['pullback_pct'])
+            }
+            
+            trades.append(trade)
         
         return trades
         
@@ -196,48 +147,22 @@ def backtest_stock(code, start_date, end_date, detector):
 
 
 def calculate_metrics(trades):
-    """Calculate performance metrics"""
+    """Calculate performance metrics (20% position size per trade)"""
+    metrics = trade_metrics(trades, return_col='total_return', position_size=0.20)
     if not trades:
-        return {
-            'total_trades': 0,
-            'win_rate': 0,
-            'profit_factor': 0,
-            'total_return': 0
-        }
-    
-    returns = [t['total_return'] for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r < 0]
-    
-    win_rate = (len(wins) / len(returns)) * 100 if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    # Total return (assuming 20% position size per trade)
-    total_return = sum(returns) * 0.20
+        return metrics
     
     # Calculate how many trades hit each TP
     tp1_hits = sum(1 for t in trades if any(e['reason'] == 'TP1' for e in t['exits']))
     tp2_hits = sum(1 for t in trades if any(e['reason'] == 'TP2' for e in t['exits']))
     trailing_exits = sum(1 for t in trades if any(e['reason'] == 'TRAILING_EMA20' for e in t['exits']))
     
-    return {
-        'total_trades': len(trades),
-        'winning_trades': len(wins),
-        'losing_trades': len(losses),
-        'win_rate': win_rate,
-        'avg_win': np.mean(wins) if wins else 0,
-        'avg_loss': np.mean(losses) if losses else 0,
-        'profit_factor': profit_factor,
-        'total_return': total_return,
-        'best_trade': max(returns) if returns else 0,
-        'worst_trade': min(returns) if returns else 0,
-        'tp1_hit_rate': (tp1_hits / len(trades)) * 100 if trades else 0,
-        'tp2_hit_rate': (tp2_hits / len(trades)) * 100 if trades else 0,
-        'trailing_rate': (trailing_exits / len(trades)) * 100 if trades else 0
-    }
+    metrics.update({
+        'tp1_hit_rate': (tp1_hits / len(trades)) * 100,
+        'tp2_hit_rate': (tp2_hits / len(trades)) * 100,
+        'trailing_rate': (trailing_exits / len(trades)) * 100
+    })
+    return metrics
 
 
 def main():
@@ -35,6 +35,14 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from ema_crossover_scanner import EMACrossoverDetector
+from metrics import trade_metrics
+from exit_engine import apply_exit_policy
+
+# -3% stop loss (checked first), otherwise hold until the death cross
+EXIT_POLICY = {
+    'stop_loss': {'pct': -3.0},
+    'signal': {'column': 'death_cross', 'reason': 'DEATH_CROSS'}
+}
 
 
 def backtest_stock(code, start_date, end_date, detector):
@@ -63,56 +71,26 @@ def backtest_stock(code, start_date, end_date, detector):
         df = detector.detect_signal(df)
         
         # Find golden cross signals (entries)
-        golden_crosses = df[df['golden_cross'] == True].copy()
+        entry_locs = np.flatnonzero((df['golden_cross'] == True).to_numpy())
         
-        if len(golden_crosses) == 0:
+        if len(entry_locs) == 0:
             return []
         
+        # Resolve the exits of all signals at once
+        fills = apply_exit_policy(df, entry_locs, EXIT_POLICY)
+        
         # Execute trades
         trades = []
         
-        for entry_idx, entry_row in golden_crosses.iterrows():
-            # Entry details
-            entry_date = entry_row.name
-            entry_price = float(entry_row['close'])
-            stop_loss = entry_price * 0.97  # -3%
-            
-            # Get future bars for exit simulation
-            entry_loc = df.index.get_loc(entry_idx)
-            future_bars = df.iloc[entry_loc + 1:]
-            
-            if len(future_bars) == 0:
+        for i, entry_loc in enumerate(entry_locs):
+            if not fills['valid'][i]:
                 continue
             
-            # Track trade
-            exit_price = None
-            exit_date = None
-            exit_reason = None
-            
-            for future_idx, future_bar in future_bars.iterrows():
-                current_price = float(future_bar['close'])
-                current_low = float(future_bar['low'])
-                
-                # Check stop loss first (priority)
-                if current_low <= stop_loss:
-                    exit_price = stop_loss
-                    exit_date = future_bar.name
-                    exit_reason = 'STOP_LOSS'
-                    break
-                
-                # Check death cross
-                if future_bar['death_cross']:
-                    exit_price = current_price
-                    exit_date = future_bar.name
-                    exit_reason = 'DEATH_CROSS'
-                    break
-            
-            # If no exit signal, close at last bar
-            if exit_price is None:
-                last_bar = future_bars.iloc[-1]
-                exit_price = float(last_bar['close'])
-                exit_date = last_bar.name
-                exit_reason = 'END_OF_DATA'
+            entry_row = df.iloc[entry_loc]
+            entry_date = entry_row.name
+            entry_price = float(entry_row['close'])
+            exit_price = float(fills['exit_price'][i])
+            exit_date = df.index[fills['exit_idx'][i]]
             
             # Calculate return
             return_pct = ((exit_price - entry_price) / entry_price) * 100
@@ -127,8 +105,8 @@ def backtest_stock(code, start_date, end_date, detector):
                 'exit_date': exit_date,
                 'exit_price': exit_price,
                 'return_pct': return_pct,
-                'exit_reason': exit_reason,
-                'stop_loss': stop_loss,
+                'exit_reason': fills['exit_reason'][i],
+                'stop_loss': float(fills['stop_loss'][i]),
                 'hold_days': hold_days,
                 'ema20_entry': float(entry_row['ema20']),
                 'ema50_entry': float(entry_row['ema50']),
@@ -145,53 +123,22 @@ def backtest_stock(code, start_date, end_date, detector):
 
 
 def calculate_metrics(trades):
-    """Calculate performance metrics"""
+    """Calculate performance metrics (20% position size per trade)"""
+    metrics = trade_metrics(trades, return_col='return_pct', hold_col='hold_days', position_size=0.20)
     if not trades:
-        return {
-            'total_trades': 0,
-            'win_rate': 0,
-            'profit_factor': 0,
-            'total_return': 0
-        }
-    
-    returns = [t['return_pct'] for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r < 0]
-    
-    win_rate = (len(wins) / len(returns)) * 100 if returns else 0
-    
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    # Total return (assuming 20% position size per trade)
-    total_return = sum(returns) * 0.20
-    
-    # Calculate hold days statistics
-    hold_days = [t['hold_days'] for t in trades]
-    avg_hold = np.mean(hold_days) if hold_days else 0
+        return metrics
     
     # Calculate exit reasons
     death_cross_exits = sum(1 for t in trades if t['exit_reason'] == 'DEATH_CROSS')
     stop_loss_exits = sum(1 for t in trades if t['exit_reason'] == 'STOP_LOSS')
     
-    return {
-        'total_trades': len(trades),
-        'winning_trades': len(wins),
-        'losing_trades': len(losses),
-        'win_rate': win_rate,
-        'avg_win': np.mean(wins) if wins else 0,
-        'avg_loss': np.mean(losses) if losses else 0,
-        'profit_factor': profit_factor,
-        'total_return': total_return,
-        'best_trade': max(returns) if returns else 0,
-        'worst_trade': min(returns) if returns else 0,
-        'avg_hold_days': avg_hold,
+    metrics.update({
         'death_cross_exits': death_cross_exits,
         'stop_loss_exits': stop_loss_exits,
-        'death_cross_pct': (death_cross_exits / len(trades)) * 100 if trades else 0,
-        'stop_loss_pct': (stop_loss_exits / len(trades)) * 100 if trades else 0
-    }
+        'death_cross_pct': (death_cross_exits / len(trades)) * 100,
+        'stop_loss_pct': (stop_loss_exits / len(trades)) * 100
+    })
+    return metrics
 
 
 def main():
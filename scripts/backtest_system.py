@@ -23,6 +23,11 @@ import sys
 import os
 from typing import Dict, List, Tuple
 
+from indicators import IndicatorFrame
+from ledger import ColumnarLedger
+from metrics import equity_metrics, trade_metrics
+from position_book import PositionBook
+
 try:
     from vnstock import Vnstock
 except ImportError:
@@ -55,9 +60,10 @@ class BacktestEngine:
         self.slippage_pct = slippage_pct
         self.commission_pct = commission_pct
         
-        self.positions = []  # Open positions
-        self.closed_trades = []  # Completed trades
-        self.equity_curve = []  # Daily equity
+        self.positions = PositionBook()  # Open positions
+        # One run fits in memory: no budget, so nothing spills to temp files
+        self.closed_trades = ColumnarLedger(memory_budget_mb=None)  # Completed trades
+        self.equity_curve = ColumnarLedger(memory_budget_mb=None)  # Daily equity
         
     def enter_position(
         self,
@@ -93,31 +99,32 @@ class BacktestEngine:
         self.capital -= total_cost
         
         # Create position
-        position = {
-            'code': code,
-            'entry_date': entry_date,
-            'entry_price': actual_entry,
-            'shares': shares,
-            'signal_type': signal_type,
-            'stop_loss': stop_loss,
-            'take_profit': take_profit,
-            'confidence': confidence,
-            'entry_value': trade_value,
-            'entry_commission': commission
-        }
-        
-        self.positions.append(position)
-        
-        return position
+        position_id = self.positions.add(
+            code,
+            entry_date,
+            signal_type,
+            shares=shares,
+            entry_price=actual_entry,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            confidence=confidence,
+            entry_value=trade_value,
+            entry_commission=commission
+        )
+        
+        return self.positions.get(position_id)
     
     def exit_position(
         self,
-        position: Dict,
+        position,
         exit_date: datetime,
         exit_price: float,
         exit_reason: str
     ):
-        """Exit an existing position"""
+        """Exit an existing position (position id or record from enter_position)"""
+        if not isinstance(position, dict):
+            position = self.positions.get(position)
+        
         # Apply slippage
         actual_exit = exit_price * (1 - self.slippage_pct)
         
@@ -146,54 +153,42 @@ class BacktestEngine:
             'hold_days': (exit_date - position['entry_date']).days
         }
         
-        self.closed_trades.append(trade)
-        
         # Remove from positions
-        self.positions.remove(position)
+        self.positions.remove(trade.pop('id'))
+        
+        self.closed_trades.append(trade)
         
         return trade
     
     def check_stops(self, current_date: datetime, current_prices: Dict[str, float]):
         """Check if any positions hit stop loss or take profit"""
-        for position in self.positions[:]:  # Copy list to avoid modification during iteration
-            code = position['code']
-            
-            if code not in current_prices:
-                continue
-            
-            current_price = current_prices[code]
-            
-            # Check stop loss
-            if current_price <= position['stop_loss']:
-                self.exit_position(
-                    position,
-                    current_date,
-                    current_price,
-                    'STOP_LOSS'
-                )
-                continue
-            
-            # Check take profit
-            if current_price >= position['take_profit']:
-                self.exit_position(
-                    position,
-                    current_date,
-                    current_price,
-                    'TAKE_PROFIT'
-                )
-                continue
+        slots, prices = self.positions.priced_slots(current_prices)
+        if len(slots) == 0:
+            return
+        
+        # One comparison against the day's price vector for all positions
+        hit_stop, hit_target = self.positions.stop_hits(slots, prices)
+        hit = hit_stop | hit_target
+        if not hit.any():
+            return
+        
+        position_ids = self.positions.data['id'][slots[hit]].tolist()
+        for position_id, price, is_stop in zip(position_ids, prices[hit].tolist(), hit_stop[hit].tolist()):
+            self.exit_position(
+                position_id,
+                current_date,
+                price,
+                'STOP_LOSS' if is_stop else 'TAKE_PROFIT'
+            )
     
     def update_equity(self, current_date: datetime, current_prices: Dict[str, float]):
         """Update equity curve"""
         # Start with available capital
         equity = self.capital
         
-        # Add unrealized P&L from open positions
-        for position in self.positions:
-            code = position['code']
-            if code in current_prices:
-                current_value = position['shares'] * current_prices[code]
-                equity += current_value
+        # Add market value of open positions that have a price today
+        slots, prices = self.positions.priced_slots(current_prices)
+        equity += self.positions.market_value(slots, prices)
         
         self.equity_curve.append({
             'date': current_date,
@@ -219,64 +214,51 @@ class BacktestEngine:
                 'expectancy': 0,
                 'profit_factor': 0,
                 'avg_hold_days': 0,
-                'max_drawdown': 0
+                'max_drawdown': 0,
+                'sharpe': 0,
+                'sortino': 0,
+                'cagr': 0,
+                'exposure': 0
             }
         
-        df = pd.DataFrame(self.closed_trades)
+        m = trade_metrics(
+            self.closed_trades,
+            return_col='profit_pct',
+            pnl_col='profit',
+            hold_col='hold_days',
+            date_col='exit_date',
+            capital=self.initial_capital,
+            position_size=self.position_size_pct
+        )
+        
+        # Daily curve when one was kept, else realized equity after each exit
+        if self.equity_curve:
+            curve = equity_metrics(self.equity_curve)
+            for key in ('max_drawdown', 'sharpe', 'sortino', 'cagr', 'exposure'):
+                m[key] = curve[key]
         
-        # Basic metrics
-        total_trades = len(df)
-        winning_trades = len(df[df['profit'] > 0])
-        losing_trades = len(df[df['profit'] <= 0])
-        win_rate = (winning_trades / total_trades) * 100
-        
-        # Profit metrics
-        total_profit = df['profit'].sum()
         total_return = ((self.capital - self.initial_capital) / self.initial_capital) * 100
         
-        avg_profit = df[df['profit'] > 0]['profit_pct'].mean() if winning_trades > 0 else 0
-        avg_loss = df[df['profit'] <= 0]['profit_pct'].mean() if losing_trades > 0 else 0
-        
-        # Risk metrics
-        max_profit = df['profit_pct'].max()
-        max_loss = df['profit_pct'].min()
-        
-        # Expectancy
-        if losing_trades > 0:
-            expectancy = (win_rate/100 * avg_profit) + ((1-win_rate/100) * avg_loss)
-        else:
-            expectancy = avg_profit
-        
-        # Profit factor
-        gross_profit = df[df['profit'] > 0]['profit'].sum()
-        gross_loss = abs(df[df['profit'] <= 0]['profit'].sum())
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-        
-        # Average hold time
-        avg_hold_days = df['hold_days'].mean()
-        
-        # Max drawdown
-        equity_series = pd.DataFrame(self.equity_curve)['equity']
-        running_max = equity_series.expanding().max()
-        drawdown = (equity_series - running_max) / running_max * 100
-        max_drawdown = drawdown.min()
-        
         return {
-            'total_trades': total_trades,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': round(win_rate, 2),
+            'total_trades': m['total_trades'],
+            'winning_trades': m['winning_trades'],
+            'losing_trades': m['losing_trades'],
+            'win_rate': round(m['win_rate'], 2),
             'total_return': round(total_return, 2),
             'final_capital': round(self.capital, 2),
-            'total_profit': round(total_profit, 2),
-            'avg_profit': round(avg_profit, 2),
-            'avg_loss': round(avg_loss, 2),
-            'max_profit': round(max_profit, 2),
-            'max_loss': round(max_loss, 2),
-            'expectancy': round(expectancy, 2),
-            'profit_factor': round(profit_factor, 2),
-            'avg_hold_days': round(avg_hold_days, 1),
-            'max_drawdown': round(max_drawdown, 2)
+            'total_profit': round(m['total_pnl'], 2),
+            'avg_profit': round(m['avg_win'], 2),
+            'avg_loss': round(m['avg_loss'], 2),
+            'max_profit': round(m['best_trade'], 2),
+            'max_loss': round(m['worst_trade'], 2),
+            'expectancy': round(m['expectancy'], 2),
+            'profit_factor': round(m['profit_factor'], 2),
+            'avg_hold_days': round(m['avg_hold_days'], 1),
+            'max_drawdown': round(m['max_drawdown'], 2),
+            'sharpe': round(m['sharpe'], 2),
+            'sortino': round(m['sortino'], 2),
+            'cagr': round(m['cagr'], 2),
+            'exposure': round(m['exposure'], 1)
         }
 
 
@@ -301,43 +283,57 @@ class StrategyBacktester:
         code: str,
         start_date: str,
         end_date: str,
-        engine: BacktestEngine
+        engine: BacktestEngine,
+        df: pd.DataFrame = None,
+        ind: IndicatorFrame = None
     ) -> List[Dict]:
         """
         Backtest strategy on one stock
         
+        Args:
+            df: Preloaded history (sorted, 0..n-1 index); fetched if None
+            ind: IndicatorFrame of df, shared across parameter sets
+        
         Returns:
             List of signals generated
         """
         print(f"  Backtesting {code}...", file=sys.stderr)
         
-        # Fetch historical data
-        try:
-            stock = Vnstock().stock(symbol=code, source='VCI')
-            df = stock.quote.history(
-                symbol=code,
-                start=start_date,
-                end=end_date
-            )
-            
-            if df.empty or len(df) < 50:
+        if df is not None:
+            if len(df) < 50:
                 print(f"    → Not enough data", file=sys.stderr)
                 return []
             
-            # Sort by date
-            df = df.sort_values('time')
-            df = df.reset_index(drop=True)
-            
-        except Exception as e:
-            print(f"    → Error fetching data: {e}", file=sys.stderr)
-            return []
+            # Detectors add their columns in place
+            df = df.copy()
+        else:
+            # Fetch historical data
+            try:
+                stock = Vnstock().stock(symbol=code, source='VCI')
+                df = stock.quote.history(
+                    symbol=code,
+                    start=start_date,
+                    end=end_date
+                )
+                
+                if df.empty or len(df) < 50:
+                    print(f"    → Not enough data", file=sys.stderr)
+                    return []
+                
+                # Sort by date
+                df = df.sort_values('time')
+                df = df.reset_index(drop=True)
+                
+            except Exception as e:
+                print(f"    → Error fetching data: {e}", file=sys.stderr)
+                return []
         
         # Create detector
         detector = self.detector_class(**self.params)
         
         # Detect signals
         try:
-            df = detector.detect_signal(df)
+            df = detector.detect_signal(df, ind)
         except Exception as e:
             print(f"    → Error detecting signals: {e}", file=sys.stderr)
             return []
@@ -408,15 +404,14 @@ class StrategyBacktester:
                 
             else:
                 # SELL signal (for this backtest, just close any open position in this stock)
-                for pos in engine.positions[:]:
-                    if pos['code'] == code:
-                        engine.exit_position(
-                            pos,
-                            signal['date'],
-                            signal['close'],
-                            'SIGNAL_EXIT'
-                        )
-                        print(f"    → SELL signal @ {signal['close']:,.0f}", file=sys.stderr)
+                for position_id in engine.positions.ids(code):
+                    engine.exit_position(
+                        position_id,
+                        signal['date'],
+                        signal['close'],
+                        'SIGNAL_EXIT'
+                    )
+                    print(f"    → SELL signal @ {signal['close']:,.0f}", file=sys.stderr)
         
         return signals
 
@@ -461,7 +456,9 @@ def run_backtest(
     start_date: str,
     end_date: str,
     params: Dict,
-    initial_capital: float = 100_000_000
+    initial_capital: float = 100_000_000,
+    data: Dict[str, pd.DataFrame] = None,
+    indicators: Dict[str, IndicatorFrame] = None
 ) -> Dict:
     """
     Run complete backtest for a strategy
@@ -473,6 +470,9 @@ def run_backtest(
         end_date: End date (YYYY-MM-DD)
         params: Strategy parameters
         initial_capital: Starting capital
+        data: Preloaded {code: DataFrame} (fetch_historical_data_batch);
+            stocks missing from it are skipped. Fetched per stock if None.
+        indicators: {code: IndicatorFrame} of data, reused across runs
         
     Returns:
         Backtest results
@@ -503,7 +503,13 @@ def run_backtest(
     all_signals = []
     
     for code in stock_codes:
-        signals = strategy.backtest_stock(code, start_date, end_date, engine)
+        if data is not None:
+            if code not in data:
+                continue
+            ind = indicators.get(code) if indicators else None
+            signals = strategy.backtest_stock(code, start_date, end_date, engine, data[code], ind)
+        else:
+            signals = strategy.backtest_stock(code, start_date, end_date, engine)
         all_signals.extend(signals)
     
     # Calculate metrics
@@ -534,8 +540,8 @@ def run_backtest(
         'stocks': stock_codes,
         'metrics': metrics,
         'signals_generated': len(all_signals),
-        'trades': engine.closed_trades,
-        'equity_curve': engine.equity_curve
+        'trades': engine.closed_trades.to_records(),
+        'equity_curve': engine.equity_curve.to_records()
     }
 
 
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DETECTORS - SO SÁNH BẢN VECTORIZED VỚI BẢN VÒNG LẶP
+
+Chạy detect_signal (vectorized) và bản tham chiếu bar-by-bar trên dữ liệu
+thật trong store, kiểm tra output giống hệt nhau, in thời gian.
+
+Usage:
+    python benchmark_detectors.py                 # all detectors, 20 stocks
+    python benchmark_detectors.py --stocks 100 --detector trend_pullback
+"""
+
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorFrame
+from market_store import open_store
+from breakout_confirmation_scanner import BreakoutConfirmationDetector
+from divergence_scanner import BearishDivergenceDetector
+from trend_pullback_scanner import TrendPullbackDetector
+
+DATA_FOLDER = "data_2025"
+
+SIGNAL_COLUMNS = ('buy_signal', 'bearish_divergence')
+
+
+# ============================================================================
+# REFERENCE IMPLEMENTATIONS (the original loops)
+# ============================================================================
+
+def trend_pullback_loop(detector, df, ind=None):
+    """Bar-by-bar TrendPullbackDetector.detect_signal"""
+    df = detector._add_indicators(df, ind)
+
+    # Initialize signal columns
+    df['uptrend'] = False
+    df['pullback'] = False
+    df['pullback_pct'] = np.nan
+    df['rsi_zone'] = False
+    df['bounce'] = False
+    df['buy_signal'] = False
+
+    for idx in range(len(df)):
+        current_idx = df.index[idx]
+
+        if idx < max(detector.ema_short, detector.ema_long, 20):
+            continue
+
+        current = df.loc[current_idx]
+
+        # Check uptrend
+        if detector.is_uptrend(df, current_idx):
+            df.loc[current_idx, 'uptrend'] = True
+
+        # Check pullback
+        is_pb, pb_pct = detector.is_pullback(df, current_idx)
+        if is_pb:
+            df.loc[current_idx, 'pullback'] = True
+            df.loc[current_idx, 'pullback_pct'] = pb_pct * 100
+
+        # Check RSI zone
+        if detector.rsi_lower <= current['rsi'] <= detector.rsi_upper:
+            df.loc[current_idx, 'rsi_zone'] = True
+
+        # Check bounce
+        if detector.is_bounce(df, current_idx):
+            df.loc[current_idx, 'bounce'] = True
+
+        # BUY SIGNAL: All conditions met
+        if (df.loc[current_idx, 'uptrend'] and
+            df.loc[current_idx, 'pullback'] and
+            df.loc[current_idx, 'rsi_zone'] and
+            df.loc[current_idx, 'bounce']):
+            df.loc[current_idx, 'buy_signal'] = True
+
+    return df
+
+
+def breakout_confirmation_loop(detector, df, ind=None):
+    """Bar-by-bar BreakoutConfirmationDetector.detect_signal"""
+    df = detector._add_indicators(df, ind)
+
+    # Initialize signal columns
+    df['consolidation'] = False
+    df['breakout'] = False
+    df['confirmation'] = None
+    df['buy_signal'] = False
+    df['breakout_level'] = np.nan
+    df['breakout_idx'] = np.nan
+
+    # Track breakouts waiting for confirmation
+    pending_breakouts = {}  # {idx: breakout_level}
+
+    for idx in range(len(df)):
+        current_idx = df.index[idx]
+
+        # Check consolidation
+        if detector.detect_consolidation(df, current_idx):
+            df.loc[current_idx, 'consolidation'] = True
+
+        # Check breakout (only if consolidation present in recent past)
+        recent_consolidation = df.loc[max(0, idx - 20):idx, 'consolidation'].any()
+
+        if recent_consolidation and detector.detect_breakout(df, current_idx):
+            df.loc[current_idx, 'breakout'] = True
+            df.loc[current_idx, 'breakout_level'] = df.loc[current_idx, 'close']
+            pending_breakouts[current_idx] = df.loc[current_idx, 'close']
+
+        # Check confirmation for pending breakouts
+        if pending_breakouts:
+            for breakout_idx, breakout_level in list(pending_breakouts.items()):
+                # Only check within 5 days of breakout
+                if idx - df.index.get_loc(breakout_idx) > 5:
+                    del pending_breakouts[breakout_idx]
+                    continue
+
+                confirmation_type = detector.detect_confirmation(df, breakout_idx, current_idx)
+
+                if confirmation_type:
+                    df.loc[current_idx, 'confirmation'] = confirmation_type
+                    df.loc[current_idx, 'buy_signal'] = True
+                    df.loc[current_idx, 'breakout_idx'] = breakout_idx
+                    df.loc[current_idx, 'breakout_level'] = breakout_level
+
+                    # Remove from pending
+                    del pending_breakouts[breakout_idx]
+
+    return df
+
+
+def bearish_divergence_loop(detector, df, lookback=20, all_bars=None):
+    """
+    Bar-by-bar BearishDivergenceDetector.detect_bearish_divergence
+
+    O(bars x peaks): the peaks in each bar's window are found by scanning
+    every peak.
+    """
+    # Find peaks in price (high)
+    price_peaks_idx = detector.find_peaks(df['high'], order=3)
+
+    # Find peaks in MACD
+    macd_peaks_idx = detector.find_peaks(df['macd'], order=3)
+
+    # Initialize divergence column
+    df['bearish_divergence'] = False
+
+    all_bars = detector.all_bars if all_bars is None else all_bars
+
+    # Check each recent bar
+    for i in range(0 if all_bars else len(df) - lookback, len(df)):
+        if i < lookback:
+            continue
+
+        # Get recent price peaks trong lookback window
+        recent_price_peaks = [idx for idx in price_peaks_idx 
+                             if i - lookback <= idx <= i]
+
+        # Get recent MACD peaks trong lookback window
+        recent_macd_peaks = [idx for idx in macd_peaks_idx 
+                            if i - lookback <= idx <= i]
+
+        # Need at least 2 peaks để compare
+        if len(recent_price_peaks) >= 2 and len(recent_macd_peaks) >= 2:
+            # Get 2 đỉnh gần nhất
+            price_peak1_idx = recent_price_peaks[-2]
+            price_peak2_idx = recent_price_peaks[-1]
+
+            macd_peak1_idx = recent_macd_peaks[-2]
+            macd_peak2_idx = recent_macd_peaks[-1]
+
+            # Get values
+            price_peak1 = df.iloc[price_peak1_idx]['high']
+            price_peak2 = df.iloc[price_peak2_idx]['high']
+
+            macd_peak1 = df.iloc[macd_peak1_idx]['macd']
+            macd_peak2 = df.iloc[macd_peak2_idx]['macd']
+
+            # Check divergence:
+            # Price: higher high (đỉnh sau > đỉnh trước)
+            # MACD: lower high (đỉnh sau < đỉnh trước)
+            is_price_higher = price_peak2 > price_peak1
+            is_macd_lower = macd_peak2 < macd_peak1
+
+            if is_price_higher and is_macd_lower:
+                df.at[i, 'bearish_divergence'] = True
+
+                # Store divergence info
+                df.at[i, 'divergence_strength'] = (
+                    (price_peak2 - price_peak1) / price_peak1 * 100 +
+                    (macd_peak1 - macd_peak2) / abs(macd_peak1) * 100
+                )
+
+    return df['bearish_divergence']
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _divergence_frame(df):
+    df = df.copy()
+    df['macd'], _, _ = IndicatorFrame(df).macd()
+    return df
+
+
+def _divergence_columns(df):
+    return df[[c for c in ('bearish_divergence', 'divergence_strength') if c in df.columns]]
+
+
+def _divergence(detector, df):
+    df = _divergence_frame(df)
+    detector.detect_bearish_divergence(df, detector.lookback_peaks)
+    return _divergence_columns(df)
+
+
+def _divergence_loop(detector, df):
+    df = _divergence_frame(df)
+    bearish_divergence_loop(detector, df, detector.lookback_peaks)
+    return _divergence_columns(df)
+
+
+# name -> (detector factory, fast(detector, df), reference(detector, df))
+DETECTORS = {
+    'trend_pullback': (
+        TrendPullbackDetector,
+        lambda detector, df: detector.detect_signal(df),
+        trend_pullback_loop
+    ),
+    'breakout_confirmation': (
+        BreakoutConfirmationDetector,
+        lambda detector, df: detector.detect_signal(df),
+        breakout_confirmation_loop
+    ),
+    # Full-history mode (every bar), as used in backtests
+    'divergence': (
+        partial(BearishDivergenceDetector, all_bars=True),
+        _divergence,
+        _divergence_loop
+    ),
+}
+
+
+def benchmark(name, stocks_data, tickers):
+    factory, fast, ref = DETECTORS[name]
+    detector = factory()
+
+    fast_time = 0.0
+    ref_time = 0.0
+    signals = 0
+
+    for ticker in tickers:
+        df = stocks_data[ticker]
+
+        start = time.perf_counter()
+        result = fast(detector, df)
+        fast_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = ref(detector, df)
+        ref_time += time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        signal_column = next(c for c in SIGNAL_COLUMNS if c in result.columns)
+        signals += int(result[signal_column].sum())
+
+    print(f"{name:20} {len(tickers):>4} stocks  "
+          f"loop: {ref_time:8.2f}s  vectorized: {fast_time:6.3f}s  "
+          f"speedup: {ref_time / max(fast_time, 1e-9):6.1f}x  signals: {signals}  ✅ identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized detectors")
+    parser.add_argument('--stocks', type=int, default=20, help="Number of stocks")
+    parser.add_argument('--detector', choices=list(DETECTORS), help="Only this detector")
+    args = parser.parse_args()
+
+    stocks_data = open_store(DATA_FOLDER, pkl_pattern='liquid_stocks')
+    tickers = stocks_data.tickers()[:args.stocks]
+
+    names = [args.detector] if args.detector else list(DETECTORS)
+    for name in names:
+        benchmark(name, stocks_data, tickers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK QUOTE SERVICE - SO SÁNH SPAWN-PER-CALL VỚI SERVICE THƯỜNG TRÚ
+
+Đo thời gian một lần lấy giá theo 2 cách:
+- spawn: chạy `python3 fetch_vnstock.py` cho mỗi lần gọi (cách cũ của
+  pages/api/history.ts)
+- service: GET /quote?codes=... tới `fetch_vnstock.py serve` đang chạy
+
+Usage:
+    python benchmark_quote_service.py                    # 5 spawn, 200 service calls
+    python benchmark_quote_service.py --spawn 3 --calls 1000 --codes VNM,FPT
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.request import urlopen
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fetch_vnstock.py')
+
+STARTUP_TIMEOUT = 60
+
+
+def _summary(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<10} {len(timings):>5} calls   "
+          f"mean {statistics.mean(timings) * 1000:9.2f} ms   "
+          f"p50 {statistics.median(timings) * 1000:9.2f} ms   "
+          f"p95 {p95 * 1000:9.2f} ms")
+    return statistics.mean(timings)
+
+
+def bench_spawn(n, codes):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, SCRIPT], capture_output=True, text=True, timeout=120)
+        data = json.loads(out.stdout)
+        prices = {s['code']: s['price'] for s in data.get('data', []) if s['code'] in codes}
+        timings.append(time.perf_counter() - start)
+    return timings, prices
+
+
+def bench_service(n, codes, url):
+    timings = []
+    query = f"{url}/quote?codes={','.join(codes)}"
+    for _ in range(n):
+        start = time.perf_counter()
+        with urlopen(query) as response:
+            data = json.loads(response.read())
+        prices = {s['code']: s['price'] for s in data.get('data', [])}
+        timings.append(time.perf_counter() - start)
+    return timings, prices
+
+
+def start_service(port):
+    proc = subprocess.Popen([sys.executable, SCRIPT, 'serve', '--port', str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(f"{url}/health", timeout=1):
+                return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Quote service did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quote service vs spawn-per-call")
+    parser.add_argument('--spawn', type=int, default=5, help="Spawn-per-call runs")
+    parser.add_argument('--calls', type=int, default=200, help="Service lookups")
+    parser.add_argument('--codes', default='VNM,FPT,HPG', help="Comma-separated tickers")
+    parser.add_argument('--port', type=int, default=8799)
+    args = parser.parse_args()
+
+    codes = [c.strip().upper() for c in args.codes.split(',') if c.strip()]
+
+    spawn_times, spawn_prices = bench_spawn(args.spawn, codes)
+    spawn_mean = _summary('spawn', spawn_times)
+
+    startup = time.perf_counter()
+    proc, url = start_service(args.port)
+    print(f"service started in {time.perf_counter() - startup:.2f}s (one-off)")
+    try:
+        service_times, service_prices = bench_service(args.calls, codes, url)
+    finally:
+        proc.terminate()
+        proc.wait()
+    service_mean = _summary('service', service_times)
+
+    print(f"speedup    {spawn_mean / service_mean:.0f}x per lookup")
+    same = {c: spawn_prices[c] for c in spawn_prices if c in service_prices} == \
+           {c: service_prices[c] for c in spawn_prices if c in service_prices}
+    print(f"prices match: {same}")
+
+
+if __name__ == '__main__':
+    main()
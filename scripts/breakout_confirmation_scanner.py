@@ -8,8 +8,12 @@ Chiến lược: Nền giá chặt → Breakout với volume → Xác nhận →
 
 import pandas as pd
 import numpy as np
+from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, Optional
 
+from indicators import IndicatorFrame
+
 
 class BreakoutConfirmationDetector:
     """
@@ -34,23 +38,6 @@ class BreakoutConfirmationDetector:
         self.breakout_lookback = breakout_lookback
     
     
-    def calculate_atr(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        """Calculate Average True Range"""
-        high = df['high']
-        low = df['low']
-        close = df['close']
-        
-        # True Range
-        tr1 = high - low
-        tr2 = abs(high - close.shift(1))
-        tr3 = abs(low - close.shift(1))
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        return atr
-    
-    
     def detect_consolidation(self, df: pd.DataFrame, idx: int) -> bool:
         """
         Check if price is consolidating
@@ -151,63 +138,137 @@ class BreakoutConfirmationDetector:
         return None
     
     
-    def detect_signal(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _add_indicators(self, df: pd.DataFrame, ind: Optional[IndicatorFrame] = None) -> pd.DataFrame:
+        ind = ind if ind is not None else IndicatorFrame(df)
+        df = df.copy()
+        
+        df['atr'] = ind.atr(14)
+        df['avg_volume_20'] = ind.sma('volume', 20)
+        df['highest_20'] = ind.rolling_max('high', self.breakout_lookback)
+        
+        return df
+    
+    
+    def _confirmation_at(self, high, low, close, volume, b: int, i: int) -> Optional[str]:
+        """detect_confirmation on NumPy arrays (positions b < i)"""
+        period = slice(b, i + 1)
+        volume_mean = _nanmean(volume[period])
+        
+        # Pullback test: back within 2% of breakout close, holds, lower volume
+        if (low[i] <= close[b] * 1.02 and close[i] > close[b] * 0.98
+                and volume[i] < volume_mean * 1.2):
+            return 'pullback'
+        
+        # Continuation: above breakout high with volume
+        if close[i] > high[b] and volume[i] >= volume_mean * 1.5:
+            return 'continuation'
+        
+        # Sideways: holds above breakout in a tight 3% range
+        if low[i] > close[b]:
+            range_pct = (_nanmax(high[period]) - _nanmin(low[period])) / _nanmean(close[period])
+            if range_pct < 0.03:
+                return 'sideways'
+        
+        return None
+    
+    
+    def detect_signal(self, df: pd.DataFrame, ind: Optional[IndicatorFrame] = None) -> pd.DataFrame:
         """
-        Main detection logic
+        Main detection logic - O(n) per ticker
+        
+        Consolidation and breakout are computed for all bars at once from
+        rolling windows; breakouts waiting for confirmation are tracked in
+        a deque that never holds more than 6 entries. Conditions are
+        written as "not (reject test)" so NaN bars behave exactly like
+        detect_consolidation / detect_breakout.
         
         Returns DataFrame with signals
         """
-        df = df.copy()
+        df = self._add_indicators(df, ind)
         
-        # Calculate indicators
-        df['atr'] = self.calculate_atr(df)
-        df['avg_volume_20'] = df['volume'].rolling(window=20).mean()
-        df['highest_20'] = df['high'].rolling(window=self.breakout_lookback).max()
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+        atr = df['atr'].to_numpy(dtype=np.float64)
         
-        # Initialize signal columns
-        df['consolidation'] = False
-        df['breakout'] = False
-        df['confirmation'] = None
-        df['buy_signal'] = False
-        df['breakout_level'] = np.nan
-        df['breakout_idx'] = np.nan
+        n = len(df)
+        positions = np.arange(n)
+        window = self.consolidation_days + 1
+        lookback = self.breakout_lookback
         
-        # Track breakouts waiting for confirmation
-        pending_breakouts = {}  # {idx: breakout_level}
-        
-        for idx in range(len(df)):
-            current_idx = df.index[idx]
-            
-            # Check consolidation
-            if self.detect_consolidation(df, current_idx):
-                df.loc[current_idx, 'consolidation'] = True
-            
-            # Check breakout (only if consolidation present in recent past)
-            recent_consolidation = df.loc[max(0, idx - 20):idx, 'consolidation'].any()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Consolidation over bars [i - consolidation_days, i]
+            atr_mean = _window_nanmean(atr, window)
+            price_range = (
+                (_window_nanmax(high, window) - _window_nanmin(low, window))
+                / _window_nanmean(close, window)
+            )
+            consolidation = (
+                (positions >= self.consolidation_days + 20)
+                & ~(atr > atr_mean * self.atr_threshold)
+                & ~(price_range > 0.05)
+            )
             
-            if recent_consolidation and self.detect_breakout(df, current_idx):
-                df.loc[current_idx, 'breakout'] = True
-                df.loc[current_idx, 'breakout_level'] = df.loc[current_idx, 'close']
-                pending_breakouts[current_idx] = df.loc[current_idx, 'close']
+            # Any consolidation in bars [i - 20, i]
+            consolidation_count = np.cumsum(consolidation)
+            prior_count = np.zeros(n, dtype=consolidation_count.dtype)
+            prior_count[21:] = consolidation_count[:-21]
+            recent_consolidation = consolidation_count > prior_count
             
-            # Check confirmation for pending breakouts
-            if pending_breakouts:
-                for breakout_idx, breakout_level in list(pending_breakouts.items()):
+            # Breakout vs bars [i - lookback, i - 1]
+            highest_high = _shift(_window_nanmax(high, lookback), 1)
+            avg_volume = _shift(_window_nanmean(volume, lookback), 1)
+            candle_strength = (close - low) / (high - low)
+            breakout = (
+                recent_consolidation
+                & (positions >= lookback)
+                & ~(close <= highest_high)
+                & ~(volume < avg_volume * self.volume_multiplier)
+                & ~(candle_strength < 0.7)
+            )
+        
+        confirmation = np.full(n, None, dtype=object)
+        buy_signal = np.zeros(n, dtype=bool)
+        breakout_level = np.where(breakout, close, np.nan)
+        breakout_idx = np.full(n, np.nan)
+        
+        # Bars with a breakout in the last 5 bars (the only ones with pending breakouts)
+        breakout_count = np.cumsum(breakout)
+        prior_breakouts = np.zeros(n, dtype=breakout_count.dtype)
+        prior_breakouts[6:] = breakout_count[:-6]
+        
+        pending = deque(maxlen=6)  # breakout positions, oldest first
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for i in np.flatnonzero(breakout_count > prior_breakouts):
+                if breakout[i]:
+                    pending.append(i)
+                
+                for b in list(pending):
                     # Only check within 5 days of breakout
-                    if idx - df.index.get_loc(breakout_idx) > 5:
-                        del pending_breakouts[breakout_idx]
+                    if i - b > 5:
+                        pending.remove(b)
+                        continue
+                    
+                    if i <= b:
                         continue
                     
-                    confirmation_type = self.detect_confirmation(df, breakout_idx, current_idx)
+                    confirmation_type = self._confirmation_at(high, low, close, volume, b, i)
                     
                     if confirmation_type:
-                        df.loc[current_idx, 'confirmation'] = confirmation_type
-                        df.loc[current_idx, 'buy_signal'] = True
-                        df.loc[current_idx, 'breakout_idx'] = breakout_idx
-                        df.loc[current_idx, 'breakout_level'] = breakout_level
-                        
-                        # Remove from pending
-                        del pending_breakouts[breakout_idx]
+                        confirmation[i] = confirmation_type
+                        buy_signal[i] = True
+                        breakout_idx[i] = df.index[b]
+                        breakout_level[i] = close[b]
+                        pending.remove(b)
+        
+        df['consolidation'] = consolidation
+        df['breakout'] = breakout
+        df['confirmation'] = pd.Series(confirmation, index=df.index, dtype=object)
+        df['buy_signal'] = buy_signal
+        df['breakout_level'] = breakout_level
+        df['breakout_idx'] = breakout_idx
         
         return df
     
@@ -230,6 +291,49 @@ class BreakoutConfirmationDetector:
         return details
 
 
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def _window_nanmean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Mean of values[i - window + 1 : i + 1], skipping NaN (NaN before a full window)
+    
+    Sums each window separately like Series.mean() - a running sum
+    would drift from the per-bar means and flip threshold tests.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = sliding_window_view(values, window)
+        valid = ~np.isnan(windows)
+        out[window - 1:] = np.where(valid, windows, 0.0).sum(axis=1) / valid.sum(axis=1)
+    return out
+
+
+def _window_nanmax(values: np.ndarray, window: int) -> np.ndarray:
+    return pd.Series(values).rolling(window, min_periods=1).max().to_numpy()
+
+
+def _window_nanmin(values: np.ndarray, window: int) -> np.ndarray:
+    return pd.Series(values).rolling(window, min_periods=1).min().to_numpy()
+
+
+def _nanmean(values: np.ndarray) -> float:
+    valid = ~np.isnan(values)
+    return np.where(valid, values, 0.0).sum() / valid.sum()
+
+
+def _nanmax(values: np.ndarray) -> float:
+    return np.nan if np.isnan(values).all() else np.nanmax(values)
+
+
+def _nanmin(values: np.ndarray) -> float:
+    return np.nan if np.isnan(values).all() else np.nanmin(values)
+
+
 def main():
     """Test the detector"""
     # This would be used by backtest system
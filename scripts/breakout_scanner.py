@@ -18,6 +18,10 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 import sys
+from functools import partial
+
+from indicators import IndicatorFrame
+from quote_fetcher import QuoteFetcher
 
 try:
     from vnstock import Vnstock
@@ -40,64 +44,20 @@ class BreakoutDetector:
         self.volume_multiplier = volume_multiplier
         self.rsi_threshold = rsi_threshold
     
-    def calculate_rsi(self, prices, period=14):
-        """
-        Calculate RSI (Relative Strength Index)
-        
-        Args:
-            prices: Series of close prices
-            period: RSI period (default: 14)
-            
-        Returns:
-            Series of RSI values
-        """
-        deltas = prices.diff()
-        gain = deltas.clip(lower=0)
-        loss = -deltas.clip(upper=0)
-        
-        # Exponential moving average
-        avg_gain = gain.ewm(com=period-1, min_periods=period).mean()
-        avg_loss = loss.ewm(com=period-1, min_periods=period).mean()
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
-    
-    def calculate_macd(self, prices, fast=12, slow=26, signal=9):
-        """
-        Calculate MACD (Moving Average Convergence Divergence)
-        
-        Args:
-            prices: Series of close prices
-            fast: Fast EMA period (default: 12)
-            slow: Slow EMA period (default: 26)
-            signal: Signal line period (default: 9)
-            
-        Returns:
-            Tuple of (macd, signal_line, histogram)
-        """
-        ema_fast = prices.ewm(span=fast, adjust=False).mean()
-        ema_slow = prices.ewm(span=slow, adjust=False).mean()
-        
-        macd = ema_fast - ema_slow
-        signal_line = macd.ewm(span=signal, adjust=False).mean()
-        histogram = macd - signal_line
-        
-        return macd, signal_line, histogram
-    
-    def detect_volume_spike(self, volumes):
+    def detect_volume_spike(self, volumes, volume_ratio=None):
         """
         Detect volume spike (Vol tăng >= 200% so với cây trước)
         
         Args:
             volumes: Series of volume data
+            volume_ratio: Precomputed volumes / volumes.shift(1) (optional)
             
         Returns:
             Boolean series indicating volume spikes
         """
         # Volume tăng so với cây trước
-        volume_ratio = volumes / volumes.shift(1)
+        if volume_ratio is None:
+            volume_ratio = volumes / volumes.shift(1)
         
         # Volume spike = tăng >= volume_multiplier lần
         is_volume_spike = volume_ratio >= self.volume_multiplier
@@ -140,22 +100,25 @@ class BreakoutDetector:
         
         return is_rsi_breakout
     
-    def detect_signal(self, df):
+    def detect_signal(self, df, ind=None):
         """
         Detect tín hiệu MUA dựa trên 3 điều kiện
         
         Args:
             df: DataFrame with columns [time, open, high, low, close, volume]
+            ind: Optional IndicatorFrame of df (shares RSI/MACD with other detectors)
             
         Returns:
             DataFrame with added indicator columns and signal
         """
+        ind = ind if ind is not None else IndicatorFrame(df)
+        
         # Calculate indicators
-        df['rsi'] = self.calculate_rsi(df['close'])
-        df['macd'], df['macd_signal'], df['macd_histogram'] = self.calculate_macd(df['close'])
+        df['rsi'] = ind.rsi(14, method='wilder')
+        df['macd'], df['macd_signal'], df['macd_histogram'] = ind.macd()
         
         # Detect conditions
-        df['volume_spike'], df['volume_ratio'] = self.detect_volume_spike(df['volume'])
+        df['volume_spike'], df['volume_ratio'] = self.detect_volume_spike(df['volume'], ind.volume_ratio())
         df['macd_crossover'], df['macd_positive'] = self.detect_macd_crossover(
             df['macd'], df['macd_signal']
         )
@@ -238,7 +201,7 @@ class BreakoutDetector:
         return min(confidence, 100)
 
 
-def fetch_1h_data(code, lookback_hours=168):
+def fetch_1h_data(code, lookback_hours=168, raise_errors=False):
     """
     Fetch 1H intraday data từ VNStock
     
@@ -271,6 +234,8 @@ def fetch_1h_data(code, lookback_hours=168):
         return data
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error fetching {code}: {e}", file=sys.stderr)
         return None
 
@@ -294,11 +259,14 @@ def scan_multiple_stocks(stock_codes, volume_multiplier=3.0, rsi_threshold=70):
     
     signals = []
     
-    for code in stock_codes:
+    # Fetch 1H data concurrently (rate-limited, with retries)
+    fetcher = QuoteFetcher(partial(fetch_1h_data, lookback_hours=168, raise_errors=True))
+    
+    for code, df, error in fetcher.fetch_many(stock_codes):
         print(f"Scanning {code}...", file=sys.stderr)
         
-        # Fetch 1H data
-        df = fetch_1h_data(code, lookback_hours=168)
+        if error is not None:
+            print(f"Error fetching {code}: {error}", file=sys.stderr)
         
         if df is None or len(df) < 50:  # Need enough data for indicators
             print(f"  → Not enough data", file=sys.stderr)
@@ -7,12 +7,15 @@ import sys
 
 DB_PATH = 'signals.db'
 
+# Only the scan /api/signals serves (older scans are kept for history)
+CURRENT_SCAN = 'scan_id IS (SELECT scan_id FROM current_scan WHERE id = 1)'
+
 try:
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Count total signals
-    cursor.execute('SELECT COUNT(*) FROM signals')
+    cursor.execute(f'SELECT COUNT(*) FROM signals WHERE {CURRENT_SCAN}')
     count = cursor.fetchone()[0]
     
     print(f"\n{'='*60}")
@@ -22,9 +25,10 @@ try:
     
     if count > 0:
         # Get all signals
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT ticker, strategy, strength, entry_price, take_profit, stop_loss, rsi, is_priority
             FROM signals
+            WHERE {CURRENT_SCAN}
             ORDER BY strength DESC
         ''')
         
@@ -43,7 +47,7 @@ try:
             print(f"{i:<4} {ticker:<6} {strategy:<12} {strength:<10} {entry:>10,.0f}  {target:>10,.0f}  {stop:>10,.0f}  {rsi:>6.1f}  {pri_mark}")
         
         # Summary by strategy
-        cursor.execute("SELECT strategy, COUNT(*) FROM signals GROUP BY strategy")
+        cursor.execute(f"SELECT strategy, COUNT(*) FROM signals WHERE {CURRENT_SCAN} GROUP BY strategy")
         by_strategy = cursor.fetchall()
         
         print(f"\n{'='*60}")
@@ -53,7 +57,7 @@ try:
             print(f"{strategy}: {cnt}")
         
         # Priority signals
-        cursor.execute("SELECT COUNT(*) FROM signals WHERE is_priority = 1")
+        cursor.execute(f"SELECT COUNT(*) FROM signals WHERE {CURRENT_SCAN} AND is_priority = 1")
         priority_count = cursor.fetchone()[0]
         print(f"\nPriority signals: {priority_count}")
         
@@ -14,9 +14,11 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
-import time
 import os
 
+from indicators import get_indicators
+from quote_fetcher import QuoteFetcher
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -49,35 +51,6 @@ print("="*70)
 print(f"Scan Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 print()
 
-# ============================================================================
-# INDICATOR CALCULATIONS
-# ============================================================================
-
-def calculate_ema(series, period):
-    """Calculate EMA"""
-    return series.ewm(span=period, adjust=False).mean()
-
-
-def calculate_rsi(series, period=14):
-    """Calculate RSI"""
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-
-def calculate_atr(high, low, close, period=14):
-    """Calculate ATR for stop loss"""
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr = tr.rolling(window=period).mean()
-    return atr
-
-
 # ============================================================================
 # STRATEGY 1: PULLBACK
 # ============================================================================
@@ -99,13 +72,14 @@ def scan_pullback_signal(df, ticker):
     if len(df) < 60:
         return None
     
-    # Calculate indicators
+    # Calculate indicators (computed once per ticker, shared by both strategies)
+    ind = get_indicators(ticker, df)
     df = df.copy()
-    df['ema20'] = calculate_ema(df['close'], 20)
-    df['ema50'] = calculate_ema(df['close'], 50)
-    df['rsi'] = calculate_rsi(df['close'], 14)
-    df['volume_ma'] = df['volume'].rolling(20).mean()
-    df['atr'] = calculate_atr(df['high'], df['low'], df['close'])
+    df['ema20'] = ind.ema(20)
+    df['ema50'] = ind.ema(50)
+    df['rsi'] = ind.rsi(14)
+    df['volume_ma'] = ind.sma('volume', 20)
+    df['atr'] = ind.atr(14)
     
     # Get latest data
     latest = df.iloc[-1]
@@ -194,13 +168,14 @@ def scan_ema_cross_signal(df, ticker):
     if len(df) < 60:
         return None
     
-    # Calculate indicators
+    # Calculate indicators (computed once per ticker, shared by both strategies)
+    ind = get_indicators(ticker, df)
     df = df.copy()
-    df['ema20'] = calculate_ema(df['close'], 20)
-    df['ema50'] = calculate_ema(df['close'], 50)
-    df['rsi'] = calculate_rsi(df['close'], 14)
-    df['volume_ma'] = df['volume'].rolling(20).mean()
-    df['atr'] = calculate_atr(df['high'], df['low'], df['close'])
+    df['ema20'] = ind.ema(20)
+    df['ema50'] = ind.ema(50)
+    df['rsi'] = ind.rsi(14)
+    df['volume_ma'] = ind.sma('volume', 20)
+    df['atr'] = ind.atr(14)
     
     # Get latest data
     latest = df.iloc[-1]
@@ -304,6 +279,33 @@ def is_priority_stock(ticker):
 # MAIN SCANNER
 # ============================================================================
 
+def fetch_daily_data(ticker):
+    """
+    Fetch LOOKBACK_DAYS of daily bars with lowercase columns
+    
+    Raises on API errors so QuoteFetcher can retry them.
+    """
+    stock = Vnstock().stock(symbol=ticker, source='VCI')
+    
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=LOOKBACK_DAYS)
+    
+    df = stock.quote.history(
+        start=start_date.strftime('%Y-%m-%d'),
+        end=end_date.strftime('%Y-%m-%d')
+    )
+    
+    if df is None:
+        return None
+    
+    # Standardize columns
+    df.columns = [c.lower() for c in df.columns]
+    if 'time' not in df.columns and 'date' in df.columns:
+        df.rename(columns={'date': 'time'}, inplace=True)
+    
+    return df
+
+
 def scan_all_stocks(stock_list, max_stocks=None):
     """
     Scan all stocks for signals
@@ -329,30 +331,19 @@ def scan_all_stocks(stock_list, max_stocks=None):
     print(f"Scanning {len(stock_list)} stocks...")
     print()
     
-    for i, ticker in enumerate(stock_list, 1):
+    fetcher = QuoteFetcher(fetch_daily_data)
+    
+    for i, (ticker, df, error) in enumerate(fetcher.fetch_many(stock_list), 1):
         print(f"[{i}/{len(stock_list)}] {ticker}...", end=" ", flush=True)
         
         try:
-            # Get data
-            stock = Vnstock().stock(symbol=ticker, source='VCI')
-            
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=LOOKBACK_DAYS)
-            
-            df = stock.quote.history(
-                start=start_date.strftime('%Y-%m-%d'),
-                end=end_date.strftime('%Y-%m-%d')
-            )
+            if error is not None:
+                raise error
             
             if df is None or len(df) < 50:
                 print("⚠️ Insufficient data")
                 continue
             
-            # Standardize columns
-            df.columns = [c.lower() for c in df.columns]
-            if 'time' not in df.columns and 'date' in df.columns:
-                df.rename(columns={'date': 'time'}, inplace=True)
-            
             # Filter by volume and price
             latest_volume = df['volume'].iloc[-1]
             latest_price = df['close'].iloc[-1]
@@ -388,9 +379,6 @@ def scan_all_stocks(stock_list, max_stocks=None):
             errors.append((ticker, str(e)))
             print(f"❌ Error: {e}")
         
-        # Rate limit
-        time.sleep(1.5)
-        
         # Progress update
         if i % 20 == 0:
             print(f"\n  Progress: {i}/{len(stock_list)}, "
@@ -3,16 +3,28 @@ AI Advisor - Daily Signal Scanner
 Uses vnstock 3.3.1 Quote API
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import sqlite3
-import time
 import logging
+from functools import partial
 
 # CORRECT vnstock 3.3.1 API
 from vnstock import Quote
 
+from indicators import get_indicators
+from ohlcv_cache import OHLCVCache
+from quote_fetcher import QuoteFetcher
+
+# db_pool lives in the repo root, next to the API that shares signals.db
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+from db_pool import configure_connection
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -21,6 +33,12 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = 'signals.db'
 
+# Wait this long for the API's write lock instead of failing (ms)
+DB_BUSY_TIMEOUT_MS = 10000
+
+# On-disk OHLCV cache (ohlcv_cache.CACHE_DIR, override with OHLCV_CACHE_DIR)
+OHLCV_CACHE = OHLCVCache()
+
 TOP_STOCKS = [
     'VCB', 'VHM', 'VIC', 'VNM', 'HPG', 'TCB', 'VPB', 'MBB', 'STB', 'MSN',
     'FPT', 'VRE', 'SSI', 'BID', 'CTG', 'PLX', 'GAS', 'MWG', 'VJC', 'HDB',
@@ -42,19 +60,21 @@ def get_last_trading_day():
     
     return last_trading_day.strftime('%Y-%m-%d')
 
-def get_stock_data(ticker, days=100):
-    """Get stock data using Quote API"""
+def get_stock_data(ticker, days=100, raise_errors=False):
+    """Get stock data using Quote API (raise_errors=True lets QuoteFetcher retry)"""
     try:
         end_date = get_last_trading_day()
         start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=days*2)).strftime('%Y-%m-%d')
         
         logger.info(f"Fetching {ticker} ({start_date} to {end_date})")
         
-        # CORRECT vnstock 3.3.1 syntax!
-        quote = Quote(symbol=ticker, source='VCI')
-        
-        # Get historical data
-        df = quote.history(start=start_date, end=end_date)
+        # Get historical data - the cache only requests bars it does not have
+        df = OHLCV_CACHE.get(
+            ticker, start_date, end_date,
+            # CORRECT vnstock 3.3.1 syntax!
+            lambda start, end: Quote(symbol=ticker, source='VCI').history(start=start, end=end),
+            source='VCI', interval='1D'
+        )
         
         if df is None or len(df) == 0:
             logger.warning(f"No data for {ticker}")
@@ -65,6 +85,8 @@ def get_stock_data(ticker, days=100):
         return process_dataframe(df, ticker)
         
     except Exception as e:
+        if raise_errors:
+            raise
         logger.error(f"Error {ticker}: {str(e)}")
         return None
 
@@ -113,27 +135,15 @@ def process_dataframe(df, ticker):
         logger.error(f"Process error {ticker}: {str(e)}")
         return None
 
-def calculate_ema(data, period):
-    """Calculate EMA"""
-    return data['Close'].ewm(span=period, adjust=False).mean()
-
-def calculate_rsi(data, period=14):
-    """Calculate RSI"""
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss.replace(0, 0.0001)
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
 def check_pullback_strategy(df, ticker):
     """Check Pullback signals"""
     signals = []
     
     try:
-        df['EMA20'] = calculate_ema(df, 20)
-        df['EMA50'] = calculate_ema(df, 50)
-        df['RSI'] = calculate_rsi(df)
+        ind = get_indicators(ticker, df)
+        df['EMA20'] = ind.ema(20)
+        df['EMA50'] = ind.ema(50)
+        df['RSI'] = ind.rsi(14, zero_loss=0.0001)
         
         latest = df.iloc[-1]
         
@@ -202,9 +212,10 @@ def check_ema_cross_strategy(df, ticker):
     signals = []
     
     try:
-        df['EMA20'] = calculate_ema(df, 20)
-        df['EMA50'] = calculate_ema(df, 50)
-        df['RSI'] = calculate_rsi(df)
+        ind = get_indicators(ticker, df)
+        df['EMA20'] = ind.ema(20)
+        df['EMA50'] = ind.ema(50)
+        df['RSI'] = ind.rsi(14, zero_loss=0.0001)
         
         latest = df.iloc[-1]
         prev = df.iloc[-2]
@@ -271,10 +282,18 @@ def check_ema_cross_strategy(df, ticker):
     
     return signals
 
+def connect_db():
+    """
+    Open signals.db in WAL mode (same settings as the API's db_pool), so
+    /api/signals readers are not blocked while the scanner writes
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    return configure_connection(conn, busy_timeout_ms=DB_BUSY_TIMEOUT_MS)
+
 def init_database():
     """Initialize database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -292,10 +311,40 @@ def init_database():
                 rsi REAL,
                 date TEXT,
                 action TEXT DEFAULT 'BUY',
+                scan_id INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # Databases created before versioned scans have no scan_id column
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(signals)')]
+        if 'scan_id' not in columns:
+            cursor.execute('ALTER TABLE signals ADD COLUMN scan_id INTEGER')
+        
+        # One row per scan run; signals of older scans are kept for history
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_date TEXT,
+                signal_count INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Single-row pointer to the scan served by /api/signals
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS current_scan (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                scan_id INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_signals_scan
+            ON signals(scan_id, strength DESC)
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info("✓ Database initialized")
@@ -306,38 +355,65 @@ def init_database():
         return False
 
 def save_signals_to_db(signals):
-    """Save signals"""
+    """
+    Save signals as a new scan snapshot
+    
+    The scan row, all its signals and the move of the current_scan pointer
+    are one transaction: readers see either the previous scan or the
+    complete new one, never a partial set.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        conn = connect_db()
         
-        cursor.execute('DELETE FROM signals')
-        
-        for signal in signals:
-            cursor.execute('''
-                INSERT INTO signals (
-                    ticker, strategy, entry_price, stop_loss, take_profit,
-                    risk_reward, strength, is_priority, stock_type, rsi, date, action
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                signal['ticker'], signal['strategy'], signal['entry_price'],
-                signal['stop_loss'], signal['take_profit'], signal['risk_reward'],
-                signal['strength'], signal['is_priority'], signal['stock_type'],
-                signal['rsi'], signal['date'], signal['action']
-            ))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"✓ Saved {len(signals)} signals")
+        try:
+            with conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO scans (scan_date, signal_count)
+                    VALUES (?, ?)
+                ''', (get_last_trading_day(), len(signals)))
+                scan_id = cursor.lastrowid
+                
+                cursor.executemany('''
+                    INSERT INTO signals (
+                        ticker, strategy, entry_price, stop_loss, take_profit,
+                        risk_reward, strength, is_priority, stock_type, rsi, date, action, scan_id
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (
+                        signal['ticker'], signal['strategy'], signal['entry_price'],
+                        signal['stop_loss'], signal['take_profit'], signal['risk_reward'],
+                        signal['strength'], signal['is_priority'], signal['stock_type'],
+                        signal['rsi'], signal['date'], signal['action'], scan_id
+                    )
+                    for signal in signals
+                ])
+                
+                # Switch readers to the new scan
+                cursor.execute('''
+                    INSERT OR REPLACE INTO current_scan (id, scan_id, updated_at)
+                    VALUES (1, ?, CURRENT_TIMESTAMP)
+                ''', (scan_id,))
+        finally:
+            conn.close()
+        
+        logger.info(f"✓ Saved {len(signals)} signals (scan #{scan_id})")
         return True
         
     except Exception as e:
         logger.error(f"Save error: {str(e)}")
         return False
 
-def scan_all_stocks():
-    """Scan stocks"""
+def scan_all_stocks(on_ticker=None, save=True):
+    """
+    Scan stocks
+    
+    on_ticker(ticker, signals, error): optional callback after each ticker
+    (error is None on success) - used by the API's scan job worker
+    save: write the signals as a new scan; the job worker passes False
+    and saves them itself so it can report a failed save
+    """
     logger.info("=" * 60)
     logger.info("Starting scan...")
     logger.info(f"Date: {get_last_trading_day()}")
@@ -350,16 +426,20 @@ def scan_all_stocks():
     processed = 0
     failed = 0
     
-    for ticker in TOP_STOCKS:
+    fetcher = QuoteFetcher(partial(get_stock_data, days=100, raise_errors=True))
+    
+    for ticker, df, error in fetcher.fetch_many(TOP_STOCKS):
         try:
-            logger.info(f"Processing {ticker} ({processed + 1}/{len(TOP_STOCKS)})...")
+            logger.info(f"Processing {ticker} ({processed + failed + 1}/{len(TOP_STOCKS)})...")
             
-            df = get_stock_data(ticker, days=100)
+            if error is not None:
+                raise error
             
             if df is None or len(df) < 50:
                 logger.warning(f"Skip {ticker}")
                 failed += 1
-                time.sleep(0.5)
+                if on_ticker:
+                    on_ticker(ticker, [], 'not enough data')
                 continue
             
             pullback = check_pullback_strategy(df, ticker)
@@ -369,12 +449,14 @@ def scan_all_stocks():
             all_signals.extend(ema_cross)
             
             processed += 1
-            time.sleep(0.5)
+            if on_ticker:
+                on_ticker(ticker, pullback + ema_cross, None)
             
         except Exception as e:
             logger.error(f"Error {ticker}: {str(e)}")
             failed += 1
-            time.sleep(0.5)
+            if on_ticker:
+                on_ticker(ticker, [], str(e))
     
     logger.info("=" * 60)
     logger.info("COMPLETE")
@@ -384,7 +466,8 @@ def scan_all_stocks():
     logger.info("=" * 60)
     
     if len(all_signals) > 0:
-        save_signals_to_db(all_signals)
+        if save:
+            save_signals_to_db(all_signals)
         
         pullback_cnt = len([s for s in all_signals if s['strategy'] == 'PULLBACK'])
         ema_cross_cnt = len([s for s in all_signals if s['strategy'] == 'EMA_CROSS'])
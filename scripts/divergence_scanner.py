@@ -15,8 +15,12 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 import sys
+from functools import partial
 from scipy.signal import argrelextrema
 
+from indicators import IndicatorFrame
+from quote_fetcher import QuoteFetcher
+
 try:
     from vnstock import Vnstock
 except ImportError:
@@ -32,41 +36,19 @@ class BearishDivergenceDetector:
     - RSI reversal below 70
     """
     
-    def __init__(self, volume_multiplier=3.0, rsi_threshold=70, lookback_peaks=20):
+    def __init__(self, volume_multiplier=3.0, rsi_threshold=70, lookback_peaks=20, all_bars=False):
         """
         Args:
             volume_multiplier: Vol phải tăng gấp bao nhiêu lần (default: 3x)
             rsi_threshold: RSI threshold (default: 70)
             lookback_peaks: Số bars để tìm peaks (default: 20)
+            all_bars: Check divergence on every bar, not only the last
+                lookback_peaks bars (for backtesting; default: False)
         """
         self.volume_multiplier = volume_multiplier
         self.rsi_threshold = rsi_threshold
         self.lookback_peaks = lookback_peaks
-    
-    def calculate_rsi(self, prices, period=14):
-        """Calculate RSI"""
-        deltas = prices.diff()
-        gain = deltas.clip(lower=0)
-        loss = -deltas.clip(upper=0)
-        
-        avg_gain = gain.ewm(com=period-1, min_periods=period).mean()
-        avg_loss = loss.ewm(com=period-1, min_periods=period).mean()
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
-    
-    def calculate_macd(self, prices, fast=12, slow=26, signal=9):
-        """Calculate MACD"""
-        ema_fast = prices.ewm(span=fast, adjust=False).mean()
-        ema_slow = prices.ewm(span=slow, adjust=False).mean()
-        
-        macd = ema_fast - ema_slow
-        signal_line = macd.ewm(span=signal, adjust=False).mean()
-        histogram = macd - signal_line
-        
-        return macd, signal_line, histogram
+        self.all_bars = all_bars
     
     def find_peaks(self, data, order=5):
         """
@@ -82,78 +64,85 @@ class BearishDivergenceDetector:
         peaks = argrelextrema(data.values, np.greater, order=order)[0]
         return peaks
     
-    def detect_volume_spike(self, volumes):
-        """Detect volume spike"""
-        volume_ratio = volumes / volumes.shift(1)
+    def detect_volume_spike(self, volumes, volume_ratio=None):
+        """Detect volume spike (volume_ratio: precomputed volumes / volumes.shift(1))"""
+        if volume_ratio is None:
+            volume_ratio = volumes / volumes.shift(1)
         is_volume_spike = volume_ratio >= self.volume_multiplier
         
         return is_volume_spike, volume_ratio
     
-    def detect_bearish_divergence(self, df, lookback=20):
+    def detect_bearish_divergence(self, df, lookback=20, all_bars=None):
         """
         Detect MACD bearish divergence:
         - Price tạo higher high (đỉnh sau cao hơn đỉnh trước)
         - MACD tạo lower high (đỉnh sau thấp hơn đỉnh trước)
         
+        Peaks are found once; the last two peaks in each bar's window
+        [i - lookback, i] come from searchsorted on the peak positions.
+        
         Args:
             df: DataFrame with 'high' and 'macd' columns
             lookback: Số bars để tìm 2 đỉnh
+            all_bars: Evaluate every bar instead of the last `lookback`
+                bars (backtesting); default: self.all_bars
             
         Returns:
             Boolean series indicating divergence
         """
-        # Find peaks in price (high)
-        price_peaks_idx = self.find_peaks(df['high'], order=3)
+        all_bars = self.all_bars if all_bars is None else all_bars
         
-        # Find peaks in MACD
-        macd_peaks_idx = self.find_peaks(df['macd'], order=3)
+        high = df['high'].to_numpy(dtype=np.float64)
+        macd = df['macd'].to_numpy(dtype=np.float64)
+        n = len(df)
         
-        # Initialize divergence column
-        df['bearish_divergence'] = False
+        # Find peaks in price (high) and MACD
+        price_peaks_idx = self.find_peaks(df['high'], order=3)
+        macd_peaks_idx = self.find_peaks(df['macd'], order=3)
         
-        # Check each recent bar
-        for i in range(len(df) - lookback, len(df)):
-            if i < lookback:
-                continue
+        # Bars to check
+        bars = np.arange(lookback if all_bars else max(n - lookback, lookback), n)
+        
+        # Peaks within [i - lookback, i] are peaks_idx[first:last]
+        price_first = np.searchsorted(price_peaks_idx, bars - lookback, side='left')
+        price_last = np.searchsorted(price_peaks_idx, bars, side='right')
+        macd_first = np.searchsorted(macd_peaks_idx, bars - lookback, side='left')
+        macd_last = np.searchsorted(macd_peaks_idx, bars, side='right')
+        
+        # Need at least 2 peaks để compare
+        has_peaks = (price_last - price_first >= 2) & (macd_last - macd_first >= 2)
+        bars = bars[has_peaks]
+        price_last = price_last[has_peaks]
+        macd_last = macd_last[has_peaks]
+        
+        # 2 đỉnh gần nhất
+        price_peak1 = high[price_peaks_idx[price_last - 2]]
+        price_peak2 = high[price_peaks_idx[price_last - 1]]
+        macd_peak1 = macd[macd_peaks_idx[macd_last - 2]]
+        macd_peak2 = macd[macd_peaks_idx[macd_last - 1]]
+        
+        # Price: higher high, MACD: lower high
+        is_divergence = (price_peak2 > price_peak1) & (macd_peak2 < macd_peak1)
+        divergence_bars = bars[is_divergence]
+        
+        divergence = np.zeros(n, dtype=bool)
+        divergence[divergence_bars] = True
+        df['bearish_divergence'] = divergence
+        
+        if len(divergence_bars) > 0:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                strength = (
+                    (price_peak2 - price_peak1) / price_peak1 * 100 +
+                    (macd_peak1 - macd_peak2) / np.abs(macd_peak1) * 100
+                )
             
-            # Get recent price peaks trong lookback window
-            recent_price_peaks = [idx for idx in price_peaks_idx 
-                                 if i - lookback <= idx <= i]
-            
-            # Get recent MACD peaks trong lookback window
-            recent_macd_peaks = [idx for idx in macd_peaks_idx 
-                                if i - lookback <= idx <= i]
-            
-            # Need at least 2 peaks để compare
-            if len(recent_price_peaks) >= 2 and len(recent_macd_peaks) >= 2:
-                # Get 2 đỉnh gần nhất
-                price_peak1_idx = recent_price_peaks[-2]
-                price_peak2_idx = recent_price_peaks[-1]
-                
-                macd_peak1_idx = recent_macd_peaks[-2]
-                macd_peak2_idx = recent_macd_peaks[-1]
-                
-                # Get values
-                price_peak1 = df.iloc[price_peak1_idx]['high']
-                price_peak2 = df.iloc[price_peak2_idx]['high']
-                
-                macd_peak1 = df.iloc[macd_peak1_idx]['macd']
-                macd_peak2 = df.iloc[macd_peak2_idx]['macd']
-                
-                # Check divergence:
-                # Price: higher high (đỉnh sau > đỉnh trước)
-                # MACD: lower high (đỉnh sau < đỉnh trước)
-                is_price_higher = price_peak2 > price_peak1
-                is_macd_lower = macd_peak2 < macd_peak1
-                
-                if is_price_higher and is_macd_lower:
-                    df.at[i, 'bearish_divergence'] = True
-                    
-                    # Store divergence info
-                    df.at[i, 'divergence_strength'] = (
-                        (price_peak2 - price_peak1) / price_peak1 * 100 +
-                        (macd_peak1 - macd_peak2) / abs(macd_peak1) * 100
-                    )
+            # Store divergence info (only on divergence bars)
+            if 'divergence_strength' in df.columns:
+                divergence_strength = df['divergence_strength'].to_numpy(dtype=np.float64, copy=True)
+            else:
+                divergence_strength = np.full(n, np.nan)
+            divergence_strength[divergence_bars] = strength[is_divergence]
+            df['divergence_strength'] = divergence_strength
         
         return df['bearish_divergence']
     
@@ -181,22 +170,25 @@ class BearishDivergenceDetector:
         
         return is_reversal, (current_below & rsi_decreasing)
     
-    def detect_signal(self, df):
+    def detect_signal(self, df, ind=None):
         """
         Detect tín hiệu BÁN
         
         Args:
             df: DataFrame with OHLCV data
+            ind: Optional IndicatorFrame of df (shares RSI/MACD with other detectors)
             
         Returns:
             DataFrame with indicators and signals
         """
+        ind = ind if ind is not None else IndicatorFrame(df)
+        
         # Calculate indicators
-        df['rsi'] = self.calculate_rsi(df['close'])
-        df['macd'], df['macd_signal'], df['macd_histogram'] = self.calculate_macd(df['close'])
+        df['rsi'] = ind.rsi(14, method='wilder')
+        df['macd'], df['macd_signal'], df['macd_histogram'] = ind.macd()
         
         # Detect conditions
-        df['volume_spike'], df['volume_ratio'] = self.detect_volume_spike(df['volume'])
+        df['volume_spike'], df['volume_ratio'] = self.detect_volume_spike(df['volume'], ind.volume_ratio())
         
         # Detect bearish divergence
         df['bearish_divergence'] = self.detect_bearish_divergence(df, self.lookback_peaks)
@@ -270,7 +262,7 @@ class BearishDivergenceDetector:
         return min(confidence, 100)
 
 
-def fetch_1h_data(code, lookback_hours=168):
+def fetch_1h_data(code, lookback_hours=168, raise_errors=False):
     """Fetch 1H data from VNStock"""
     try:
         stock = Vnstock().stock(symbol=code, source='VCI')
@@ -289,6 +281,8 @@ def fetch_1h_data(code, lookback_hours=168):
         return data
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error fetching {code}: {e}", file=sys.stderr)
         return None
 
@@ -302,10 +296,14 @@ def scan_multiple_stocks(stock_codes, volume_multiplier=3.0, rsi_threshold=70):
     
     signals = []
     
-    for code in stock_codes:
+    # Fetch 1H data concurrently (rate-limited, with retries)
+    fetcher = QuoteFetcher(partial(fetch_1h_data, lookback_hours=168, raise_errors=True))
+    
+    for code, df, error in fetcher.fetch_many(stock_codes):
         print(f"Scanning {code}...", file=sys.stderr)
         
-        df = fetch_1h_data(code, lookback_hours=168)
+        if error is not None:
+            print(f"Error fetching {code}: {error}", file=sys.stderr)
         
         if df is None or len(df) < 50:
             print(f"  → Not enough data", file=sys.stderr)
@@ -7,17 +7,19 @@ Based on vnstock diagnostics - Method 2 confirmed working
 
 from vnstock import Vnstock
 import pandas as pd
-import pickle
 import time
 import os
 from datetime import datetime
 
+from market_store import MarketDataStore, list_tickers
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 OUTPUT_FOLDER = "data_2025"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+STORE_FOLDER = os.path.join(OUTPUT_FOLDER, "store")
 
 START_DATE = "2025-01-01"
 END_DATE = datetime.now().strftime("%Y-%m-%d")
@@ -114,7 +116,7 @@ def download_stock_2025(ticker, retries=3):
 # ============================================================================
 
 def load_stock_list():
-    """Load stock list from PKL files"""
+    """Load stock list from existing data store"""
     print("\n📂 Loading stock list from existing data...")
     
     data_folder = "data"
@@ -124,31 +126,13 @@ def load_stock_list():
         if not data_folder or not os.path.exists(data_folder):
             return get_default_stock_list()
     
-    # Load from PKL
-    pkl_files = [f for f in os.listdir(data_folder) if f.endswith('.pkl')]
-    
-    if len(pkl_files) == 0:
-        print("⚠️ No PKL files found")
-        return get_default_stock_list()
-    
-    all_tickers = set()
-    
-    for pkl_file in pkl_files:
-        try:
-            filepath = os.path.join(data_folder, pkl_file)
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-            
-            if isinstance(data, dict):
-                all_tickers.update(data.keys())
-                print(f"   ✅ {pkl_file}: {len(data)} stocks")
-        except Exception as e:
-            print(f"   ⚠️ {pkl_file}: {e}")
+    # Only the manifest (and PKLs not yet in the store) is read
+    tickers = list_tickers(data_folder)
     
-    if len(all_tickers) == 0:
+    if len(tickers) == 0:
+        print("⚠️ No stored data found")
         return get_default_stock_list()
     
-    tickers = sorted(list(all_tickers))
     print(f"\n✅ Total stocks loaded: {len(tickers)}")
     
     # Save list
@@ -208,27 +192,14 @@ def get_default_stock_list():
 # CHECKPOINT FUNCTIONS
 # ============================================================================
 
-def find_last_checkpoint():
-    """Find latest checkpoint"""
-    checkpoints = [f for f in os.listdir(OUTPUT_FOLDER) 
-                   if f.startswith('checkpoint_2025_') and f.endswith('.pkl')]
-    
-    if len(checkpoints) == 0:
-        return None, 0
-    
-    checkpoints.sort()
-    latest = checkpoints[-1]
-    count = int(latest.split('_')[2].split('.')[0])
+def save_checkpoint(store, new_data):
+    """
+    Append newly downloaded stocks to the store
     
-    return os.path.join(OUTPUT_FOLDER, latest), count
-
-
-def save_checkpoint(data, count):
-    """Save checkpoint"""
-    filename = f"{OUTPUT_FOLDER}/checkpoint_2025_{count}.pkl"
-    with open(filename, 'wb') as f:
-        pickle.dump(data, f)
-    return filename
+    Only the tickers fetched since the last checkpoint are written.
+    """
+    store.write_many(new_data)
+    return store.root
 
 
 # ============================================================================
@@ -242,18 +213,20 @@ def main():
     tickers = load_stock_list()
     
     # Check checkpoint
-    all_data = {}
+    store = MarketDataStore(STORE_FOLDER)
     start_index = 0
+    start_over = False
     
-    checkpoint_file, checkpoint_count = find_last_checkpoint()
-    if checkpoint_file:
-        print(f"\n📂 Found checkpoint: {checkpoint_count} stocks")
+    if len(store) > 0:
+        print(f"\n📂 Found checkpoint: {len(store)} stocks")
         resume = input("Resume from checkpoint? (y/n): ").strip().lower()
         if resume == 'y':
-            with open(checkpoint_file, 'rb') as f:
-                all_data = pickle.load(f)
-            start_index = checkpoint_count
-            print(f"✅ Resumed from {checkpoint_count} stocks")
+            done = set(store.tickers())
+            tickers = [t for t in tickers if t in done] + [t for t in tickers if t not in done]
+            start_index = len([t for t in tickers if t in done])
+            print(f"✅ Resumed from {start_index} stocks")
+        else:
+            start_over = True
     
     # Confirm
     remaining = len(tickers) - start_index
@@ -272,10 +245,16 @@ def main():
         print("❌ Cancelled")
         return
     
+    # Not resuming: drop the old checkpoint so only this run's stocks remain
+    if start_over:
+        store.clear()
+        print(f"🗑️ Cleared checkpoint: {store.root}")
+    
     # Download
     print(f"\n📥 Starting download...\n")
     
-    success_count = len(all_data)
+    success_count = start_index
+    new_data = {}  # Downloaded since the last checkpoint
     failed_stocks = []
     
     start_time = time.time()
@@ -286,7 +265,7 @@ def main():
         df = download_stock_2025(ticker)
         
         if df is not None and len(df) > 0:
-            all_data[ticker] = df
+            new_data[ticker] = df
             success_count += 1
             print(f"✅ {len(df)} rows (from {df['time'].min().date()} to {df['time'].max().date()})")
         else:
@@ -295,11 +274,12 @@ def main():
         
         # Checkpoint
         if i % CHECKPOINT_INTERVAL == 0:
-            cp_file = save_checkpoint(all_data, i)
+            cp_file = save_checkpoint(store, new_data)
+            new_data = {}
             elapsed = time.time() - start_time
-            rate = i / elapsed * 60
+            rate = (i - start_index) / elapsed * 60
             eta = (len(tickers) - i) / rate
-            print(f"   💾 Checkpoint: {cp_file}")
+            print(f"   💾 Checkpoint: {cp_file} ({len(store)} stocks)")
             print(f"   ⏱️  Progress: {i}/{len(tickers)} ({i/len(tickers)*100:.1f}%), "
                   f"Rate: {rate:.1f}/min, ETA: {eta:.0f}min")
         
@@ -311,22 +291,20 @@ def main():
     print("DOWNLOAD COMPLETE!")
     print(f"{'='*70}")
     
-    final_file = f"{OUTPUT_FOLDER}/data_2025_complete.pkl"
-    with open(final_file, 'wb') as f:
-        pickle.dump(all_data, f)
+    final_file = save_checkpoint(store, new_data)
     
-    print(f"✅ Final file: {final_file}")
+    print(f"✅ Final store: {final_file}")
     print(f"   Total stocks: {success_count}/{len(tickers)} ({success_count/len(tickers)*100:.1f}%)")
     
     # Statistics
-    if len(all_data) > 0:
-        total_rows = sum(len(df) for df in all_data.values())
-        avg_rows = total_rows / len(all_data)
+    if len(store) > 0:
+        total_rows = sum(store.info(ticker)['rows'] for ticker in store)
+        avg_rows = total_rows / len(store)
         
         print(f"\nStatistics:")
         print(f"   Total rows: {total_rows:,}")
         print(f"   Avg rows/stock: {avg_rows:.1f}")
-        print(f"   File size: {os.path.getsize(final_file)/1024/1024:.1f} MB")
+        print(f"   Store size: {store.size_bytes()/1024/1024:.1f} MB")
     
     # Failed stocks
     if len(failed_stocks) > 0:
@@ -10,6 +10,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Optional
 
+from indicators import IndicatorFrame
+
 
 class EMACrossoverDetector:
     """
@@ -30,11 +32,6 @@ class EMACrossoverDetector:
         self.volume_multiplier = volume_multiplier
     
     
-    def calculate_ema(self, series: pd.Series, period: int) -> pd.Series:
-        """Calculate Exponential Moving Average"""
-        return series.ewm(span=period, adjust=False).mean()
-    
-    
     def detect_golden_cross(self, df: pd.DataFrame, idx: int) -> bool:
         """
         Detect Golden Cross
@@ -96,18 +93,19 @@ class EMACrossoverDetector:
         return False
     
     
-    def detect_signal(self, df: pd.DataFrame) -> pd.DataFrame:
+    def detect_signal(self, df: pd.DataFrame, ind: Optional[IndicatorFrame] = None) -> pd.DataFrame:
         """
         Main detection logic
         
         Returns DataFrame with golden/death cross signals
         """
+        ind = ind if ind is not None else IndicatorFrame(df)
         df = df.copy()
         
         # Calculate indicators
-        df['ema20'] = self.calculate_ema(df['close'], self.ema_fast)
-        df['ema50'] = self.calculate_ema(df['close'], self.ema_slow)
-        df['avg_volume_20'] = df['volume'].rolling(window=20).mean()
+        df['ema20'] = ind.ema(self.ema_fast)
+        df['ema50'] = ind.ema(self.ema_slow)
+        df['avg_volume_20'] = ind.sma('volume', 20)
         
         # Initialize signal columns
         df['golden_cross'] = False
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VECTORIZED EXIT ENGINE
+
+Tìm điểm thoát lệnh cho TẤT CẢ tín hiệu của một mã cùng lúc trên mảng NumPy,
+thay cho vòng lặp iterrows() trên các nến tương lai của từng tín hiệu.
+
+Exit rules (checked bar by bar, in this order):
+1. MAX_HOLD:    calendar days held > max_hold_days → exit at bar close
+2. STOP_LOSS:   low <= stop_loss                   → exit at stop_loss
+3. TAKE_PROFIT: high >= take_profit                → exit at take_profit
+4. END_OF_DATA: no exit before the last bar        → exit at last close
+
+Exit policies (apply_exit_policy) khai báo quy tắc thoát dạng dữ liệu:
+chốt lời từng phần, trailing stop theo cột chỉ báo bất kỳ, time stop và
+thoát theo tín hiệu, rồi tìm lần chạm đầu tiên của mỗi quy tắc trên ma trận
+(tín hiệu × nến tương lai) cho mọi tín hiệu cùng lúc.
+
+Usage:
+    exits = resolve_exits(times, lows, highs, closes, dates, sls, tps)
+    fills = apply_exit_policy(df, entry_locs, {
+        'stop_loss': {'column': 'ema50', 'pct': -1.0},
+        'take_profits': [{'pct': 5.0, 'portion': 0.33, 'reason': 'TP1'}],
+        'trailing': {'column': 'ema20', 'reason': 'TRAILING_EMA20'},
+        'max_bars': 60
+    })
+"""
+
+import numpy as np
+from typing import Dict, List, Mapping
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+MAX_HOLD = 'MAX_HOLD'
+STOP_LOSS = 'STOP_LOSS'
+TAKE_PROFIT = 'TAKE_PROFIT'
+END_OF_DATA = 'END_OF_DATA'
+TRAILING_STOP = 'TRAILING_STOP'
+SIGNAL_EXIT = 'SIGNAL_EXIT'
+
+
+def resolve_exits(
+    times,
+    lows,
+    highs,
+    closes,
+    entry_dates,
+    stop_losses,
+    take_profits,
+    max_hold_days=30,
+    min_future_bars: int = 5
+) -> Dict[str, np.ndarray]:
+    """
+    Resolve the exit bar of every signal of one ticker at once
+
+    Args:
+        times: Bar timestamps, sorted ascending
+        lows, highs, closes: Bar prices aligned with times
+        entry_dates: Signal dates (one per signal)
+        stop_losses, take_profits: Exit levels (one per signal)
+        max_hold_days: Max calendar days held (scalar or one per signal)
+        min_future_bars: Signals with fewer bars after entry_date are skipped
+
+    Returns:
+        dict of arrays (one row per signal):
+            valid: False for signals skipped for lack of future bars
+            exit_idx: Index of the exit bar in times
+            exit_time: Timestamp of the exit bar
+            exit_price: Raw exit price (before slippage)
+            exit_reason: MAX_HOLD / STOP_LOSS / TAKE_PROFIT / END_OF_DATA
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    lows = np.ascontiguousarray(lows, dtype=np.float64)
+    highs = np.ascontiguousarray(highs, dtype=np.float64)
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+
+    entry_dates = np.asarray(entry_dates, dtype='datetime64[ns]')
+    stop_losses = np.asarray(stop_losses, dtype=np.float64)
+    take_profits = np.asarray(take_profits, dtype=np.float64)
+    max_hold_days = np.broadcast_to(
+        np.asarray(max_hold_days, dtype=np.int64), entry_dates.shape
+    )
+
+    n_bars = len(times)
+    n_signals = len(entry_dates)
+
+    # First bar strictly after the signal date
+    start = np.searchsorted(times, entry_dates, side='right')
+    valid = (n_bars - start) >= min_future_bars
+
+    # First bar where (time - date).days > max_hold_days,
+    # i.e. time >= date + (max_hold_days + 1) days
+    hold_idx = np.searchsorted(
+        times, entry_dates + (max_hold_days + 1) * ONE_DAY, side='left'
+    )
+    hold_idx = np.maximum(hold_idx, start)
+
+    # Bars [start, hold_idx) can trigger stop loss / take profit
+    width = np.where(valid, hold_idx - start, 0)
+    max_width = int(width.max()) if n_signals > 0 else 0
+
+    if max_width > 0:
+        offsets = np.arange(max_width)
+        window = start[:, None] + offsets[None, :]
+        in_window = offsets[None, :] < width[:, None]
+        window = np.minimum(window, n_bars - 1)
+
+        hit_sl = (lows[window] <= stop_losses[:, None]) & in_window
+        hit_tp = (highs[window] >= take_profits[:, None]) & in_window
+        hit = hit_sl | hit_tp
+
+        has_hit = hit.any(axis=1)
+        first_hit = hit.argmax(axis=1)
+        first_is_sl = hit_sl[np.arange(n_signals), first_hit]
+    else:
+        has_hit = np.zeros(n_signals, dtype=bool)
+        first_hit = np.zeros(n_signals, dtype=np.int64)
+        first_is_sl = np.zeros(n_signals, dtype=bool)
+
+    held_out = hold_idx < n_bars
+
+    exit_idx = np.where(
+        has_hit,
+        start + first_hit,
+        np.where(held_out, hold_idx, n_bars - 1)
+    )
+    exit_idx = np.clip(exit_idx, 0, max(n_bars - 1, 0))
+
+    exit_reason = np.select(
+        [has_hit & first_is_sl, has_hit, held_out],
+        [STOP_LOSS, TAKE_PROFIT, MAX_HOLD],
+        default=END_OF_DATA
+    )
+
+    if n_bars > 0:
+        bar_close = closes[exit_idx]
+        exit_time = times[exit_idx]
+    else:
+        bar_close = np.full(n_signals, np.nan)
+        exit_time = np.full(n_signals, np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    exit_price = np.select(
+        [exit_reason == STOP_LOSS, exit_reason == TAKE_PROFIT],
+        [stop_losses, take_profits],
+        default=bar_close
+    )
+
+    return {
+        'valid': valid,
+        'exit_idx': exit_idx,
+        'exit_time': exit_time,
+        'exit_price': exit_price,
+        'exit_reason': exit_reason
+    }
+
+
+# ============================================================================
+# EXIT POLICIES
+# ============================================================================
+
+def _level(policy_level: Mapping, bars, entry_locs: np.ndarray, entry_prices: np.ndarray) -> np.ndarray:
+    """Price level per signal: {'pct': p} of entry price, or of a column at the entry bar"""
+    base = entry_prices
+    if policy_level.get('column'):
+        base = np.asarray(bars[policy_level['column']], dtype=np.float64)[entry_locs]
+    return base * (1 + policy_level.get('pct', 0.0) / 100)
+
+
+def _first(mask: np.ndarray, none: int) -> np.ndarray:
+    """Offset of the first True in each row, `none` where there is none"""
+    if mask.shape[1] == 0:
+        return np.full(len(mask), none, dtype=np.int64)
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), none)
+
+
+def apply_exit_policy(
+    bars,
+    entry_locs,
+    policy: Mapping,
+    entry_prices=None,
+    min_future_bars: int = 1
+) -> Dict[str, np.ndarray]:
+    """
+    Simulate a multi-tranche exit policy for every signal of one ticker at once
+
+    The position is entered at the close of bar entry_locs[i] and managed on
+    the following bars. Policy keys (all optional):
+        stop_loss:    {'pct': -3.0} of entry price, or {'column': 'ema50',
+                      'pct': -1.0} of a column at the entry bar;
+                      low <= level → rest of the position at the level
+        take_profits: [{'pct': 5.0, 'portion': 0.33, 'reason': 'TP1'}, ...];
+                      filled in order (each one only after the previous,
+                      possibly on the same bar) when high >= level
+        trailing:     {'column': 'ema20', 'reason': ..., 'after': k};
+                      once k take-profits are filled (default: all),
+                      close < column → rest of the position at close
+        signal:       {'column': 'death_cross', 'reason': ...};
+                      truthy column → rest of the position at close
+        max_bars:     time stop: rest of the position at the close of the
+                      max_bars-th bar ('time_reason', default MAX_HOLD)
+
+    On one bar, take-profits are checked first, then stop loss, trailing,
+    signal and time stop. A position still open on the last bar is closed
+    there at the close (END_OF_DATA).
+
+    Args:
+        bars: DataFrame or {column: array} with high, low, close and the
+            columns named by the policy, in bar order
+        entry_locs: Positional index of each signal bar
+        policy: Exit rules as above
+        entry_prices: Entry price per signal (default: close of the signal bar)
+        min_future_bars: Signals with fewer bars after entry are not valid
+
+    Returns:
+        dict of arrays (one row per signal; tp_* have one column per take-profit):
+            valid, entry_price, stop_loss
+            tp_idx: Bar index of each take-profit fill, -1 if not filled
+            tp_price: Take-profit levels
+            exit_idx, exit_price, exit_reason: Where the rest was closed
+            exit_portion: Portion closed there (0 if take-profits sold it all)
+    """
+    highs = np.asarray(bars['high'], dtype=np.float64)
+    lows = np.asarray(bars['low'], dtype=np.float64)
+    closes = np.asarray(bars['close'], dtype=np.float64)
+    entry_locs = np.asarray(entry_locs, dtype=np.int64)
+    entry_prices = closes[entry_locs] if entry_prices is None else np.asarray(entry_prices, dtype=np.float64)
+
+    n_bars = len(closes)
+    n_signals = len(entry_locs)
+
+    start = entry_locs + 1
+    available = n_bars - start
+    max_bars = policy.get('max_bars')
+    width = available if max_bars is None else np.minimum(available, max_bars)
+    valid = available >= max(min_future_bars, 1)
+    width = np.where(valid, width, 0)
+    max_width = int(width.max()) if n_signals > 0 else 0
+    never = max(max_width, 1)  # offset sentinel: no hit inside the window
+
+    offsets = np.arange(max_width)
+    window = np.minimum(start[:, None] + offsets[None, :], max(n_bars - 1, 0))
+    in_window = offsets[None, :] < width[:, None]
+
+    # Take-profits: first hit at or after the previous fill
+    take_profits: List[Mapping] = policy.get('take_profits', [])
+    tp_price = np.empty((n_signals, len(take_profits)))
+    tp_offset = np.full((n_signals, len(take_profits)), never, dtype=np.int64)
+    previous = np.zeros(n_signals, dtype=np.int64)
+    for k, tp in enumerate(take_profits):
+        tp_price[:, k] = _level(tp, bars, entry_locs, entry_prices)
+        hit = (highs[window] >= tp_price[:, k, None]) & in_window & (offsets[None, :] >= previous[:, None])
+        tp_offset[:, k] = _first(hit, never)
+        previous = tp_offset[:, k]
+
+    # Rules closing the rest of the position, in priority order for one bar
+    candidates = []
+    stop_loss = np.full(n_signals, np.nan)
+    if policy.get('stop_loss'):
+        stop_loss = _level(policy['stop_loss'], bars, entry_locs, entry_prices)
+        hit = (lows[window] <= stop_loss[:, None]) & in_window
+        candidates.append((_first(hit, never), STOP_LOSS, stop_loss))
+
+    if policy.get('trailing'):
+        trailing = policy['trailing']
+        after = trailing.get('after', len(take_profits))
+        active_from = tp_offset[:, after - 1] if after > 0 else np.zeros(n_signals, dtype=np.int64)
+        level = np.asarray(bars[trailing['column']], dtype=np.float64)[window]
+        hit = (closes[window] < level) & in_window & (offsets[None, :] >= active_from[:, None])
+        candidates.append((_first(hit, never), trailing.get('reason', TRAILING_STOP), None))
+
+    if policy.get('signal'):
+        signal = policy['signal']
+        fired = np.asarray(bars[signal['column']]).astype(bool)[window]
+        candidates.append((_first(fired & in_window, never), signal.get('reason', SIGNAL_EXIT), None))
+
+    # Take-profits that sell the whole position close it at the last fill
+    portions = [tp['portion'] for tp in take_profits]
+    if take_profits and sum(portions) >= 1 - 1e-9:
+        candidates.insert(0, (tp_offset[:, -1], take_profits[-1].get('reason', TAKE_PROFIT), tp_price[:, -1]))
+
+    # Time stop / end of data unless a rule fires first; reversed so the
+    # earlier rule wins when several fire on the same bar
+    exit_offset = np.maximum(width - 1, 0)
+    exit_reason = np.where(width < available, policy.get('time_reason', MAX_HOLD), END_OF_DATA).astype(object)
+    exit_level = np.full(n_signals, np.nan)  # NaN: exit at the bar close
+    for offset, reason, level in reversed(candidates):
+        take = offset <= exit_offset
+        exit_offset = np.where(take, offset, exit_offset)
+        exit_reason[take] = reason
+        exit_level = np.where(take, np.nan if level is None else level, exit_level)
+
+    exit_idx = np.minimum(start + exit_offset, max(n_bars - 1, 0))
+    bar_close = closes[exit_idx] if n_bars > 0 else np.full(n_signals, np.nan)
+    exit_price = np.where(np.isnan(exit_level), bar_close, exit_level)
+
+    # Fills after the exit bar never happen; the exit closes what is left
+    filled = (tp_offset <= exit_offset[:, None]) & valid[:, None]
+    exit_portion = np.ones(n_signals)
+    for k, portion in enumerate(portions):
+        exit_portion = np.where(filled[:, k], exit_portion - portion, exit_portion)
+    exit_portion = np.where(exit_portion > 1e-9, exit_portion, 0.0)
+
+    return {
+        'valid': valid,
+        'entry_price': entry_prices,
+        'stop_loss': stop_loss,
+        'tp_idx': np.where(filled, start[:, None] + tp_offset, -1),
+        'tp_price': tp_price,
+        'exit_idx': exit_idx,
+        'exit_price': exit_price,
+        'exit_reason': exit_reason,
+        'exit_portion': exit_portion
+    }
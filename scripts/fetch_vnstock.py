@@ -2,11 +2,30 @@
 """
 VNStock Data Fetcher
 Fetches real stock data from VNStock library v3.3.0 (FREE)
+
+One-shot (prints JSON for STOCK_CODES, as before):
+    python3 scripts/fetch_vnstock.py
+
+Resident quote service (pages/api/history.ts talks to this over HTTP):
+    python3 scripts/fetch_vnstock.py serve [--port 8765]
+
+    GET /quote?codes=VNM,FPT   -> {"success": true, "data": [...], "missing": [...]}
+    GET /health
+
+The service keeps an in-memory price table, refreshed in the background
+every QUOTE_REFRESH_SECONDS; lookups are answered from memory. Unknown
+codes are fetched on request; those that return a quote are then refreshed
+with the rest (up to QUOTE_MAX_CODES tracked codes).
 """
 
+import argparse
 import json
+import os
 import sys
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
 try:
     from vnstock import Vnstock
@@ -14,20 +33,32 @@ except ImportError:
     print(json.dumps({"error": "vnstock not installed. Run: pip install vnstock --upgrade"}))
     sys.exit(1)
 
+from quote_fetcher import QuoteFetcher
+
 STOCK_CODES = ['MBB', 'VNM', 'HPG', 'FPT', 'VCB', 'VIC']
 
+SERVICE_HOST = os.environ.get('QUOTE_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.environ.get('QUOTE_SERVICE_PORT', 8765))
+REFRESH_SECONDS = float(os.environ.get('QUOTE_REFRESH_SECONDS', 60))
+MAX_TRACKED_CODES = int(os.environ.get('QUOTE_MAX_CODES', 500))
+
+# Calendar days of history requested to find the latest bar
+LOOKBACK_DAYS = 10
+
 def fetch_stock_data(code):
     try:
         stock = Vnstock().stock(symbol=code, source='VCI')
-        
-        # Get current quote
-        quote = stock.quote.history(symbol=code, start='2024-12-01', end='2024-12-31')
-        
+
+        # Get current quote (latest daily bar)
+        end = datetime.now().strftime('%Y-%m-%d')
+        start = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        quote = stock.quote.history(symbol=code, start=start, end=end)
+
         if quote.empty:
             return None
-        
+
         latest = quote.iloc[-1]
-        
+
         return {
             'code': code,
             'price': float(latest['close']),
@@ -42,14 +73,138 @@ def fetch_stock_data(code):
         print(f"Error fetching {code}: {e}", file=sys.stderr)
         return None
 
+# ============================================================================
+# RESIDENT QUOTE SERVICE
+# ============================================================================
+
+class QuoteTable:
+    """In-memory {code: quote} table, refreshed by a background thread"""
+
+    def __init__(self, codes=STOCK_CODES, refresh_seconds=REFRESH_SECONDS, fetch_func=fetch_stock_data,
+                 max_codes=MAX_TRACKED_CODES):
+        self.codes = list(dict.fromkeys(c.upper() for c in codes))
+        self.refresh_seconds = refresh_seconds
+        self.max_codes = max_codes
+        self.quotes = {}
+        self.updated = None
+        self._fetcher = QuoteFetcher(fetch_func)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self, codes=None):
+        """Fetch codes (default: all tracked) concurrently and store them"""
+        codes = list(codes if codes is not None else self.codes)
+        fresh = self._fetcher.fetch_all(codes)
+        with self._lock:
+            self.quotes.update(fresh)
+            self.updated = datetime.now().isoformat()
+        return fresh
+
+    def lookup(self, codes):
+        """
+        Quotes for codes; untracked codes are fetched now
+
+        An untracked code is tracked from then on only if its fetch returned
+        a quote and fewer than max_codes codes are tracked.
+        """
+        codes = list(dict.fromkeys(c.strip().upper() for c in codes if c and c.strip()))
+        with self._lock:
+            new_codes = [c for c in codes if c not in self.quotes]
+
+        fresh = self._fetcher.fetch_all(new_codes) if new_codes else {}
+
+        with self._lock:
+            for code, quote in fresh.items():
+                if code not in self.codes:
+                    if len(self.codes) >= self.max_codes:
+                        continue
+                    self.codes.append(code)
+                self.quotes[code] = quote
+            quotes = {**fresh, **{c: self.quotes[c] for c in codes if c in self.quotes}}
+        return [quotes[c] for c in codes if c in quotes], [c for c in codes if c not in quotes]
+
+    def start(self):
+        """Initial load, then refresh every refresh_seconds in the background"""
+        self.refresh()
+
+        def loop():
+            while not self._stop.wait(self.refresh_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Refresh error: {e}", file=sys.stderr)
+
+        threading.Thread(target=loop, name='quote-refresh', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+def make_handler(table):
+    class QuoteHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/quote':
+                params = parse_qs(url.query)
+                codes = [c for value in params.get('codes', params.get('code', [])) for c in value.split(',')]
+                data, missing = table.lookup(codes) if codes else table.lookup(table.codes)
+                self._send(200, {
+                    'success': True,
+                    'data': data,
+                    'missing': missing,
+                    'updated': table.updated,
+                    'timestamp': datetime.now().isoformat()
+                })
+            elif url.path == '/health':
+                self._send(200, {'status': 'healthy', 'codes': len(table.codes), 'updated': table.updated})
+            else:
+                self._send(404, {'success': False, 'error': 'Not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return QuoteHandler
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, refresh_seconds=REFRESH_SECONDS):
+    table = QuoteTable(refresh_seconds=refresh_seconds)
+    table.start()
+
+    server = ThreadingHTTPServer((host, port), make_handler(table))
+    print(f"Quote service on http://{host}:{port} ({len(table.quotes)} quotes, refresh {refresh_seconds:.0f}s)",
+          file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        table.stop()
+        server.server_close()
+
 def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == 'serve':
+        parser = argparse.ArgumentParser(description="Resident quote service")
+        parser.add_argument('command')
+        parser.add_argument('--host', default=SERVICE_HOST)
+        parser.add_argument('--port', type=int, default=SERVICE_PORT)
+        parser.add_argument('--refresh', type=float, default=REFRESH_SECONDS, help="Refresh interval (seconds)")
+        args = parser.parse_args()
+        serve(args.host, args.port, args.refresh)
+        return
+
     results = []
-    
+
     for code in STOCK_CODES:
         data = fetch_stock_data(code)
         if data:
             results.append(data)
-    
+
     print(json.dumps({
         'success': True,
         'data': results,
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SHARED INDICATOR LIBRARY
+
+Một chỗ duy nhất tính EMA / SMA / RSI / ATR / MACD cho tất cả scanner,
+detector và backtest.
+
+- Hàm thuần (ema, sma, rsi, atr, macd): trả về đúng kết quả như các bản
+  copy cũ trong từng file
+- IndicatorFrame: mỗi (indicator, params) chỉ tính một lần cho một mã
+- IndicatorCache: nhớ IndicatorFrame theo (ticker, data version); khi có
+  nến mới nối vào cuối, chỉ tính phần nến mới
+
+RSI methods:
+    'sma'    - rolling mean of gains/losses (backtests, daily scanners)
+    'wilder' - ewm(com=period-1) of gains/losses (breakout/divergence)
+"""
+
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# PURE FUNCTIONS
+# ============================================================================
+
+def ema(series: pd.Series, period: int, adjust: bool = False) -> pd.Series:
+    """Exponential Moving Average"""
+    return series.ewm(span=period, adjust=adjust).mean()
+
+
+def sma(series: pd.Series, period: int) -> pd.Series:
+    """Simple Moving Average"""
+    return series.rolling(window=period).mean()
+
+
+def rsi(close: pd.Series, period: int = 14, method: str = 'sma',
+        zero_loss: Optional[float] = None) -> pd.Series:
+    """
+    Relative Strength Index
+
+    Args:
+        close: Close prices
+        period: RSI period
+        method: 'sma' (rolling mean) or 'wilder' (ewm, com=period-1)
+        zero_loss: Replace zero average loss with this value (avoids inf RS)
+    """
+    delta = close.diff()
+
+    if method == 'sma':
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    elif method == 'wilder':
+        gain = delta.clip(lower=0).ewm(com=period - 1, min_periods=period).mean()
+        loss = (-delta.clip(upper=0)).ewm(com=period - 1, min_periods=period).mean()
+    else:
+        raise ValueError(f"Unknown RSI method: {method}")
+
+    return _rsi_from_averages(gain, loss, zero_loss)
+
+
+def _rsi_from_averages(gain, loss, zero_loss=None):
+    if zero_loss is not None:
+        loss = loss.replace(0, zero_loss)
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def true_range(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
+    """True Range"""
+    tr1 = high - low
+    tr2 = abs(high - close.shift(1))
+    tr3 = abs(low - close.shift(1))
+    return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+
+def atr(high: pd.Series, low: pd.Series, close: pd.Series, period: int = 14) -> pd.Series:
+    """Average True Range (simple rolling mean of True Range)"""
+    return true_range(high, low, close).rolling(window=period).mean()
+
+
+def macd(close: pd.Series, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """MACD line, signal line, histogram"""
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+# ============================================================================
+# INCREMENTAL EWM
+# ============================================================================
+
+def _ewm_alpha(span=None, com=None) -> float:
+    """Smoothing factor, derived the same way pandas does"""
+    if span is not None:
+        com = (span - 1) / 2.0
+    return 1.0 / (1.0 + com)
+
+
+def _ewm_scan(values, alpha, adjust, min_periods=0, state=None):
+    """
+    Run pandas' ewm().mean() recursion over `values`, starting from `state`
+
+    Returns:
+        (output array, state) - state = (weighted, old_wt, nobs)
+    """
+    weighted, old_wt, nobs = state if state is not None else (np.nan, 1.0, 0)
+    old_wt_factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+
+    out = np.empty(len(values))
+    for i, cur in enumerate(values):
+        is_observation = cur == cur
+        nobs += is_observation
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + new_wt * cur
+                    weighted /= (old_wt + new_wt)
+                old_wt = old_wt + new_wt if adjust else 1.0
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs >= max(min_periods, 1) else np.nan
+
+    return out, (weighted, old_wt, nobs)
+
+
+# ============================================================================
+# MEMOIZED PER-TICKER INDICATORS
+# ============================================================================
+
+class IndicatorFrame:
+    """
+    Indicator columns of one ticker, each computed once
+
+    Every accessor returns a Series aligned with `df.index`; asking twice
+    for the same (indicator, params) returns the cached Series.
+    Column names are resolved case-insensitively ('close' or 'Close').
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache: Dict[tuple, pd.Series] = {}
+        self._ewm_states: Dict[tuple, tuple] = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def column(self, name: str) -> pd.Series:
+        """Raw price column ('close' / 'Close' ...)"""
+        if name in self.df.columns:
+            return self.df[name]
+        for candidate in (name.lower(), name.capitalize(), name.upper()):
+            if candidate in self.df.columns:
+                return self.df[candidate]
+        raise KeyError(name)
+
+    def _get(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # ------------------------------------------------------------------
+    # Indicators
+    # ------------------------------------------------------------------
+
+    def ema(self, period: int, adjust: bool = False, column: str = 'close') -> pd.Series:
+        return self._get(('ema', column, period, adjust),
+                         lambda: ema(self.column(column), period, adjust))
+
+    def sma(self, column: str, period: int) -> pd.Series:
+        return self._get(('sma', column, period),
+                         lambda: sma(self.column(column), period))
+
+    def rolling_max(self, column: str, period: int) -> pd.Series:
+        return self._get(('max', column, period),
+                         lambda: self.column(column).rolling(window=period).max())
+
+    def rolling_min(self, column: str, period: int) -> pd.Series:
+        return self._get(('min', column, period),
+                         lambda: self.column(column).rolling(window=period).min())
+
+    def rsi(self, period: int = 14, method: str = 'sma', zero_loss: Optional[float] = None) -> pd.Series:
+        return self._get(('rsi', period, method, zero_loss),
+                         lambda: rsi(self.column('close'), period, method, zero_loss))
+
+    def volume_ratio(self, periods: int = 1) -> pd.Series:
+        """Volume / volume `periods` bars earlier"""
+        return self._get(('volume_ratio', periods),
+                         lambda: self.column('volume') / self.column('volume').shift(periods))
+
+    def atr(self, period: int = 14) -> pd.Series:
+        return self._get(('atr', period),
+                         lambda: atr(self.column('high'), self.column('low'), self.column('close'), period))
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
+        macd_line = self._get(('macd', fast, slow),
+                              lambda: self.ema(fast) - self.ema(slow))
+        signal_line = self._get(('macd_signal', fast, slow, signal),
+                                lambda: ema(macd_line, signal))
+        histogram = self._get(('macd_hist', fast, slow, signal),
+                              lambda: macd_line - signal_line)
+        return macd_line, signal_line, histogram
+
+    # ------------------------------------------------------------------
+    # Append new bars
+    # ------------------------------------------------------------------
+
+    def append(self, new_bars: pd.DataFrame) -> 'IndicatorFrame':
+        """
+        Append bars to the end and extend every cached column
+
+        Rolling indicators are recomputed on a trailing window only and
+        EMAs continue from their last state, so the cost is proportional
+        to the number of new bars. Values match a full recompute up to
+        floating-point rounding of the rolling sums.
+        """
+        n_new = len(new_bars)
+        if n_new == 0:
+            return self
+
+        n_old = len(self.df)
+        old_df = self.df
+        self.df = pd.concat([old_df, new_bars])
+        new_index = self.df.index[n_old:]
+
+        # Order matters: macd line before its signal line
+        for key in sorted(self._cache, key=_extend_order):
+            old = self._cache[key]
+            values = self._extend(key, n_old, old_df)
+            self._cache[key] = pd.concat([old, pd.Series(values, index=new_index, name=old.name)])
+
+        return self
+
+    def _tail(self, column, n_old, lookback):
+        """Raw column from `lookback` bars before the first new bar"""
+        start = max(0, n_old - lookback)
+        return self.column(column).iloc[start:], n_old - start
+
+    def _extend_ewm(self, key, series_old, series_all, n_old, alpha, adjust, min_periods=0):
+        state = self._ewm_states.get(key)
+        if state is None:
+            _, state = _ewm_scan(series_old.to_numpy(dtype=float), alpha, adjust, min_periods)
+        out, state = _ewm_scan(series_all.iloc[n_old:].to_numpy(dtype=float), alpha, adjust, min_periods, state)
+        self._ewm_states[key] = state
+        return out
+
+    def _extend(self, key, n_old, old_df):
+        kind = key[0]
+
+        if kind == 'ema':
+            _, column, period, adjust = key
+            return self._extend_ewm(key, old_df[self.column(column).name], self.column(column),
+                                    n_old, _ewm_alpha(span=period), adjust)
+
+        if kind in ('sma', 'max', 'min'):
+            _, column, period = key
+            tail, offset = self._tail(column, n_old, period - 1)
+            rolling = tail.rolling(window=period)
+            result = {'sma': rolling.mean, 'max': rolling.max, 'min': rolling.min}[kind]()
+            return result.to_numpy()[offset:]
+
+        if kind == 'rsi':
+            _, period, method, zero_loss = key
+            if method == 'sma':
+                tail, offset = self._tail('close', n_old, period)
+                return rsi(tail, period, method, zero_loss).to_numpy()[offset:]
+            # wilder: continue both averages from their ewm state
+            delta = self.column('close').diff()
+            alpha = _ewm_alpha(com=period - 1)
+            gain = self._extend_ewm(key + ('gain',), delta.clip(lower=0).iloc[:n_old],
+                                    delta.clip(lower=0), n_old, alpha, True, period)
+            loss = self._extend_ewm(key + ('loss',), (-delta.clip(upper=0)).iloc[:n_old],
+                                    -delta.clip(upper=0), n_old, alpha, True, period)
+            return _rsi_from_averages(pd.Series(gain), pd.Series(loss), zero_loss).to_numpy()
+
+        if kind == 'volume_ratio':
+            _, periods = key
+            tail, offset = self._tail('volume', n_old, periods)
+            return (tail / tail.shift(periods)).to_numpy()[offset:]
+
+        if kind == 'atr':
+            _, period = key
+            start = max(0, n_old - period)
+            tr = true_range(self.column('high').iloc[start:], self.column('low').iloc[start:],
+                            self.column('close').iloc[start:])
+            return tr.rolling(window=period).mean().to_numpy()[n_old - start:]
+
+        if kind == 'macd':
+            _, fast, slow = key
+            return (self.ema(fast) - self.ema(slow)).to_numpy()[n_old:]
+
+        if kind == 'macd_signal':
+            _, fast, slow, signal = key
+            macd_line = self._cache[('macd', fast, slow)]
+            return self._extend_ewm(key, macd_line.iloc[:n_old], macd_line,
+                                    n_old, _ewm_alpha(span=signal), False)
+
+        if kind == 'macd_hist':
+            _, fast, slow, signal = key
+            return (self._cache[('macd', fast, slow)] - self._cache[('macd_signal', fast, slow, signal)]).to_numpy()[n_old:]
+
+        raise KeyError(key)
+
+
+_EXTEND_ORDER = {'ema': 0, 'macd': 1, 'macd_signal': 2, 'macd_hist': 3}
+
+
+def _extend_order(key):
+    return _EXTEND_ORDER.get(key[0], 0)
+
+
+# ============================================================================
+# CACHE BY (TICKER, DATA VERSION)
+# ============================================================================
+
+def data_version(df: pd.DataFrame) -> tuple:
+    """
+    Cheap fingerprint of a price frame: rows + last bar + CRC32 of the
+    close column (a restated bar mid-history changes the version too)
+    """
+    if len(df) == 0:
+        return (0,)
+    last = df.iloc[-1]
+    when = last['time'] if 'time' in df.columns else df.index[-1]
+    close_col = 'close' if 'close' in df.columns else 'Close'
+    closes = np.ascontiguousarray(df[close_col].to_numpy(dtype=np.float64))
+    return (len(df), str(when), float(closes[-1]), zlib.crc32(closes.tobytes()))
+
+
+class IndicatorCache:
+    """
+    LRU of IndicatorFrame keyed by (ticker, data version)
+
+    When a ticker comes back with the same history plus new bars at the
+    end, its cached frame is extended with append() instead of recomputed.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._frames: "OrderedDict[tuple, IndicatorFrame]" = OrderedDict()
+        self._latest: Dict[str, tuple] = {}
+
+    def get(self, ticker: str, df: pd.DataFrame, version=None) -> IndicatorFrame:
+        if version is None:
+            version = data_version(df)
+        key = (ticker, version)
+
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+            return frame
+
+        previous_key = self._latest.get(ticker)
+        previous = self._frames.pop(previous_key, None) if previous_key else None
+
+        if previous is not None and _is_prefix(previous.df, df):
+            frame = previous.append(df.iloc[len(previous.df):])
+            frame.df = df
+        else:
+            frame = IndicatorFrame(df)
+
+        self._frames[key] = frame
+        self._latest[ticker] = key
+        while len(self._frames) > self.max_entries:
+            old_key, _ = self._frames.popitem(last=False)
+            if self._latest.get(old_key[0]) == old_key:
+                del self._latest[old_key[0]]
+        return frame
+
+    def clear(self):
+        self._frames.clear()
+        self._latest.clear()
+
+
+def _is_prefix(old_df: pd.DataFrame, new_df: pd.DataFrame) -> bool:
+    """True if new_df = old_df + more bars at the end"""
+    n = len(old_df)
+    if n == 0 or len(new_df) <= n:
+        return False
+    return data_version(old_df) == data_version(new_df.iloc[:n])
+
+
+# Shared cache for scripts that scan/backtest many tickers in one process
+CACHE = IndicatorCache()
+
+
+def get_indicators(ticker: str, df: pd.DataFrame, version=None) -> IndicatorFrame:
+    """Memoized IndicatorFrame for one ticker (see IndicatorCache)"""
+    return CACHE.get(ticker, df, version)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+COLUMNAR LEDGER - BẢNG GHI THÊM DẠNG CỘT CHO TRADES / EQUITY
+
+Thay cho list các dict (mỗi lệnh/ngày một dict, rồi pd.DataFrame(list)):
+- Mỗi cột là một mảng NumPy cấp phát trước, tăng gấp đôi khi đầy
+- Ghi theo lô cột (simulate_trades) hoặc từng dòng (BacktestEngine)
+- Vượt memory budget → phần trong RAM được ghi ra đĩa (Parquet nếu có
+  pyarrow, nếu không thì pickle) và bộ nhớ được dùng lại
+- Đọc lại theo cột: to_frame(columns=[...]) chỉ đọc các cột cần
+
+Usage:
+    ledger = ColumnarLedger(memory_budget_mb=256)
+    ledger.extend({'code': codes, 'net_pnl': pnl})   # one batch
+    ledger.append({'date': d, 'equity': e})          # one row
+    df = ledger.to_frame(columns=['strategy', 'net_pnl'])
+    ledger.to_csv('all_trades.csv')
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+MEMORY_BUDGET_MB = float(os.environ.get('LEDGER_MEMORY_MB', 256))
+
+INITIAL_CAPACITY = 1024
+
+try:
+    import pyarrow  # noqa: F401
+    SPILL_FORMAT = 'parquet'
+except ImportError:
+    SPILL_FORMAT = 'pkl'
+
+
+def _as_column(values) -> np.ndarray:
+    """Batch values as a 1-D array: int64 / float64 / bool / datetime64[ns] / object"""
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    arr = np.asarray(values)
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+
+    kind = arr.dtype.kind
+    if kind in 'iu':
+        return arr.astype(np.int64, copy=False)
+    if kind == 'f':
+        return arr.astype(np.float64, copy=False)
+    if kind == 'b':
+        return arr
+    if kind == 'M':
+        return arr.astype('datetime64[ns]', copy=False)
+    if kind == 'm':
+        return arr.astype('timedelta64[ns]', copy=False)
+    if kind in 'US':
+        # Repeated labels (strategy, exit_reason) share one str object each
+        uniques, inverse = np.unique(arr, return_inverse=True)
+        return uniques.astype(object)[inverse.reshape(-1)]
+
+    arr = arr.astype(object, copy=False)
+    first = next((v for v in arr if v is not None), None)
+    if isinstance(first, (datetime, date, np.datetime64)):
+        try:
+            return np.asarray(arr, dtype='datetime64[ns]')
+        except (TypeError, ValueError):
+            pass
+    return arr
+
+
+def _nullable(dtype: np.dtype) -> np.dtype:
+    """dtype able to hold a missing value"""
+    if dtype.kind in 'iu':
+        return np.dtype(np.float64)
+    if dtype.kind == 'b':
+        return np.dtype(object)
+    return dtype
+
+
+def _missing(dtype: np.dtype):
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind in 'Mm':
+        return np.datetime64('NaT') if dtype.kind == 'M' else np.timedelta64('NaT')
+    return None
+
+
+def _as_object(arr: np.ndarray) -> np.ndarray:
+    """Object array; dates stay Timestamps (astype(object) gives integer ns)"""
+    if arr.dtype.kind in 'Mm':
+        return np.array(pd.Series(arr).astype(object), dtype=object)
+    return arr.astype(object)
+
+
+def _all_missing(arr: np.ndarray) -> bool:
+    """Batch column holding only None / NaN / NaT"""
+    return arr.dtype.kind in 'Ofm' and bool(pd.isna(arr).all())
+
+
+def _common(a: np.dtype, b: np.dtype) -> np.dtype:
+    if a == b:
+        return a
+    if a.kind in 'iuf' and b.kind in 'iuf':
+        return np.dtype(np.float64) if 'f' in (a.kind, b.kind) else np.dtype(np.int64)
+    return np.dtype(object)
+
+
+def _write_part(df: pd.DataFrame, path: str):
+    if SPILL_FORMAT == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_pickle(path)
+
+
+def _read_part(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            present = set(pq.read_schema(path).names)
+            return pd.read_parquet(path, columns=[c for c in columns if c in present])
+        return pd.read_parquet(path)
+    df = pd.read_pickle(path)
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+
+class ColumnarLedger:
+    """
+    Append-only table of growable NumPy columns with spill to disk
+
+    Columns may appear in later batches (earlier rows read as missing)
+    and may be absent from a batch (filled with NaN / NaT / None). Integer
+    columns become float64 and bool columns object once a value is missing.
+    """
+
+    def __init__(
+        self,
+        capacity: int = INITIAL_CAPACITY,
+        memory_budget_mb: Optional[float] = MEMORY_BUDGET_MB,
+        spill_dir: Optional[str] = None
+    ):
+        self.columns = {}  # name -> array of length capacity
+        self.capacity = max(1, capacity)
+        self.memory_budget = None if memory_budget_mb is None else int(memory_budget_mb * 2**20)
+        self.spill_dir = spill_dir
+        self.parts = []  # spilled part files, oldest first
+        self._size = 0  # rows in memory
+        self._spilled_rows = 0
+        self._own_spill_dir = False
+
+    def __len__(self) -> int:
+        return self._spilled_rows + self._size
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the in-memory columns (object cells count as pointers)"""
+        return sum(col.nbytes for col in self.columns.values())
+
+    @property
+    def used_nbytes(self) -> int:
+        """Bytes of the rows in memory - what the memory budget is checked against"""
+        return self._size * sum(col.itemsize for col in self.columns.values())
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _reserve(self, n: int):
+        needed = self._size + n
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, col in self.columns.items():
+            grown = np.empty(capacity, dtype=col.dtype)
+            grown[:self._size] = col[:self._size]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def _add_column(self, name: str, dtype: np.dtype) -> np.ndarray:
+        if len(self) > 0:
+            dtype = _nullable(dtype)
+        col = np.empty(self.capacity, dtype=dtype)
+        if self._size:
+            col[:self._size] = _missing(dtype)
+        self.columns[name] = col
+        return col
+
+    def _promote(self, name: str, dtype: np.dtype) -> np.ndarray:
+        col = self.columns[name]
+        col = _as_object(col) if dtype == object else col.astype(dtype)
+        self.columns[name] = col
+        return col
+
+    def extend(self, batch):
+        """
+        Append many rows
+
+        Args:
+            batch: {column: values} (equal lengths), a DataFrame, or
+                another ColumnarLedger
+        """
+        if isinstance(batch, ColumnarLedger):
+            for frame in batch.iter_frames():
+                self.extend(frame)
+            return
+        if isinstance(batch, pd.DataFrame):
+            batch = {name: batch[name].to_numpy() for name in batch.columns}
+
+        arrays = {name: _as_column(values) for name, values in batch.items()}
+        if not arrays:
+            return
+        n = len(next(iter(arrays.values())))
+        if n == 0:
+            return
+        if any(len(arr) != n for arr in arrays.values()):
+            raise ValueError("All columns of a batch must have the same length")
+
+        self._reserve(n)
+        start, end = self._size, self._size + n
+
+        for name, arr in arrays.items():
+            col = self.columns.get(name)
+            if col is None:
+                col = self._add_column(name, arr.dtype)
+            elif _all_missing(arr):
+                # e.g. None in a date column: NaT, not a promotion to object
+                dtype = _nullable(col.dtype)
+                if dtype != col.dtype:
+                    col = self._promote(name, dtype)
+                col[start:end] = _missing(dtype)
+                continue
+            dtype = _common(col.dtype, arr.dtype)
+            if dtype != col.dtype:
+                col = self._promote(name, dtype)
+            col[start:end] = _as_object(arr) if dtype == object else arr
+
+        for name, col in self.columns.items():
+            if name in arrays:
+                continue
+            dtype = _nullable(col.dtype)
+            if dtype != col.dtype:
+                col = self._promote(name, dtype)
+            col[start:end] = _missing(dtype)
+
+        self._size = end
+
+        if self.memory_budget is not None and self.used_nbytes > self.memory_budget:
+            self.spill()
+
+    def append(self, row: Mapping):
+        """Append one row {column: value}"""
+        self.extend({name: [value] for name, value in row.items()})
+
+    def spill(self):
+        """Write the in-memory rows to a part file and start over in memory"""
+        if self._size == 0:
+            return
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='ledger_')
+            self._own_spill_dir = True
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        path = os.path.join(self.spill_dir, f"part-{len(self.parts):05d}.{SPILL_FORMAT}")
+        _write_part(self._memory_frame(), path)
+        self.parts.append(path)
+        self._spilled_rows += self._size
+        self._size = 0
+
+        # Object cells would otherwise keep their values alive
+        for col in self.columns.values():
+            if col.dtype == object:
+                col[:] = None
+
+    def close(self):
+        """Delete spilled parts created in a temporary directory"""
+        if self._own_spill_dir and self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.parts = []
+        self._spilled_rows = 0
+
+    def __getstate__(self):
+        # Only the used rows are pickled (e.g. results from worker processes)
+        state = self.__dict__.copy()
+        state['columns'] = {name: col[:self._size].copy() for name, col in self.columns.items()}
+        state['capacity'] = max(1, self._size)
+        return state
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _memory_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        names = self.names if columns is None else [c for c in columns if c in self.columns]
+        return pd.DataFrame({name: self.columns[name][:self._size] for name in names})
+
+    def iter_frames(self, columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        """Spilled parts, then the in-memory rows, as DataFrames (in order)"""
+        columns = None if columns is None else list(columns)
+        for path in self.parts:
+            yield _read_part(path, columns)
+        if self._size:
+            yield self._memory_frame(columns)
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        columns = self.names if columns is None else [c for c in columns if c in self.columns]
+        frames = list(self.iter_frames(columns))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        if len(frames) == 1:
+            return frames[0].reindex(columns=columns)
+        return pd.concat(frames, ignore_index=True).reindex(columns=columns)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.to_frame([name])[name].to_numpy()
+
+    def to_records(self) -> List[Dict]:
+        """Rows as dicts (for JSON output)"""
+        return self.to_frame().to_dict('records')
+
+    def to_csv(self, path: str, **kwargs):
+        """Write all rows to CSV one part at a time"""
+        names = self.names
+        kwargs.setdefault('index', False)
+        header = True
+        for frame in self.iter_frames():
+            frame.reindex(columns=names).to_csv(path, mode='w' if header else 'a', header=header, **kwargs)
+            header = False
+        if header:
+            pd.DataFrame(columns=names).to_csv(path, **kwargs)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MARKET DATA STORE - LƯU DỮ LIỆU THEO CỘT, TỪNG MÃ
+
+Thay cho các file PKL dạng {ticker: DataFrame}:
+- Mỗi mã một thư mục, mỗi cột một file .npy (đọc bằng memory-map)
+- manifest.json nhỏ liệt kê mã, số dòng, cột, khoảng thời gian, version
+- Đọc 20 mã chỉ chạm tới bytes của 20 mã đó
+- Checkpoint chỉ ghi thêm các mã mới tải, không ghi lại cả universe
+
+Layout:
+    <root>/manifest.json
+    <root>/<TICKER>/<column>.npy
+
+Usage:
+    python market_store.py import data_2025/liquid_stocks_2025_1D.pkl data_2025/store
+    python market_store.py info data_2025/store
+"""
+
+import json
+import os
+import pickle
+import shutil
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_FORMAT = 1
+
+# Non-default index (e.g. intraday data indexed by time) is stored as a column
+INDEX_COLUMN = '__index__'
+
+
+class MarketDataStore(Mapping):
+    """
+    Per-ticker, per-column on-disk store for OHLCV DataFrames
+
+    Behaves like a read-only dict {ticker: DataFrame}: tickers are listed
+    from the manifest and a ticker's columns are only read on access.
+    """
+
+    def __init__(self, root: str, mmap: bool = True):
+        self.root = root
+        self.mmap = mmap
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'format': MANIFEST_FORMAT, 'tickers': {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def reload(self):
+        """Re-read the manifest (e.g. after another process wrote to it)"""
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self.manifest['tickers']:
+            raise KeyError(ticker)
+        return self.read(ticker)
+
+    def __iter__(self):
+        return iter(self.manifest['tickers'])
+
+    def __len__(self) -> int:
+        return len(self.manifest['tickers'])
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self.manifest['tickers']
+
+    def tickers(self) -> List[str]:
+        return list(self.manifest['tickers'])
+
+    def info(self, ticker: str) -> Dict:
+        """Manifest entry: rows, columns, start, end, version, updated"""
+        return self.manifest['tickers'][ticker]
+
+    def version(self, ticker: str) -> int:
+        """Data version of a ticker, bumped on every write"""
+        return self.manifest['tickers'][ticker]['version']
+
+    # ------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------
+
+    def _column_path(self, ticker: str, column: str) -> str:
+        return os.path.join(self.root, ticker, f"{column}.npy")
+
+    def read_arrays(self, ticker: str, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Read raw column arrays of one ticker (memory-mapped when possible)
+
+        Returns:
+            dict: {column: ndarray}
+        """
+        entry = self.manifest['tickers'][ticker]
+        if columns is None:
+            columns = list(entry['columns'])
+
+        arrays = {}
+        for column in columns:
+            if column not in entry['columns'] and not (column == INDEX_COLUMN and entry.get('index')):
+                raise KeyError(f"{ticker}: no column '{column}'")
+            arrays[column] = np.load(
+                self._column_path(ticker, column),
+                mmap_mode='r' if self.mmap else None,
+                allow_pickle=False
+            )
+        return arrays
+
+    def read(self, ticker: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Read one ticker as a DataFrame"""
+        entry = self.manifest['tickers'][ticker]
+        if columns is None:
+            columns = list(entry['columns'])
+        columns = list(columns)
+
+        wanted = columns + ([INDEX_COLUMN] if entry.get('index') else [])
+        arrays = self.read_arrays(ticker, wanted)
+
+        df = pd.DataFrame({column: np.array(arrays[column]) for column in columns})
+
+        if entry.get('index'):
+            df.index = pd.Index(np.array(arrays[INDEX_COLUMN]), name=entry['index']['name'])
+
+        return df
+
+    def read_many(self, tickers: Iterable[str], columns: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+        """Read several tickers: {ticker: DataFrame}"""
+        return {ticker: self.read(ticker, columns) for ticker in tickers if ticker in self}
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+
+    def _write_ticker(self, ticker: str, df: pd.DataFrame) -> Dict:
+        ticker_dir = os.path.join(self.root, ticker)
+        tmp_dir = ticker_dir + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        columns = {}
+        for column in df.columns:
+            array = _to_array(df[column])
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), array, allow_pickle=False)
+            columns[str(column)] = array.dtype.str
+
+        index = None
+        if not isinstance(df.index, pd.RangeIndex):
+            array = _to_array(df.index.to_series())
+            np.save(os.path.join(tmp_dir, f"{INDEX_COLUMN}.npy"), array, allow_pickle=False)
+            index = {'name': df.index.name, 'dtype': array.dtype.str}
+
+        # Swap the new ticker folder in place of the old one
+        if os.path.exists(ticker_dir):
+            shutil.rmtree(ticker_dir)
+        os.replace(tmp_dir, ticker_dir)
+
+        start, end = _time_range(df)
+        previous = self.manifest['tickers'].get(ticker, {})
+
+        return {
+            'rows': len(df),
+            'columns': columns,
+            'index': index,
+            'start': start,
+            'end': end,
+            'version': previous.get('version', 0) + 1,
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def write(self, ticker: str, df: pd.DataFrame):
+        """Write (or replace) one ticker and update the manifest"""
+        self.write_many({ticker: df})
+
+    def write_many(self, data: Dict[str, pd.DataFrame]):
+        """
+        Write (or replace) several tickers, then update the manifest once
+
+        Tickers not in `data` are left untouched, so a checkpoint only
+        costs the bytes of the newly fetched tickers.
+        """
+        if len(data) == 0:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        for ticker, df in data.items():
+            self.manifest['tickers'][ticker] = self._write_ticker(ticker, df)
+        self._save_manifest()
+
+    def update_info(self, ticker: str, **fields):
+        """Set extra manifest fields of one ticker (data is not touched)"""
+        self.manifest['tickers'][ticker].update(fields)
+        self._save_manifest()
+
+    def delete(self, ticker: str):
+        """Remove one ticker"""
+        if ticker not in self.manifest['tickers']:
+            return
+        shutil.rmtree(os.path.join(self.root, ticker), ignore_errors=True)
+        del self.manifest['tickers'][ticker]
+        self._save_manifest()
+
+    def clear(self):
+        """Remove every ticker, leaving an empty store"""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.manifest = {'format': MANIFEST_FORMAT, 'tickers': {}}
+        self._save_manifest()
+
+    def size_bytes(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+        return total
+
+
+def _to_array(series: pd.Series) -> np.ndarray:
+    """Convert a column to a plain (non-object) NumPy array for .npy storage"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        array = series.to_numpy(dtype='datetime64[ns]')
+    elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        array = np.ascontiguousarray(series.to_numpy())
+    else:
+        array = series.astype(str).to_numpy(dtype=str)
+    # Drop dtype metadata (left by some pickled frames) - .npy cannot keep it
+    return array.view(np.dtype(array.dtype.str))
+
+
+def _time_range(df: pd.DataFrame):
+    """First/last timestamp of a frame (time column or datetime index)"""
+    if 'time' in df.columns and len(df) > 0:
+        times = pd.to_datetime(df['time'])
+    elif isinstance(df.index, pd.DatetimeIndex) and len(df) > 0:
+        times = df.index
+    else:
+        return None, None
+    return str(times.min()), str(times.max())
+
+
+# ============================================================================
+# PKL MIGRATION
+# ============================================================================
+
+def import_pickle(pkl_file: str, store: MarketDataStore, overwrite: bool = False) -> int:
+    """
+    Import a {ticker: DataFrame} PKL file into the store
+
+    Returns:
+        int: Number of tickers written
+    """
+    with open(pkl_file, 'rb') as f:
+        data = pickle.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError(f"{pkl_file}: expected dict of DataFrames, got {type(data).__name__}")
+
+    new_data = {
+        ticker: df for ticker, df in data.items()
+        if isinstance(df, pd.DataFrame) and (overwrite or ticker not in store)
+    }
+    store.write_many(new_data)
+    return len(new_data)
+
+
+def _pending_pickles(data_folder: str, pkl_pattern: str, store: MarketDataStore) -> List[str]:
+    """PKL files not yet in the store: all of them, or those newer than its manifest"""
+    if not os.path.exists(data_folder):
+        return []
+    imported_at = os.path.getmtime(store.manifest_path) if store.exists() else None
+    pkl_files = sorted(
+        os.path.join(data_folder, name) for name in os.listdir(data_folder)
+        if name.endswith('.pkl') and pkl_pattern in name
+    )
+    return [
+        pkl_file for pkl_file in pkl_files
+        if imported_at is None or os.path.getmtime(pkl_file) > imported_at
+    ]
+
+
+def open_store(data_folder: str, pkl_pattern: str = '.pkl') -> MarketDataStore:
+    """
+    Open <data_folder>/store, importing PKL files it has not seen yet
+
+    PKL files whose name contains `pkl_pattern` are imported on first use and
+    again whenever they are newer than the manifest, in name order (later
+    files win, like dict.update); otherwise only the store is read.
+    """
+    store = MarketDataStore(os.path.join(data_folder, 'store'))
+
+    for pkl_file in _pending_pickles(data_folder, pkl_pattern, store):
+        try:
+            count = import_pickle(pkl_file, store, overwrite=True)
+            print(f"   📦 Imported {os.path.basename(pkl_file)}: {count} stocks")
+        except Exception as e:
+            print(f"   ⚠️ {os.path.basename(pkl_file)}: {e}")
+
+    return store
+
+
+def list_tickers(data_folder: str, pkl_pattern: str = '.pkl') -> List[str]:
+    """
+    Tickers open_store(data_folder) would hold, without writing the store
+
+    Stored tickers come from the manifest; only PKL files the store has not
+    imported yet are unpickled for their keys.
+    """
+    store = MarketDataStore(os.path.join(data_folder, 'store'))
+    tickers = set(store.tickers())
+
+    for pkl_file in _pending_pickles(data_folder, pkl_pattern, store):
+        try:
+            with open(pkl_file, 'rb') as f:
+                data = pickle.load(f)
+            if isinstance(data, dict):
+                tickers.update(data)
+        except Exception as e:
+            print(f"   ⚠️ {os.path.basename(pkl_file)}: {e}")
+
+    return sorted(tickers)
+
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == 'import':
+        store = MarketDataStore(sys.argv[3])
+        count = import_pickle(sys.argv[2], store)
+        print(f"✅ Imported {count} stocks → {store.root} ({len(store)} total)")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'info':
+        store = MarketDataStore(sys.argv[2])
+        print(f"Store: {store.root}")
+        print(f"Stocks: {len(store)}")
+        print(f"Size: {store.size_bytes() / 1024 / 1024:.1f} MB")
+        for ticker in store.tickers()[:20]:
+            entry = store.info(ticker)
+            print(f"   {ticker:6} {entry['rows']:>6} rows  {entry['start']} → {entry['end']}")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BACKTEST METRICS - CHỈ SỐ HIỆU QUẢ DÙNG CHUNG CHO MỌI BACKTEST
+
+Một chỗ tính tất cả chỉ số, thay cho các bản copy trong get_metrics,
+analyze_results và calculate_metrics:
+- trade_metrics: mọi chỉ số theo lệnh trong MỘT lượt theo nhóm
+  (strategy / code / month / ...): mỗi nhóm là một mã số, các tổng dùng
+  np.bincount, best/worst/drawdown dùng reduceat trên mảng đã sắp theo nhóm
+- equity_metrics: chỉ số trên đường equity theo ngày (Sharpe, Sortino,
+  CAGR, exposure, max drawdown)
+- rolling_drawdown: drawdown so với đỉnh trong cửa sổ trượt
+
+Quy ước: lệnh thắng khi lãi > 0, còn lại là lệnh thua; profit factor = inf
+khi có lãi mà không có lỗ. Lợi nhuận (%) là % trên vốn của lệnh.
+
+Usage:
+    trade_metrics(trades_df, return_col='pnl_percent')              # dict
+    trade_metrics(ledger, by=['strategy', 'month'], date_col='exit_date',
+                  pnl_col='net_pnl', capital=100_000_000)           # DataFrame
+    equity_metrics(engine.equity_curve)
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Union
+
+from ledger import ColumnarLedger
+
+TRADING_DAYS = 252
+DAYS_PER_YEAR = 365.25
+
+NS_PER_DAY = 86_400 * 10**9
+
+TRADE_METRICS = (
+    'total_trades', 'winning_trades', 'losing_trades', 'win_rate',
+    'avg_win', 'avg_loss', 'avg_return', 'best_trade', 'worst_trade',
+    'gross_profit', 'gross_loss', 'profit_factor', 'expectancy',
+    'total_pnl', 'total_return', 'cagr', 'sharpe', 'sortino',
+    'max_drawdown', 'avg_hold_days', 'exposure'
+)
+
+
+def _frame(trades, columns) -> pd.DataFrame:
+    """Only the needed columns of a ledger / DataFrame / list of dicts"""
+    if isinstance(trades, ColumnarLedger):
+        return trades.to_frame(columns=columns)
+    if isinstance(trades, pd.DataFrame):
+        return trades
+    if isinstance(trades, dict):
+        return pd.DataFrame({c: trades[c] for c in columns if c in trades})
+    return pd.DataFrame(list(trades))
+
+
+def _month_key(dates: Optional[pd.Series]) -> pd.PeriodIndex:
+    if dates is None:
+        raise KeyError("Grouping by 'month' needs a date_col with dates")
+    return pd.PeriodIndex(dates, freq='M')
+
+
+def _group_codes(keys, names, sort: bool):
+    """
+    Dense group codes for one or more key columns
+
+    Each key is factorized once; several keys are combined into one integer
+    (mixed radix) and factorized again, which is much cheaper than grouping
+    on tuples of objects.
+
+    Returns:
+        (codes, index) - codes 0..k-1 per row, index of the k groups
+    """
+    level_codes, level_uniques = [], []
+    for key in keys:
+        codes, uniques = pd.factorize(key, sort=sort, use_na_sentinel=False)
+        level_codes.append(codes.astype(np.int64))
+        level_uniques.append(uniques)
+
+    if len(keys) == 1:
+        return level_codes[0], pd.Index(level_uniques[0], name=names[0])
+
+    combined = np.zeros(len(level_codes[0]), dtype=np.int64)
+    for codes, uniques in zip(level_codes, level_uniques):
+        combined = combined * len(uniques) + codes
+    codes, firsts = pd.factorize(combined, sort=sort)
+
+    levels = []
+    stride = 1
+    for uniques in reversed(level_uniques):
+        levels.append(np.asarray(uniques)[(firsts // stride) % len(uniques)])
+        stride *= len(uniques)
+    index = pd.MultiIndex.from_arrays(levels[::-1], names=names)
+    return codes.astype(np.int64), index
+
+
+def _segmented_cummax(values: np.ndarray, sorted_codes: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(sorted_codes, sort=False).cummax().to_numpy()
+
+
+def _divide(num, den, empty=0.0):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.full(np.broadcast(num, den).shape, empty, dtype=np.float64)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def trade_metrics(
+    trades,
+    by: Union[str, Iterable[str], None] = None,
+    return_col: str = 'pnl_percent',
+    pnl_col: Optional[str] = None,
+    hold_col: Optional[str] = None,
+    date_col: Optional[str] = None,
+    capital: Optional[float] = None,
+    position_size: Optional[float] = None,
+    sort: bool = False
+):
+    """
+    Per-trade statistics, overall or per group, in one pass
+
+    Args:
+        trades: ColumnarLedger, DataFrame, {column: array} or list of dicts
+        by: Group column(s); 'month' groups by date_col's month
+        return_col: Trade return in % of the trade's capital
+        pnl_col: Trade P&L in VND (wins/losses, profit factor and drawdown
+            use it when given)
+        hold_col: Days held
+        date_col: Trade date, for month grouping and annualizing
+        capital: Account capital; with pnl_col, total_return, CAGR and
+            drawdown are on capital + cumulative P&L
+        position_size: Fraction of capital per trade; without capital,
+            returns are scaled by it for total_return / drawdown / exposure
+        sort: Sort groups (default: order of first appearance)
+
+    Returns:
+        dict of TRADE_METRICS if by is None, else a DataFrame indexed by group
+
+    Annualized figures (cagr, sharpe, sortino, exposure) need date_col; without
+    it cagr/exposure are NaN and sharpe/sortino are per trade.
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    columns = [c for c in dict.fromkeys([return_col, pnl_col, hold_col, date_col] + by)
+               if c is not None and c != 'month']
+    df = _frame(trades, columns)
+
+    n_rows = len(df)
+    if n_rows == 0:
+        if by:
+            return pd.DataFrame(columns=list(TRADE_METRICS))
+        return {name: 0 for name in TRADE_METRICS}
+
+    r = df[return_col].to_numpy(dtype=np.float64)
+    pnl = df[pnl_col].to_numpy(dtype=np.float64) if pnl_col else None
+    hold = df[hold_col].to_numpy(dtype=np.float64) if hold_col else None
+    dates = None
+    if date_col:
+        dates = pd.to_datetime(df[date_col], errors='coerce')
+        if dates.isna().all():
+            dates = None
+
+    # Group codes 0..k-1
+    if by:
+        keys = [_month_key(dates) if c == 'month' else df[c] for c in by]
+        codes, index = _group_codes(keys, by, sort)
+    else:
+        codes = np.zeros(n_rows, dtype=np.int64)
+        index = None
+    k = int(codes.max()) + 1
+
+    def total(weights=None):
+        return np.bincount(codes, weights=weights, minlength=k)
+
+    n = total()
+    outcome = pnl if pnl is not None else r
+    win = outcome > 0
+    wins = total(win.astype(np.float64))
+    losses = n - wins
+
+    sum_r = total(r)
+    avg_return = sum_r / n
+    avg_win = _divide(total(np.where(win, r, 0.0)), wins)
+    avg_loss = _divide(total(np.where(win, 0.0, r)), losses)
+    gross_profit = total(np.where(win, outcome, 0.0))
+    gross_loss = np.abs(total(np.where(win, 0.0, outcome)))
+    profit_factor = np.where(
+        gross_loss > 0, _divide(gross_profit, gross_loss), np.where(gross_profit > 0, np.inf, 0.0)
+    )
+
+    variance = np.maximum(total(r * r) / n - avg_return ** 2, 0.0) * _divide(n, n - 1)
+    std = np.sqrt(variance)
+    downside = np.sqrt(total(np.minimum(r, 0.0) ** 2) / n)
+
+    # Order-dependent figures: sort by group, keeping trade order inside each group
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(k))
+    r_sorted = r[order]
+    best = np.maximum.reduceat(r_sorted, starts)
+    worst = np.minimum.reduceat(r_sorted, starts)
+
+    scale = position_size if position_size else 1.0
+    on_capital = capital is not None and pnl is not None
+    steps = pnl[order] if on_capital else r_sorted * scale
+    cum = np.cumsum(steps)
+    cum -= np.repeat(cum[starts] - steps[starts], n.astype(np.int64))
+    if on_capital:
+        equity = capital + cum
+        peak = np.maximum(_segmented_cummax(equity, sorted_codes), capital)
+        drawdown = (equity - peak) / peak * 100
+        total_pnl = total(pnl)
+        total_return = total_pnl / capital * 100
+    else:
+        peak = np.maximum(_segmented_cummax(cum, sorted_codes), 0.0)
+        drawdown = cum - peak
+        total_pnl = total(pnl) if pnl is not None else np.full(k, np.nan)
+        total_return = sum_r * scale
+    max_drawdown = np.minimum.reduceat(drawdown, starts)
+
+    if dates is not None:
+        ns = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)[order]
+        valid = ns != np.iinfo(np.int64).min
+        first = np.minimum.reduceat(np.where(valid, ns, np.iinfo(np.int64).max), starts)
+        last = np.maximum.reduceat(np.where(valid, ns, np.iinfo(np.int64).min), starts)
+        span_days = np.maximum((last - first) / NS_PER_DAY, 1.0)
+        years = span_days / DAYS_PER_YEAR
+        growth = 1 + total_return / 100
+        cagr = np.where(growth > 0, (np.abs(growth) ** (1 / years) - 1) * 100, -100.0)
+        annualize = np.sqrt(n / years)
+        exposure = _divide(total(hold), span_days) * scale * 100 if hold is not None else np.full(k, np.nan)
+    else:
+        cagr = np.full(k, np.nan)
+        annualize = 1.0
+        exposure = np.full(k, np.nan)
+
+    result = {
+        'total_trades': n.astype(np.int64),
+        'winning_trades': wins.astype(np.int64),
+        'losing_trades': losses.astype(np.int64),
+        'win_rate': wins / n * 100,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'avg_return': avg_return,
+        'best_trade': best,
+        'worst_trade': worst,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': profit_factor,
+        # Mean trade return = win_rate * avg_win + loss_rate * avg_loss
+        'expectancy': avg_return,
+        'total_pnl': total_pnl,
+        'total_return': total_return,
+        'cagr': cagr,
+        'sharpe': _divide(avg_return, std) * annualize,
+        'sortino': _divide(avg_return, downside) * annualize,
+        'max_drawdown': max_drawdown,
+        'avg_hold_days': total(hold) / n if hold is not None else np.full(k, np.nan),
+        'exposure': exposure
+    }
+
+    if by:
+        return pd.DataFrame(result, index=index)
+    return {name: values[0].item() for name, values in result.items()}
+
+
+def rolling_drawdown(equity, window: int = TRADING_DAYS) -> np.ndarray:
+    """Drawdown (%) from the highest equity of the last `window` periods"""
+    equity = pd.Series(np.asarray(equity, dtype=np.float64))
+    peak = equity.rolling(window, min_periods=1).max()
+    return ((equity - peak) / peak * 100).to_numpy()
+
+
+def equity_metrics(
+    curve,
+    equity_col: str = 'equity',
+    date_col: Optional[str] = 'date',
+    positions_col: Optional[str] = 'open_positions',
+    periods_per_year: int = TRADING_DAYS,
+    window: int = TRADING_DAYS
+) -> Dict:
+    """
+    Statistics of a daily equity curve
+
+    Args:
+        curve: ColumnarLedger / DataFrame / list of dicts with equity_col
+            (and optionally date_col, positions_col)
+
+    Returns:
+        dict: total_return, cagr, volatility, sharpe, sortino, max_drawdown,
+        max_rolling_drawdown (over `window`), exposure (% of periods with
+        open positions)
+    """
+    columns = [c for c in (equity_col, date_col, positions_col) if c]
+    df = _frame(curve, columns)
+    if len(df) == 0:
+        return {name: 0.0 for name in ('total_return', 'cagr', 'volatility', 'sharpe', 'sortino',
+                                       'max_drawdown', 'max_rolling_drawdown', 'exposure')}
+
+    equity = df[equity_col].to_numpy(dtype=np.float64)
+    returns = equity[1:] / equity[:-1] - 1 if len(equity) > 1 else np.zeros(0)
+
+    years = len(equity) / periods_per_year
+    if date_col and date_col in df.columns:
+        dates = pd.to_datetime(df[date_col], errors='coerce')
+        if dates.notna().sum() >= 2:
+            years = (dates.max() - dates.min()).days / DAYS_PER_YEAR
+
+    growth = equity[-1] / equity[0]
+    cagr = (growth ** (1 / years) - 1) * 100 if years > 0 and growth > 0 else float('nan')
+
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2)) if len(returns) else 0.0
+    mean = returns.mean() if len(returns) else 0.0
+    annualize = np.sqrt(periods_per_year)
+
+    peak = np.maximum.accumulate(equity)
+    exposure = float('nan')
+    if positions_col and positions_col in df.columns:
+        exposure = float((df[positions_col].to_numpy() > 0).mean() * 100)
+
+    return {
+        'total_return': float((growth - 1) * 100),
+        'cagr': float(cagr),
+        'volatility': float(std * annualize * 100),
+        'sharpe': float(mean / std * annualize) if std > 0 else 0.0,
+        'sortino': float(mean / downside * annualize) if downside > 0 else 0.0,
+        'max_drawdown': float(((equity - peak) / peak).min() * 100),
+        'max_rolling_drawdown': float(rolling_drawdown(equity, window).min()),
+        'exposure': exposure
+    }
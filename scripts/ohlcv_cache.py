@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OHLCV CACHE - CACHE GIÁ TRÊN ĐĨA, CHỈ TẢI NẾN MỚI
+
+Thay vì tải lại ~200 ngày lịch sử cho mỗi mã mỗi ngày:
+- Cache theo (ticker, source, interval), mỗi (source, interval) là một
+  MarketDataStore: <root>/<source>_<interval>/<TICKER>/<col>.npy
+- Lần chạy sau chỉ request từ REVALIDATE_BARS nến cuối trong cache tới hôm nay
+- Nếu các nến cũ trong cửa sổ đó bị thay đổi (điều chỉnh giá do cổ tức,
+  chia tách...) thì tải lại toàn bộ lịch sử
+- Đã kiểm tra tới ngày `end` rồi thì không gọi mạng nữa (warm rerun);
+  phiên hôm nay chưa chốt nên không bao giờ được đánh dấu là đã kiểm tra
+
+Usage:
+    cache = OHLCVCache()
+    df = cache.get('VNM', '2025-01-01', '2025-06-30',
+                   lambda start, end: Quote(symbol='VNM', source='VCI').history(start=start, end=end),
+                   source='VCI', interval='1D')
+
+    python ohlcv_cache.py info   # list cached (source, interval) stores
+"""
+
+import os
+import sys
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from market_store import MarketDataStore
+
+CACHE_DIR = os.environ.get('OHLCV_CACHE_DIR', os.path.join('data', 'ohlcv_cache'))
+
+# Trailing cached bars re-fetched on every update to detect restatements
+REVALIDATE_BARS = 5
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class OHLCVCache:
+    """
+    On-disk OHLCV cache with delta fetch
+
+    fetch_func(start, end) -> DataFrame with a 'time' column, dates as
+    'YYYY-MM-DD' strings (same as vnstock Quote.history). Safe to call
+    from QuoteFetcher worker threads.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, revalidate_bars: int = REVALIDATE_BARS):
+        self.root = root
+        self.revalidate_bars = max(1, revalidate_bars)
+        self.stores: Dict[str, MarketDataStore] = {}
+        self.stats = {'hits': 0, 'delta': 0, 'full': 0, 'restated': 0}
+        self._lock = threading.Lock()
+
+    def store(self, source: str, interval: str) -> MarketDataStore:
+        key = f"{source}_{interval}"
+        with self._lock:
+            if key not in self.stores:
+                self.stores[key] = MarketDataStore(os.path.join(self.root, key))
+            return self.stores[key]
+
+    def _read(self, store: MarketDataStore, ticker: str):
+        with self._lock:
+            if ticker not in store:
+                return None, {}
+            return store.read(ticker), dict(store.info(ticker))
+
+    def _write(self, store: MarketDataStore, ticker: str, df: pd.DataFrame, **checked):
+        with self._lock:
+            previous = store.info(ticker).get('checked_start') if ticker in store else None
+            store.write(ticker, df)
+            store.update_info(ticker, checked_start=checked.get('checked_start', previous),
+                              checked_end=checked['checked_end'])
+
+    def _mark_checked(self, store: MarketDataStore, ticker: str, end: str):
+        with self._lock:
+            store.update_info(ticker, checked_end=end)
+
+    def get(
+        self,
+        ticker: str,
+        start: str,
+        end: str,
+        fetch_func: Callable[[str, str], Optional[pd.DataFrame]],
+        source: str = 'VCI',
+        interval: str = '1D'
+    ) -> Optional[pd.DataFrame]:
+        """
+        Bars of `ticker` between start and end (inclusive)
+
+        Only bars the cache does not have yet (plus the revalidation
+        window) are requested from fetch_func.
+        """
+        store = self.store(source, interval)
+        cached, info = self._read(store, ticker)
+
+        start_ts = pd.Timestamp(start)
+        end_ts = pd.Timestamp(end)
+
+        # Cached range covers `start` if a fetch already started at or before it
+        checked_start = info.get('checked_start')
+        covered = cached is not None and len(cached) > 0 and (
+            cached['time'].iloc[0] <= start_ts
+            or (checked_start is not None and pd.Timestamp(checked_start) <= start_ts)
+        )
+
+        if not covered:
+            # Cold cache (or history requested before the cached range)
+            data = _normalize(fetch_func(start, end))
+            if data is None:
+                return None
+            self.stats['full'] += 1
+            self._write(store, ticker, data, checked_start=start, checked_end=_checked_end(end_ts))
+            return _slice(data, start_ts, end_ts)
+
+        # Today's session is not settled: its cached bar may be intraday,
+        # so requests reaching today always revalidate the last bars
+        last_time = cached['time'].iloc[-1]
+        checked_end = info.get('checked_end')
+        settled = end_ts < _today()
+        if settled and (last_time >= end_ts or (checked_end is not None and pd.Timestamp(checked_end) >= end_ts)):
+            self.stats['hits'] += 1
+            return _slice(cached, start_ts, end_ts)
+
+        # Delta fetch from the start of the revalidation window
+        window_start = cached['time'].iloc[-min(self.revalidate_bars, len(cached))]
+        fresh = _normalize(fetch_func(window_start.strftime('%Y-%m-%d'), end))
+
+        if fresh is None:
+            self._mark_checked(store, ticker, _checked_end(end_ts))
+            self.stats['delta'] += 1
+            return _slice(cached, start_ts, end_ts)
+
+        if _restated(cached, fresh, window_start):
+            # Old bars changed (price adjustment) - reload the whole range
+            data = _normalize(fetch_func(cached['time'].iloc[0].strftime('%Y-%m-%d'), end))
+            if data is None:
+                return _slice(cached, start_ts, end_ts)
+            self.stats['restated'] += 1
+        else:
+            data = pd.concat(
+                [cached[cached['time'] < window_start], fresh],
+                ignore_index=True
+            )
+            self.stats['delta'] += 1
+
+        self._write(store, ticker, data, checked_end=_checked_end(end_ts))
+        return _slice(data, start_ts, end_ts)
+
+
+def _today() -> pd.Timestamp:
+    return pd.Timestamp.now().normalize()
+
+
+def _checked_end(end_ts: pd.Timestamp) -> str:
+    """checked_end to record for a fetch up to end_ts: never today or later"""
+    return min(end_ts, _today() - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def _normalize(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Lowercase columns, 'time' as datetime64[ns], sorted, unique bars"""
+    if df is None or len(df) == 0:
+        return None
+
+    df = df.copy()
+    df.columns = [str(c).lower() for c in df.columns]
+    if 'time' not in df.columns and 'date' in df.columns:
+        df = df.rename(columns={'date': 'time'})
+    if 'time' not in df.columns:
+        df = df.reset_index().rename(columns={df.index.name or 'index': 'time'})
+
+    df['time'] = pd.to_datetime(df['time']).astype('datetime64[ns]')
+    df = df.sort_values('time').drop_duplicates('time', keep='last')
+    return df.reset_index(drop=True)
+
+
+def _slice(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    mask = (df['time'] >= start) & (df['time'] < end + pd.Timedelta(days=1))
+    return df[mask].reset_index(drop=True)
+
+
+def _restated(cached: pd.DataFrame, fresh: pd.DataFrame, window_start: pd.Timestamp) -> bool:
+    """
+    True if a settled cached bar in the revalidation window changed
+
+    The last cached bar may have been taken intraday, so it is allowed to
+    change; every earlier bar in the window must match the fresh data.
+    """
+    old = cached[(cached['time'] >= window_start) & (cached['time'] < cached['time'].iloc[-1])]
+    if len(old) == 0:
+        return False
+
+    merged = old.merge(fresh, on='time', how='left', suffixes=('_old', '_new'))
+    for column in PRICE_COLUMNS:
+        if f"{column}_old" not in merged.columns or f"{column}_new" not in merged.columns:
+            continue
+        a = merged[f"{column}_old"].to_numpy(dtype=np.float64)
+        b = merged[f"{column}_new"].to_numpy(dtype=np.float64)
+        if not np.allclose(a, b, rtol=1e-9, atol=0.0, equal_nan=False):
+            return True
+    return False
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == 'info':
+        root = sys.argv[2] if len(sys.argv) >= 3 else CACHE_DIR
+        if not os.path.exists(root):
+            print(f"No cache at {root}")
+            return
+        for name in sorted(os.listdir(root)):
+            store = MarketDataStore(os.path.join(root, name))
+            if store.exists():
+                print(f"{name:12} {len(store):>5} stocks  {store.size_bytes() / 1024:.0f} KB")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main()
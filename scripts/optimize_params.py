@@ -11,18 +11,23 @@ Test nhiều parameter combinations để tìm optimal settings:
 Goal: Maximize Sharpe ratio or win rate
 """
 
+import argparse
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from itertools import product
 import pandas as pd
 
 try:
-    from backtest_system import run_backtest
+    from backtest_system import run_backtest, fetch_historical_data_batch
 except ImportError:
     print("Error: Cannot import backtest_system")
     sys.exit(1)
 
+from indicators import IndicatorFrame
+
 
 class ParameterOptimizer:
     """
@@ -35,7 +40,10 @@ class ParameterOptimizer:
         stock_codes: list,
         start_date: str,
         end_date: str,
-        initial_capital: float = 100_000_000
+        initial_capital: float = 100_000_000,
+        workers: int = 1,
+        results_file: str = None,
+        data: dict = None
     ):
         """
         Args:
@@ -44,15 +52,43 @@ class ParameterOptimizer:
             start_date: Backtest start date
             end_date: Backtest end date
             initial_capital: Starting capital
+            workers: Processes evaluating grid points in parallel
+            results_file: JSONL file results are streamed to; a rerun with
+                the same settings skips the grid points already in it
+            data: Preloaded {code: DataFrame} (loaded once if None)
         """
         self.strategy_type = strategy_type
         self.stock_codes = stock_codes
         self.start_date = start_date
         self.end_date = end_date
         self.initial_capital = initial_capital
+        self.workers = max(1, workers)
+        self.results_file = results_file or f"optimize_{strategy_type}_results.jsonl"
         
+        self.data = data
+        self.indicators = {}
         self.results = []
     
+    def load_data(self):
+        """
+        Load the universe once and precompute the parameter-independent
+        indicators (RSI, MACD, volume ratio) shared by every grid point
+        """
+        if self.data is None:
+            print(f"Loading {len(self.stock_codes)} stocks...", file=sys.stderr)
+            self.data = fetch_historical_data_batch(self.stock_codes, self.start_date, self.end_date)
+        
+        for code, df in self.data.items():
+            if code in self.indicators:
+                continue
+            ind = IndicatorFrame(df)
+            ind.rsi(14, method='wilder')
+            ind.macd()
+            ind.volume_ratio()
+            self.indicators[code] = ind
+        
+        print(f"Loaded {len(self.data)}/{len(self.stock_codes)} stocks", file=sys.stderr)
+    
     def define_parameter_grid(self) -> list:
         """
         Define parameter combinations to test
@@ -94,7 +130,9 @@ class ParameterOptimizer:
                 start_date=self.start_date,
                 end_date=self.end_date,
                 params=params,
-                initial_capital=self.initial_capital
+                initial_capital=self.initial_capital,
+                data=self.data,
+                indicators=self.indicators
             )
             
             # Extract key metrics
@@ -148,6 +186,68 @@ class ParameterOptimizer:
         
         return max(score, 0)
     
+    def _config(self) -> dict:
+        return {
+            'strategy': self.strategy_type,
+            'stocks': list(self.stock_codes),
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'initial_capital': self.initial_capital
+        }
+    
+    def load_results(self) -> dict:
+        """
+        Read results streamed by an earlier run
+        
+        Returns:
+            {params key: result}; empty (and the file is restarted) if it
+            was written with different settings
+        """
+        if not os.path.exists(self.results_file):
+            return {}
+        
+        done = {}
+        with open(self.results_file, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        
+        if header.get('config') != json.loads(json.dumps(self._config())):
+            print(f"⚠️ {self.results_file} is from other settings, starting over", file=sys.stderr)
+            os.remove(self.results_file)
+            return {}
+        
+        for line in lines[1:]:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial last line of a killed run
+            if not isinstance(result, dict) or 'params' not in result:
+                continue  # Repeated header written by older versions
+            done[_params_key(result['params'])] = result
+        
+        return done
+    
+    def _evaluate_all(self, param_combinations: list):
+        """Yield (params, result) as grid points finish"""
+        if self.workers <= 1 or len(param_combinations) <= 1:
+            for params in param_combinations:
+                yield params, self.evaluate_params(params)
+            return
+        
+        # Each worker receives the loaded data + indicators once
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self,)
+        ) as executor:
+            futures = [executor.submit(_evaluate_in_worker, params) for params in param_combinations]
+            for future in as_completed(futures):
+                yield future.result()
+    
     def optimize(self) -> dict:
         """
         Run optimization
@@ -169,21 +269,41 @@ class ParameterOptimizer:
         print(f"Testing {len(param_combinations)} parameter combinations...", file=sys.stderr)
         print("", file=sys.stderr)
         
-        # Test each combination
-        self.results = []
+        # Results of an earlier (killed) run with the same settings
+        done = self.load_results()
+        self.results = list(done.values())
+        pending = [params for params in param_combinations if _params_key(params) not in done]
         
-        for i, params in enumerate(param_combinations, 1):
-            print(f"[{i}/{len(param_combinations)}] ", file=sys.stderr, end='')
-            
-            result = self.evaluate_params(params)
-            
-            if result:
-                self.results.append(result)
-                print(f"  → Score: {result['score']:.2f}, Win rate: {result['metrics']['win_rate']}%", file=sys.stderr)
-            else:
-                print(f"  → Failed", file=sys.stderr)
+        if done:
+            print(f"Resuming: {len(done)} done, {len(pending)} left ({self.results_file})", file=sys.stderr)
         
-        # Sort by score
+        if pending:
+            self.load_data()
+        
+        completed = len(done)
+        new_file = not os.path.exists(self.results_file) or os.path.getsize(self.results_file) == 0
+        with open(self.results_file, 'a', encoding='utf-8') as f:
+            # A run that finished no point leaves only the header: keep it
+            if new_file:
+                f.write(json.dumps({'config': self._config()}) + '\n')
+                f.flush()
+            
+            for params, result in self._evaluate_all(pending):
+                completed += 1
+                print(f"[{completed}/{len(param_combinations)}] "
+                      f"vol={params['volume_multiplier']}x, rsi={params['rsi_threshold']}", file=sys.stderr)
+                
+                if result:
+                    self.results.append(result)
+                    f.write(json.dumps(result, default=str) + '\n')
+                    f.flush()
+                    print(f"  → Score: {result['score']:.2f}, Win rate: {result['metrics']['win_rate']}%", file=sys.stderr)
+                else:
+                    print(f"  → Failed", file=sys.stderr)
+        
+        # Sort by score (ties in grid order, however the workers finished)
+        grid_order = {_params_key(params): i for i, params in enumerate(param_combinations)}
+        self.results.sort(key=lambda x: grid_order.get(_params_key(x['params']), len(grid_order)))
         self.results.sort(key=lambda x: x['score'], reverse=True)
         
         # Get best parameters
@@ -213,10 +333,28 @@ class ParameterOptimizer:
         }
 
 
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+# Optimizer of this worker process (set once by the pool initializer)
+_worker_optimizer = None
+
+
+def _init_worker(optimizer):
+    global _worker_optimizer
+    _worker_optimizer = optimizer
+
+
+def _evaluate_in_worker(params: dict):
+    return params, _worker_optimizer.evaluate_params(params)
+
+
 def compare_strategies(
     stock_codes: list,
     start_date: str,
-    end_date: str
+    end_date: str,
+    workers: int = 1
 ) -> dict:
     """
     Optimize both strategies and compare
@@ -225,6 +363,7 @@ def compare_strategies(
         stock_codes: Stocks to test
         start_date: Start date
         end_date: End date
+        workers: Processes per optimization
         
     Returns:
         Comparison results
@@ -241,7 +380,8 @@ def compare_strategies(
         strategy_type='breakout',
         stock_codes=stock_codes,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        workers=workers
     )
     
     results['breakout'] = breakout_optimizer.optimize()
@@ -252,11 +392,14 @@ def compare_strategies(
     print("║" + " " * 17 + "DIVERGENCE STRATEGY" + " " * 22 + "║", file=sys.stderr)
     print("╚" + "═" * 58 + "╝", file=sys.stderr)
     
+    # Same universe: reuse the data loaded for breakout
     divergence_optimizer = ParameterOptimizer(
         strategy_type='divergence',
         stock_codes=stock_codes,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        workers=workers,
+        data=breakout_optimizer.data
     )
     
     results['divergence'] = divergence_optimizer.optimize()
@@ -316,6 +459,11 @@ def compare_strategies(
 
 def main():
     """Main optimization"""
+    parser = argparse.ArgumentParser(description="Parameter grid optimization")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes evaluating grid points in parallel (default: 1)")
+    args = parser.parse_args()
+    
     # Configuration
     STOCK_CODES = [
         'VNM', 'HPG', 'FPT', 'MBB', 'VCB', 'VIC'
@@ -326,7 +474,7 @@ def main():
     START_DATE = (datetime.now() - timedelta(days=180)).strftime('%Y-%m-%d')
     
     # Run comparison
-    results = compare_strategies(STOCK_CODES, START_DATE, END_DATE)
+    results = compare_strategies(STOCK_CODES, START_DATE, END_DATE, workers=args.workers)
     
     # Output
     print(json.dumps(results, indent=2, default=str))
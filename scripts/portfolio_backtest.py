@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PORTFOLIO BACKTEST - MÔ PHỎNG DANH MỤC THEO DÒNG SỰ KIỆN NGÀY
+
+Khác với backtest từng mã (vốn không giới hạn, mỗi mã chạy hết rồi mới tới
+mã sau), ở đây tất cả mã dùng chung một tài khoản:
+- Nến của mọi mã được trộn (heap merge) thành một dòng sự kiện theo ngày
+- Mỗi ngày: xử lý thoát lệnh trước (giải phóng tiền), rồi vào lệnh mới theo
+  thứ tự ưu tiên, giới hạn bởi tiền mặt và số vị thế tối đa
+- Mỗi mã chỉ giữ tối đa một vị thế
+- Đường equity thật theo ngày: tiền mặt + giá trị thị trường các vị thế
+
+Exit rules giống exit_engine.resolve_exits (MAX_HOLD, STOP_LOSS,
+TAKE_PROFIT, END_OF_DATA), nên kết quả so sánh được với backtest từng mã.
+
+Usage:
+    python portfolio_backtest.py                          # store data, 4 strategies
+    python portfolio_backtest.py --stocks 20 --max-positions 5
+    python portfolio_backtest.py --synthetic 340 --years 5  # timing only
+"""
+
+import argparse
+import heapq
+import os
+import time
+from datetime import datetime
+from itertools import repeat
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from exit_engine import END_OF_DATA, MAX_HOLD, STOP_LOSS, TAKE_PROFIT
+from metrics import equity_metrics
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+INITIAL_CAPITAL = 100_000_000  # 100 triệu VND
+POSITION_SIZE = 0.1  # 10% equity mỗi lệnh
+MAX_POSITIONS = 10
+COMMISSION = 0.0015  # 0.15% phí giao dịch
+SLIPPAGE = 0.001  # 0.1% slippage
+MAX_HOLD_DAYS = 30
+
+# Signals competing for cash on the same day: highest value first
+PRIORITY_KEY = 'volume_ratio'
+
+DAY_NS = 86_400 * 10**9
+
+
+class _Position:
+    """Open position of one ticker"""
+
+    __slots__ = ('signal', 'entry_idx', 'entry_ns', 'hold_limit_ns', 'entry_price',
+                 'shares', 'cost', 'entry_commission', 'stop_loss', 'take_profit')
+
+
+class PortfolioSimulator:
+    """
+    Event-driven, date-ordered simulation of one shared account
+
+    Usage:
+        sim = PortfolioSimulator(max_positions=10)
+        sim.add_ticker('VNM', df, signals)
+        result = sim.run()   # {'trades', 'equity_curve', 'stats'}
+    """
+
+    def __init__(
+        self,
+        initial_capital=INITIAL_CAPITAL,
+        position_size=POSITION_SIZE,
+        max_positions=MAX_POSITIONS,
+        commission=COMMISSION,
+        slippage=SLIPPAGE,
+        priority_key=PRIORITY_KEY
+    ):
+        self.initial_capital = initial_capital
+        self.position_size = position_size
+        self.max_positions = max_positions
+        self.commission = commission
+        self.slippage = slippage
+        self.priority_key = priority_key
+
+        self.tickers = []
+        self.times = []
+        self.lows = []
+        self.highs = []
+        self.closes = []
+        self.signals = []  # per ticker: {bar index: [signal, ...]}
+
+    def add_ticker(self, ticker: str, df: pd.DataFrame, signals: List[Dict]):
+        """
+        Register one ticker's bars (time/low/high/close) and its signals
+
+        Signals are dicts as returned by the strategy functions (date,
+        entry_price, stop_loss, take_profit, optional hold_days).
+        """
+        times = df['time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        by_bar = {}
+        if signals:
+            dates = np.asarray([s['date'] for s in signals], dtype='datetime64[ns]').astype(np.int64)
+            idx = np.searchsorted(times, dates)
+            for signal, i, date in zip(signals, idx, dates):
+                if i < len(times) and times[i] == date:
+                    by_bar.setdefault(int(i), []).append(signal)
+
+        self.tickers.append(ticker)
+        self.times.append(times)
+        self.lows.append(df['low'].to_numpy(dtype=np.float64))
+        self.highs.append(df['high'].to_numpy(dtype=np.float64))
+        self.closes.append(df['close'].to_numpy(dtype=np.float64))
+        self.signals.append(by_bar)
+
+    def _events(self):
+        """(time_ns, ticker index, bar index) of every bar, merged by date"""
+        streams = [
+            zip(times.tolist(), repeat(k), range(len(times)))
+            for k, times in enumerate(self.times)
+        ]
+        return heapq.merge(*streams)
+
+    def run(self) -> Dict:
+        """
+        Returns:
+            dict:
+                trades: DataFrame, one row per closed trade
+                equity_curve: DataFrame (date, cash, market_value, equity, open_positions)
+                stats: totals and counts of signals skipped by each limit
+        """
+        cash = float(self.initial_capital)
+        market_value = 0.0
+        last_close = np.zeros(len(self.tickers))
+        positions = {}  # ticker index -> _Position
+        trades = []
+        curve = []
+        stats = {'signals': 0, 'entered': 0, 'skipped_held': 0, 'skipped_max_positions': 0, 'skipped_cash': 0}
+
+        def close_position(k, pos, exit_ns, raw_price, reason):
+            nonlocal cash
+            exit_price = raw_price * (1 - self.slippage)
+            proceeds = pos.shares * exit_price
+            exit_commission = proceeds * self.commission
+            cash += proceeds - exit_commission
+            net_pnl = proceeds - exit_commission - pos.cost
+            trades.append({
+                **pos.signal,
+                'code': self.tickers[k],
+                'entry_date': pd.Timestamp(pos.entry_ns),
+                'exit_date': pd.Timestamp(exit_ns),
+                'days_held': (exit_ns - pos.entry_ns) // DAY_NS,
+                'entry_price': pos.entry_price,
+                'exit_price': exit_price,
+                'shares': pos.shares,
+                'gross_pnl': (exit_price - pos.entry_price) * pos.shares,
+                'net_pnl': net_pnl,
+                'pnl_percent': net_pnl / (pos.entry_price * pos.shares) * 100,
+                'exit_reason': reason,
+                'commission': pos.entry_commission + exit_commission
+            })
+
+        def end_of_day(day_ns, candidates):
+            nonlocal cash, market_value
+            if candidates:
+                candidates.sort(key=lambda c: -float(c[2].get(self.priority_key, 0) or 0))
+                for k, i, signal in candidates:
+                    stats['signals'] += 1
+                    if k in positions:
+                        stats['skipped_held'] += 1
+                        continue
+                    if len(positions) >= self.max_positions:
+                        stats['skipped_max_positions'] += 1
+                        continue
+
+                    entry_price = float(signal['entry_price']) * (1 + self.slippage)
+                    budget = min((cash + market_value) * self.position_size, cash / (1 + self.commission))
+                    shares = int(budget / entry_price)
+                    if shares <= 0:
+                        stats['skipped_cash'] += 1
+                        continue
+
+                    pos = _Position()
+                    pos.signal = signal
+                    pos.entry_idx = i
+                    pos.entry_ns = day_ns
+                    pos.hold_limit_ns = day_ns + (int(signal.get('hold_days', MAX_HOLD_DAYS)) + 1) * DAY_NS
+                    pos.entry_price = entry_price
+                    pos.shares = shares
+                    pos.cost = shares * entry_price
+                    pos.entry_commission = pos.cost * self.commission
+                    pos.cost += pos.entry_commission
+                    pos.stop_loss = float(signal['stop_loss'])
+                    pos.take_profit = float(signal['take_profit'])
+
+                    cash -= pos.cost
+                    market_value += shares * last_close[k]
+                    positions[k] = pos
+                    stats['entered'] += 1
+                candidates.clear()
+
+            curve.append((day_ns, cash, market_value, cash + market_value, len(positions)))
+
+        day = None
+        candidates = []
+        lows, highs, closes, signals = self.lows, self.highs, self.closes, self.signals
+
+        for t, k, i in self._events():
+            if t != day:
+                if day is not None:
+                    end_of_day(day, candidates)
+                day = t
+
+            close = closes[k][i]
+            pos = positions.get(k)
+            if pos is not None and i > pos.entry_idx:
+                # Same order as exit_engine: max hold, stop loss, take profit
+                if t >= pos.hold_limit_ns:
+                    reason, price = MAX_HOLD, close
+                elif lows[k][i] <= pos.stop_loss:
+                    reason, price = STOP_LOSS, pos.stop_loss
+                elif highs[k][i] >= pos.take_profit:
+                    reason, price = TAKE_PROFIT, pos.take_profit
+                else:
+                    reason = None
+
+                if reason is None:
+                    market_value += pos.shares * (close - last_close[k])
+                else:
+                    market_value -= pos.shares * last_close[k]
+                    close_position(k, pos, t, price, reason)
+                    del positions[k]
+
+            last_close[k] = close
+
+            bar_signals = signals[k].get(i)
+            if bar_signals:
+                candidates.extend((k, i, s) for s in bar_signals)
+
+        if day is not None:
+            end_of_day(day, candidates)
+
+        # Positions still open are closed at their ticker's last bar
+        for k, pos in list(positions.items()):
+            close_position(k, pos, int(self.times[k][-1]), last_close[k], END_OF_DATA)
+        positions.clear()
+
+        equity_curve = pd.DataFrame(curve, columns=['date', 'cash', 'market_value', 'equity', 'open_positions'])
+        equity_curve['date'] = pd.to_datetime(equity_curve['date'])
+        curve_stats = equity_metrics(equity_curve)
+
+        stats.update({
+            'initial_capital': self.initial_capital,
+            'final_equity': float(cash),
+            'total_return': float((cash / self.initial_capital - 1) * 100),
+            'trades': len(trades),
+            'max_drawdown': curve_stats['max_drawdown'],
+            'cagr': curve_stats['cagr'],
+            'sharpe': curve_stats['sharpe'],
+            'sortino': curve_stats['sortino'],
+            'exposure': curve_stats['exposure'],
+            'days': len(curve)
+        })
+
+        return {
+            'trades': pd.DataFrame(trades),
+            'equity_curve': equity_curve,
+            'stats': stats
+        }
+
+
+# ============================================================================
+# DATA
+# ============================================================================
+
+def load_universe(stocks: Optional[int], start_date: str, end_date: str):
+    """
+    Strategy signals of the 4 strategies on store data
+
+    Returns:
+        list of (ticker, prepared df, signals)
+    """
+    import backtest_4strategies_PKL as bt
+    from indicators import IndicatorFrame
+
+    store = bt.load_data_from_pkl()
+    tickers = list(store.keys())[:stocks] if stocks else list(store.keys())
+    strategies = [
+        bt.strategy_1_breakout,
+        bt.strategy_2_swing,
+        bt.strategy_3_pullback,
+        bt.strategy_4_ema_crossover
+    ]
+
+    universe = []
+    for ticker in tickers:
+        df = bt.prepare_dataframe(store[ticker], ticker, start_date, end_date)
+        if df is None or len(df) < 100:
+            continue
+        df = df.reset_index(drop=True)
+        ind = IndicatorFrame(df)
+        signals = []
+        for strategy_func in strategies:
+            try:
+                signals.extend(strategy_func(df, ind))
+            except Exception as e:
+                print(f"⚠️  {ticker} {strategy_func.__name__}: {e}")
+        universe.append((ticker, df, signals))
+    return universe
+
+
+def synthetic_universe(n_tickers: int, years: int, signal_rate: float = 0.02, seed: int = 0):
+    """Random-walk bars and random signals, for timing the simulator"""
+    rng = np.random.default_rng(seed)
+    times = pd.bdate_range('2020-01-01', periods=years * 250)
+    universe = []
+    for k in range(n_tickers):
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, len(times))))
+        spread = close * rng.uniform(0, 0.02, len(times))
+        df = pd.DataFrame({'time': times, 'low': close - spread, 'high': close + spread, 'close': close})
+        idx = np.flatnonzero(rng.random(len(times)) < signal_rate)
+        signals = [{
+            'date': times[i],
+            'strategy': 'SYNTHETIC',
+            'entry_price': close[i],
+            'stop_loss': close[i] * 0.95,
+            'take_profit': close[i] * 1.10,
+            'volume_ratio': float(rng.uniform(1, 3))
+        } for i in idx]
+        universe.append((f"T{k:03d}", df, signals))
+    return universe
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Portfolio-level backtest with cash and position limits')
+    parser.add_argument('--stocks', type=int, default=None, help='Number of stocks (default: all)')
+    parser.add_argument('--start', default='2021-01-01')
+    parser.add_argument('--end', default='2025-12-31')
+    parser.add_argument('--capital', type=float, default=INITIAL_CAPITAL)
+    parser.add_argument('--position-size', type=float, default=POSITION_SIZE, help='Fraction of equity per trade')
+    parser.add_argument('--max-positions', type=int, default=MAX_POSITIONS)
+    parser.add_argument('--synthetic', type=int, default=0, help='Use N random tickers instead of store data')
+    parser.add_argument('--years', type=int, default=5, help='Years of synthetic data')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic:
+        universe = synthetic_universe(args.synthetic, args.years)
+    else:
+        universe = load_universe(args.stocks, args.start, args.end)
+    load_seconds = time.perf_counter() - start
+
+    sim = PortfolioSimulator(
+        initial_capital=args.capital,
+        position_size=args.position_size,
+        max_positions=args.max_positions
+    )
+    for ticker, df, signals in universe:
+        sim.add_ticker(ticker, df, signals)
+
+    start = time.perf_counter()
+    result = sim.run()
+    sim_seconds = time.perf_counter() - start
+
+    stats = result['stats']
+    bars = sum(len(t) for t in sim.times)
+    print(f"\n{'='*70}")
+    print("PORTFOLIO BACKTEST")
+    print(f"{'='*70}")
+    print(f"Tickers:           {len(universe)} ({bars:,} bars, {stats['days']:,} days)")
+    print(f"Signals:           {stats['signals']:,}  entered {stats['entered']:,}")
+    print(f"Skipped:           held {stats['skipped_held']:,}  "
+          f"max positions {stats['skipped_max_positions']:,}  cash {stats['skipped_cash']:,}")
+    print(f"Trades:            {stats['trades']:,}")
+    print(f"Final Equity:      {stats['final_equity']:,.0f} VND")
+    print(f"Total Return:      {stats['total_return']:+.2f}%")
+    print(f"Max Drawdown:      {stats['max_drawdown']:.2f}%")
+    print(f"CAGR:              {stats['cagr']:+.2f}%")
+    print(f"Sharpe / Sortino:  {stats['sharpe']:.2f} / {stats['sortino']:.2f}")
+    print(f"Exposure:          {stats['exposure']:.1f}% of days")
+    print(f"Time:              load {load_seconds:.2f}s, simulate {sim_seconds:.2f}s")
+
+    if not args.synthetic:
+        from backtest_4strategies_PKL import RESULTS_FOLDER
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        trades_file = os.path.join(RESULTS_FOLDER, f"portfolio_trades_{timestamp}.csv")
+        equity_file = os.path.join(RESULTS_FOLDER, f"portfolio_equity_{timestamp}.csv")
+        result['trades'].to_csv(trades_file, index=False, encoding='utf-8-sig')
+        result['equity_curve'].to_csv(equity_file, index=False)
+        print(f"\n✅ Trades saved to: {trades_file}")
+        print(f"✅ Equity curve saved to: {equity_file}")
+
+
+if __name__ == "__main__":
+    main()
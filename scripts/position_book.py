@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POSITION BOOK - SỔ VỊ THẾ DẠNG MẢNG
+
+Thay cho list các dict trong BacktestEngine:
+- Các trường số của vị thế nằm trong một NumPy structured array (mỗi vị thế
+  một slot, slot trống được dùng lại)
+- Index ticker → slots, id → slot: tìm/xoá vị thế O(1), không so sánh dict
+- Kiểm tra stop loss / take profit của mọi vị thế trong ngày là một phép so
+  sánh mảng với vector giá của ngày đó
+
+Usage:
+    book = PositionBook()
+    pid = book.add('VNM', entry_date, 'BUY', shares=100, entry_price=61.2, ...)
+    slots, prices = book.priced_slots({'VNM': 60.1, 'FPT': 98.5})
+    book.remove(pid)
+"""
+
+import numpy as np
+from typing import Dict, List
+
+POSITION_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('ticker', np.int32),
+    ('active', np.bool_),
+    ('shares', np.int64),
+    ('entry_price', np.float64),
+    ('stop_loss', np.float64),
+    ('take_profit', np.float64),
+    ('entry_value', np.float64),
+    ('entry_commission', np.float64),
+    ('confidence', np.int64)
+])
+
+NUMERIC_FIELDS = ('shares', 'entry_price', 'stop_loss', 'take_profit',
+                  'entry_value', 'entry_commission', 'confidence')
+
+INITIAL_CAPACITY = 64
+
+
+class PositionBook:
+    """
+    Open positions as a structured array with ticker and id indexes
+
+    Position ids increase monotonically, so a closed position's id is never
+    reused even when its slot is. Non-numeric fields (entry_date,
+    signal_type) are kept in object arrays aligned with the slots.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.data = np.zeros(capacity, dtype=POSITION_DTYPE)
+        self.entry_dates = np.empty(capacity, dtype=object)
+        self.signal_types = np.empty(capacity, dtype=object)
+
+        self.codes = []  # ticker id -> code
+        self._ticker_ids = {}  # code -> ticker id
+        self._by_ticker = {}  # code -> [slot, ...]
+        self._slot_of = {}  # position id -> slot
+        self._free = []
+        self._size = 0  # slots ever used
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, position) -> bool:
+        """Open check by position id or by a record returned from get()"""
+        pid = position['id'] if isinstance(position, dict) else position
+        return pid in self._slot_of
+
+    def _grow(self):
+        capacity = len(self.data) * 2
+        self.data = np.resize(self.data, capacity)
+        self.data[self._size:]['active'] = False
+        self.entry_dates = np.resize(self.entry_dates, capacity)
+        self.signal_types = np.resize(self.signal_types, capacity)
+
+    def _ticker_id(self, code: str) -> int:
+        tid = self._ticker_ids.get(code)
+        if tid is None:
+            tid = len(self.codes)
+            self._ticker_ids[code] = tid
+            self.codes.append(code)
+        return tid
+
+    def add(self, code: str, entry_date, signal_type: str, **fields) -> int:
+        """Open a position; fields are NUMERIC_FIELDS. Returns its id"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self.data):
+                self._grow()
+            slot = self._size
+            self._size += 1
+
+        pid = self._next_id
+        self._next_id += 1
+
+        row = self.data[slot]
+        row['id'] = pid
+        row['ticker'] = self._ticker_id(code)
+        row['active'] = True
+        for name in NUMERIC_FIELDS:
+            row[name] = fields.get(name, 0)
+        self.entry_dates[slot] = entry_date
+        self.signal_types[slot] = signal_type
+
+        self._slot_of[pid] = slot
+        self._by_ticker.setdefault(code, []).append(slot)
+        return pid
+
+    def remove(self, pid: int):
+        """Close a position by id"""
+        slot = self._slot_of.pop(pid)
+        code = self.codes[self.data['ticker'][slot]]
+        self._by_ticker[code].remove(slot)
+        self.data['active'][slot] = False
+        self.entry_dates[slot] = None
+        self.signal_types[slot] = None
+        self._free.append(slot)
+
+    def slot(self, pid: int) -> int:
+        return self._slot_of[pid]
+
+    def get(self, pid: int) -> Dict:
+        """Position as a dict (same keys as the old list-of-dicts book, plus id)"""
+        return self.record(self._slot_of[pid])
+
+    def record(self, slot: int) -> Dict:
+        row = self.data[slot]
+        return {
+            'id': int(row['id']),
+            'code': self.codes[row['ticker']],
+            'entry_date': self.entry_dates[slot],
+            'entry_price': float(row['entry_price']),
+            'shares': int(row['shares']),
+            'signal_type': self.signal_types[slot],
+            'stop_loss': float(row['stop_loss']),
+            'take_profit': float(row['take_profit']),
+            'confidence': int(row['confidence']),
+            'entry_value': float(row['entry_value']),
+            'entry_commission': float(row['entry_commission'])
+        }
+
+    def ids(self, code: str = None) -> List[int]:
+        """Open position ids (of one ticker, or all) in opening order"""
+        if code is None:
+            slots = np.fromiter(self._slot_of.values(), dtype=np.int64, count=len(self._slot_of))
+        else:
+            slots = np.asarray(self._by_ticker.get(code, ()), dtype=np.int64)
+        return sorted(self.data['id'][slots].tolist())
+
+    def priced_slots(self, prices: Dict[str, float]):
+        """
+        Open slots whose ticker has a price today, in opening order
+
+        Args:
+            prices: {code: price} for the day (dict or pd.Series)
+
+        Returns:
+            (slots, slot_prices) arrays
+        """
+        if not self._slot_of:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        price_by_ticker = np.full(len(self.codes), np.nan)
+        for code, price in prices.items():
+            tid = self._ticker_ids.get(code)
+            if tid is not None:
+                price_by_ticker[tid] = price
+
+        data = self.data[:self._size]
+        slots = np.flatnonzero(data['active'])
+        slot_prices = price_by_ticker[data['ticker'][slots]]
+
+        known = ~np.isnan(slot_prices)
+        slots, slot_prices = slots[known], slot_prices[known]
+        order = np.argsort(data['id'][slots], kind='stable')
+        return slots[order], slot_prices[order]
+
+    def stop_hits(self, slots: np.ndarray, slot_prices: np.ndarray):
+        """
+        Stop loss / take profit flags for priced slots (one array op each)
+
+        Returns:
+            (hit_stop, hit_target) boolean arrays; stop loss wins when both hit
+        """
+        hit_stop = slot_prices <= self.data['stop_loss'][slots]
+        hit_target = ~hit_stop & (slot_prices >= self.data['take_profit'][slots])
+        return hit_stop, hit_target
+
+    def market_value(self, slots: np.ndarray, slot_prices: np.ndarray) -> float:
+        return float(np.dot(self.data['shares'][slots], slot_prices))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QUOTE FETCHER - TẢI GIÁ SONG SONG CÓ GIỚI HẠN TỐC ĐỘ
+
+Thay cho vòng lặp tuần tự + time.sleep() sau mỗi mã trong các scanner:
+- Thread pool gửi nhiều request cùng lúc (FETCH_WORKERS)
+- Token bucket giữ tổng tốc độ dưới FETCH_RATE request/giây
+- Lỗi được retry với backoff tăng dần + jitter ngẫu nhiên
+
+Config qua biến môi trường:
+    QUOTE_FETCH_WORKERS  (default: 4)
+    QUOTE_FETCH_RATE     (default: 2.0 request/giây)
+    QUOTE_FETCH_RETRIES  (default: 3)
+
+Usage:
+    fetcher = QuoteFetcher(lambda t: Quote(symbol=t, source='VCI').history(...))
+    for ticker, df, error in fetcher.fetch_many(tickers):
+        ...
+
+    python quote_fetcher.py   # demo against a local fake quote source
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+FETCH_WORKERS = int(os.environ.get('QUOTE_FETCH_WORKERS', 4))
+FETCH_RATE = float(os.environ.get('QUOTE_FETCH_RATE', 2.0))
+FETCH_RETRIES = int(os.environ.get('QUOTE_FETCH_RETRIES', 3))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    `rate` tokens are added per second, up to `capacity`; acquire() blocks
+    until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self._sleep(wait)
+
+
+class QuoteFetcher:
+    """
+    Concurrent, rate-limited fetcher
+
+    Args:
+        fetch_func: fetch_func(ticker) -> data. Raise to signal a
+            (retryable) error; return None for "no data".
+        max_workers: Concurrent requests
+        rate: Max requests per second across all workers
+        burst: Token bucket capacity (default: max(1, rate))
+        retries: Retries after the first failed attempt
+        backoff: Base delay (seconds) for retry n: backoff * 2**n
+        max_backoff: Cap on a single retry delay
+        jitter: Random extra delay, as a fraction of the delay
+    """
+
+    def __init__(
+        self,
+        fetch_func: Callable,
+        max_workers: int = FETCH_WORKERS,
+        rate: float = FETCH_RATE,
+        burst: Optional[float] = None,
+        retries: int = FETCH_RETRIES,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        jitter: float = 0.5,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.fetch_func = fetch_func
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self._sleep = sleep
+        self._random = random.Random()
+
+    def retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given retry (0-based)"""
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (1 + self.jitter * self._random.random())
+
+    def fetch(self, ticker):
+        """Fetch one ticker with rate limiting and retries (raises on final failure)"""
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.fetch_func(ticker)
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                self._sleep(self.retry_delay(attempt))
+
+    def _fetch_safe(self, ticker):
+        try:
+            return ticker, self.fetch(ticker), None
+        except Exception as e:
+            return ticker, None, e
+
+    def fetch_many(self, tickers: Iterable[str], ordered: bool = True) -> Iterator[Tuple[str, object, Optional[Exception]]]:
+        """
+        Fetch many tickers concurrently
+
+        Yields:
+            (ticker, data, error) - data is None when error is set;
+            in input order if `ordered`, otherwise as fetches complete
+        """
+        tickers = list(tickers)
+        if len(tickers) == 0:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as executor:
+            if ordered:
+                yield from executor.map(self._fetch_safe, tickers)
+            else:
+                futures = [executor.submit(self._fetch_safe, ticker) for ticker in tickers]
+                for future in as_completed(futures):
+                    yield future.result()
+
+    def fetch_all(self, tickers: Iterable[str]) -> Dict[str, object]:
+        """Fetch many tickers, return {ticker: data} for successful fetches"""
+        return {
+            ticker: data
+            for ticker, data, error in self.fetch_many(tickers)
+            if error is None and data is not None
+        }
+
+
+# ============================================================================
+# LOCAL FAKE QUOTE SOURCE
+# ============================================================================
+
+class FakeQuoteSource:
+    """
+    Local stand-in for vnstock, for testing fetchers without network
+
+    Each call sleeps `latency` seconds; tickers in `fail_times` raise that
+    many times before succeeding. Calls are recorded in `calls`.
+    """
+
+    def __init__(self, data: Optional[Dict[str, object]] = None, latency: float = 0.05,
+                 fail_times: Optional[Dict[str, int]] = None):
+        self.data = data or {}
+        self.latency = latency
+        self.fail_times = dict(fail_times or {})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self._lock:
+            self.calls.append((ticker, time.monotonic()))
+            failing = self.fail_times.get(ticker, 0) > 0
+            if failing:
+                self.fail_times[ticker] -= 1
+        time.sleep(self.latency)
+        if failing:
+            raise ConnectionError(f"fake failure for {ticker}")
+        return self.data.get(ticker, {'ticker': ticker, 'close': 10_000.0})
+
+
+def main():
+    """Demo: 40 tickers, 0.2s latency, 2 flaky tickers"""
+    tickers = [f"T{i:02d}" for i in range(40)]
+    source = FakeQuoteSource(latency=0.2, fail_times={'T03': 1, 'T07': 2})
+
+    print(f"Sequential estimate: {len(tickers) * 0.2:.1f}s + sleeps")
+    fetcher = QuoteFetcher(source, max_workers=8, rate=20, retries=3, backoff=0.1)
+
+    start = time.monotonic()
+    results = fetcher.fetch_all(tickers)
+    elapsed = time.monotonic() - start
+
+    print(f"Fetched {len(results)}/{len(tickers)} in {elapsed:.2f}s "
+          f"({len(source.calls)} calls, {len(source.calls) - len(tickers)} retries)")
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,7 @@ sys.stdout = original_stdout
 
 from breakout_scanner import BreakoutDetector
 from divergence_scanner import BearishDivergenceDetector
+from metrics import trade_metrics
 
 
 def simple_backtest(code, start_date, end_date, strategy='breakout'):
@@ -144,48 +145,21 @@ def simple_backtest(code, start_date, end_date, strategy='breakout'):
 
 
 def calculate_metrics(trades):
-    """Calculate performance metrics"""
-    if not trades:
-        return {
-            'total_trades': 0,
-            'winning_trades': 0,
-            'losing_trades': 0,
-            'win_rate': 0,
-            'avg_profit': 0,
-            'avg_loss': 0,
-            'profit_factor': 0,
-            'total_return': 0
-        }
-    
-    df = pd.DataFrame(trades)
-    
-    total_trades = len(df)
-    winning = df[df['profit_pct'] > 0]
-    losing = df[df['profit_pct'] <= 0]
-    
-    winning_trades = len(winning)
-    losing_trades = len(losing)
-    win_rate = (winning_trades / total_trades) * 100
-    
-    avg_profit = winning['profit_pct'].mean() if len(winning) > 0 else 0
-    avg_loss = losing['profit_pct'].mean() if len(losing) > 0 else 0
-    
-    gross_profit = winning['profit_pct'].sum() if len(winning) > 0 else 0
-    gross_loss = abs(losing['profit_pct'].sum()) if len(losing) > 0 else 0
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    # Assume 15% position size
-    total_return = df['profit_pct'].sum() * 0.15
+    """Calculate performance metrics (15% position size per trade)"""
+    m = trade_metrics(trades, return_col='profit_pct', date_col='entry_date', position_size=0.15)
+    profit_factor = m['profit_factor']
     
     return {
-        'total_trades': total_trades,
-        'winning_trades': winning_trades,
-        'losing_trades': losing_trades,
-        'win_rate': round(win_rate, 2),
-        'avg_profit': round(avg_profit, 2),
-        'avg_loss': round(avg_loss, 2),
+        'total_trades': m['total_trades'],
+        'winning_trades': m['winning_trades'],
+        'losing_trades': m['losing_trades'],
+        'win_rate': round(m['win_rate'], 2),
+        'avg_profit': round(m['avg_win'], 2),
+        'avg_loss': round(m['avg_loss'], 2),
         'profit_factor': round(profit_factor, 2) if profit_factor != float('inf') else 999,
-        'total_return': round(total_return, 2)
+        'total_return': round(m['total_return'], 2),
+        'sharpe': round(m['sharpe'], 2),
+        'max_drawdown': round(m['max_drawdown'], 2)
     }
 
 
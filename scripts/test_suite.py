@@ -250,6 +250,97 @@ def test_end_to_end():
         return False
 
 
+def test_store_backtest():
+    """Test 6: Trade simulation on store data (no network)"""
+    print("\n" + "=" * 60)
+    print("TEST 6: STORE BACKTEST")
+    print("=" * 60)
+    
+    try:
+        import backtest_4strategies_PKL as bt
+        from market_store import open_store
+        
+        store = open_store(bt.DATA_FOLDER, pkl_pattern='liquid_stocks')
+        if len(store) == 0:
+            print(f"❌ No data in {bt.DATA_FOLDER}/store")
+            return False
+        
+        strategies = [
+            bt.strategy_1_breakout,
+            bt.strategy_2_swing,
+            bt.strategy_3_pullback,
+            bt.strategy_4_ema_crossover
+        ]
+        
+        # simulate_trades is called directly: backtest_stock reports
+        # errors per strategy and carries on with 0 trades
+        total_signals = 0
+        total_trades = 0
+        for ticker in store.tickers()[:5]:
+            df = bt.prepare_dataframe(store[ticker], ticker)
+            if df is None or len(df) < 100:
+                continue
+            ind = bt.IndicatorFrame(df)
+            for strategy_func in strategies:
+                signals = strategy_func(df, ind)
+                trades = bt.simulate_trades(signals, df)
+                total_signals += len(signals)
+                total_trades += len(trades.get('net_pnl', ()))
+        
+        print(f"✅ {total_signals} signals → {total_trades} trades")
+        
+        if total_signals > 0 and total_trades == 0:
+            print("❌ Signals found but no trades simulated")
+            return False
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ledger_spill():
+    """Test 7: Ledger spills once per budget's worth of rows"""
+    print("\n" + "=" * 60)
+    print("TEST 7: LEDGER SPILL")
+    print("=" * 60)
+    
+    try:
+        from ledger import ColumnarLedger
+        
+        n_rows = 3000
+        ledger = ColumnarLedger(memory_budget_mb=0.05)
+        try:
+            for i in range(n_rows):
+                ledger.append({'day': i, 'equity': 1e9 + i, 'cash': 5e8})
+            
+            row_bytes = 3 * 8
+            expected_parts = n_rows // (ledger.memory_budget // row_bytes + 1)
+            print(f"✅ {n_rows} rows → {len(ledger.parts)} part files (expected {expected_parts})")
+            
+            if len(ledger.parts) != expected_parts:
+                print("❌ Ledger spilled more often than its budget requires")
+                return False
+            
+            df = ledger.to_frame()
+            if len(df) != n_rows or not (df['day'].to_numpy() == range(n_rows)).all():
+                print("❌ Rows lost or reordered across spills")
+                return False
+        finally:
+            ledger.close()
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def main():
     """Run all tests"""
     print("\n")
@@ -266,6 +357,8 @@ def main():
     results.append(("Strategy Detectors", test_strategy_detectors()))
     results.append(("Backtest Engine", test_backtest_engine()))
     results.append(("End-to-End", test_end_to_end()))
+    results.append(("Store Backtest", test_store_backtest()))
+    results.append(("Ledger Spill", test_ledger_spill()))
     
     # Summary
     print("\n" + "=" * 60)
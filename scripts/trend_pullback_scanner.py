@@ -10,6 +10,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Optional
 
+from indicators import IndicatorFrame
+
 
 class TrendPullbackDetector:
     """
@@ -43,23 +45,6 @@ class TrendPullbackDetector:
         self.pullback_max = pullback_max
     
     
-    def calculate_ema(self, series: pd.Series, period: int) -> pd.Series:
-        """Calculate Exponential Moving Average"""
-        return series.ewm(span=period, adjust=False).mean()
-    
-    
-    def calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        """Calculate RSI"""
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
-    
-    
     def is_uptrend(self, df: pd.DataFrame, idx: int) -> bool:
         """
         Check if in uptrend
@@ -152,60 +137,74 @@ class TrendPullbackDetector:
         return True
     
     
-    def detect_signal(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _add_indicators(self, df: pd.DataFrame, ind: Optional[IndicatorFrame] = None) -> pd.DataFrame:
+        ind = ind if ind is not None else IndicatorFrame(df)
+        df = df.copy()
+        
+        df['ema20'] = ind.ema(self.ema_short)
+        df['ema50'] = ind.ema(self.ema_long)
+        df['rsi'] = ind.rsi(self.rsi_period)
+        df['avg_volume_20'] = ind.sma('volume', 20)
+        
+        return df
+    
+    
+    def detect_signal(self, df: pd.DataFrame, ind: Optional[IndicatorFrame] = None) -> pd.DataFrame:
         """
-        Main detection logic
+        Main detection logic (vectorized)
+        
+        Same conditions as is_uptrend / is_pullback / is_bounce, evaluated
+        for all bars at once. Conditions are written as "not (reject
+        test)" so NaN values pass or fail exactly like the per-bar checks.
         
         Returns DataFrame with signals
         """
-        df = df.copy()
-        
-        # Calculate indicators
-        df['ema20'] = self.calculate_ema(df['close'], self.ema_short)
-        df['ema50'] = self.calculate_ema(df['close'], self.ema_long)
-        df['rsi'] = self.calculate_rsi(df, self.rsi_period)
-        df['avg_volume_20'] = df['volume'].rolling(window=20).mean()
-        
-        # Initialize signal columns
-        df['uptrend'] = False
-        df['pullback'] = False
-        df['pullback_pct'] = np.nan
-        df['rsi_zone'] = False
-        df['bounce'] = False
-        df['buy_signal'] = False
-        
-        for idx in range(len(df)):
-            current_idx = df.index[idx]
-            
-            if idx < max(self.ema_short, self.ema_long, 20):
-                continue
-            
-            current = df.loc[current_idx]
-            
-            # Check uptrend
-            if self.is_uptrend(df, current_idx):
-                df.loc[current_idx, 'uptrend'] = True
-            
-            # Check pullback
-            is_pb, pb_pct = self.is_pullback(df, current_idx)
-            if is_pb:
-                df.loc[current_idx, 'pullback'] = True
-                df.loc[current_idx, 'pullback_pct'] = pb_pct * 100
+        df = self._add_indicators(df, ind)
+        
+        close = df['close'].to_numpy(dtype=np.float64)
+        open_ = df['open'].to_numpy(dtype=np.float64)
+        high = df['high'].astype(np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+        ema20 = df['ema20'].to_numpy(dtype=np.float64)
+        ema50 = df['ema50'].to_numpy(dtype=np.float64)
+        rsi = df['rsi'].to_numpy(dtype=np.float64)
+        avg_volume = df['avg_volume_20'].to_numpy(dtype=np.float64)
+        
+        n = len(df)
+        active = np.arange(n) >= max(self.ema_short, self.ema_long, 20)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Uptrend: EMA20 > EMA50, close >= EMA50, EMA20 rising over 5 bars
+            ema20_5 = np.full(n, np.nan)
+            ema20_5[5:] = ema20[:-5]
+            uptrend = ~(ema20 <= ema50) & ~(close < ema50) & ~(ema20 <= ema20_5)
             
-            # Check RSI zone
-            if self.rsi_lower <= current['rsi'] <= self.rsi_upper:
-                df.loc[current_idx, 'rsi_zone'] = True
+            # Pullback: 3-8% below the 20-bar high, within 3% of EMA20 or EMA50
+            recent_high = high.rolling(20, min_periods=1).max().shift(1).to_numpy()
+            pullback_pct = (recent_high - close) / recent_high
+            near_ema = ~((np.abs(close - ema20) / close > 0.03) &
+                         (np.abs(close - ema50) / close > 0.03))
+            pullback = (~(pullback_pct < self.pullback_min) &
+                        ~(pullback_pct > self.pullback_max) & near_ema)
             
-            # Check bounce
-            if self.is_bounce(df, current_idx):
-                df.loc[current_idx, 'bounce'] = True
+            # RSI zone
+            rsi_zone = (self.rsi_lower <= rsi) & (rsi <= self.rsi_upper)
             
-            # BUY SIGNAL: All conditions met
-            if (df.loc[current_idx, 'uptrend'] and
-                df.loc[current_idx, 'pullback'] and
-                df.loc[current_idx, 'rsi_zone'] and
-                df.loc[current_idx, 'bounce']):
-                df.loc[current_idx, 'buy_signal'] = True
+            # Bounce: green candle, volume spike, close above previous close
+            prev_close = np.full(n, np.nan)
+            prev_close[1:] = close[:-1]
+            bounce = (~(close <= open_) &
+                      ~(volume < avg_volume * self.volume_multiplier) &
+                      ~(close <= prev_close))
+        
+        df['uptrend'] = uptrend & active
+        df['pullback'] = pullback & active
+        df['pullback_pct'] = np.where(df['pullback'], pullback_pct * 100, np.nan)
+        df['rsi_zone'] = rsi_zone & active
+        df['bounce'] = bounce & active
+        
+        # BUY SIGNAL: All conditions met
+        df['buy_signal'] = df['uptrend'] & df['pullback'] & df['rsi_zone'] & df['bounce']
         
         return df
     
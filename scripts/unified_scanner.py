@@ -12,6 +12,7 @@ Output: Combined signals for trading decisions
 import json
 import sys
 from datetime import datetime
+from functools import partial
 
 # Import both detectors
 try:
@@ -34,6 +35,9 @@ try:
     divergence_module = importlib.util.module_from_spec(spec2)
     spec2.loader.exec_module(divergence_module)
     
+    from indicators import IndicatorFrame
+    from quote_fetcher import QuoteFetcher
+    
     BreakoutDetector = breakout_module.BreakoutDetector
     BearishDivergenceDetector = divergence_module.BearishDivergenceDetector
     fetch_1h_data = breakout_module.fetch_1h_data
@@ -43,19 +47,21 @@ except Exception as e:
     sys.exit(1)
 
 
-def scan_stock_for_all_signals(code, lookback_hours=168):
+def scan_stock_for_all_signals(code, lookback_hours=168, df=None):
     """
     Scan 1 mã cho cả BUY và SELL signals
     
     Args:
         code: Stock code
         lookback_hours: Hours of data to fetch
+        df: Pre-fetched 1H data (fetched here if None)
         
     Returns:
         Dict with BUY and/or SELL signals
     """
     # Fetch data
-    df = fetch_1h_data(code, lookback_hours)
+    if df is None:
+        df = fetch_1h_data(code, lookback_hours)
     
     if df is None or len(df) < 50:
         return None
@@ -67,10 +73,13 @@ def scan_stock_for_all_signals(code, lookback_hours=168):
         'sell_signal': None
     }
     
+    # RSI/MACD are shared by both detectors
+    ind = IndicatorFrame(df)
+    
     # Check for BUY signal (Breakout)
     try:
         buy_detector = BreakoutDetector(volume_multiplier=3.0, rsi_threshold=70)
-        df_buy = buy_detector.detect_signal(df.copy())
+        df_buy = buy_detector.detect_signal(df.copy(), ind)
         buy_signal = buy_detector.get_latest_signal(df_buy)
         
         if buy_signal:
@@ -84,7 +93,7 @@ def scan_stock_for_all_signals(code, lookback_hours=168):
             volume_multiplier=3.0,
             rsi_threshold=70
         )
-        df_sell = sell_detector.detect_signal(df.copy())
+        df_sell = sell_detector.detect_signal(df.copy(), ind)
         sell_signal = sell_detector.get_latest_signal(df_sell)
         
         if sell_signal:
@@ -109,10 +118,16 @@ def scan_all_stocks(stock_codes):
     sell_signals = []
     conflict_signals = []  # Stocks with both BUY and SELL (unusual)
     
-    for code in stock_codes:
+    # Fetch 1H data concurrently (rate-limited, with retries)
+    fetcher = QuoteFetcher(partial(fetch_1h_data, lookback_hours=168, raise_errors=True))
+    
+    for code, df, error in fetcher.fetch_many(stock_codes):
         print(f"Scanning {code}...", file=sys.stderr)
         
-        result = scan_stock_for_all_signals(code)
+        if error is not None:
+            print(f"Error fetching {code}: {error}", file=sys.stderr)
+        
+        result = scan_stock_for_all_signals(code, df=df) if df is not None else None
         
         if result is None:
             print(f"  → Not enough data", file=sys.stderr)